@@ -1,70 +1,73 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from app.core.deps import get_current_admin
-from app.repositories.user_repo import UserRepository
-from app.services.wallet_service import WalletService
+from app.core.container import container
 from app.db.redis import redis_client
+from app.core.cache import cached
+from app.services.ledger_counters import ledger_counters
+from app.repositories.ledger_repo import WITHDRAWAL_REFUND
+from app.services.wallet_audit_service import wallet_audit
+from app.services.active_match_registry import active_match_registry
+from app.services.presence_service import presence_service
+from app.services.activity_rollups import activity_rollups, RANGES as ACTIVITY_RANGES
+from app.models.deposit import BulkActionRequest
 from bson import ObjectId
 from datetime import datetime, timezone
-import json
-from app.services.auth_service import AuthService
 from app.services.lobby_manager import lobby_manager
-from app.repositories.match_repo import MatchRepository
+from app.core.loop_watchdog import loop_watchdog
+from app.services.redis_usage import redis_usage
 import logging
+import asyncio
 router = APIRouter()
-user_repo = UserRepository()
-wallet_service = WalletService()
-match_repo = MatchRepository()
-auth_service = AuthService()
+user_repo = container.user_repo
+wallet_service = container.wallet_service
+match_repo = container.match_repo
+auth_service = container.auth_service
 logger = logging.getLogger("uvicorn.error")
 # --- 📊 ANALYTICS ---
 @router.get("/revenue/today")
 async def get_revenue(admin: dict = Depends(get_current_admin)):
-    db = user_repo.collection.database
-    
-    # 1. Gross Collections (Deposits)
-    dep_res = await db["deposits"].aggregate([
-        {"$match": {"status": "COMPLETED"}}, 
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]).to_list(1)
-    gross_val = dep_res[0]["total"] if dep_res else 0
+    """
+    O(1): reads the running ledger counters instead of aggregating
+    deposits, withdrawals and users on every dashboard refresh.
+    """
+    totals = await ledger_counters.get_totals()
+    g, today = totals["global"], totals["today"]
 
-    # 2. Total Payouts (Withdrawals)
-    with_res = await db["withdrawals"].aggregate([
-        {"$match": {"status": "COMPLETED"}}, 
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]).to_list(1)
-    payout_val = with_res[0]["total"] if with_res else 0
+    # 1. Gross Collections (Deposits) & Total Payouts (Withdrawals)
+    gross_val = g["deposits_total"]
+    payout_val = g["withdrawals_total"]
 
-    # 3. Net Profit Calculation
+    # 2. Net Profit Calculation
     # Profit = 5% withdrawal fee + (Total Matches * 10 PKR entry difference)
     withdrawal_fees = int(payout_val * 0.05)
-    total_matches = await db["users"].aggregate([
-        {"$group": {"_id": None, "total": {"$sum": "$total_matches"}}}
-    ]).to_list(1)
-    
-    # Note: total_matches in users is sum of both players. Actual matches = total / 2
    # Fee per match is 200 (pool) - 2000 (winner) = 0 PKR
-    match_count = (total_matches[0]["total"] if total_matches else 0) / 2
-    game_fees = int(match_count * 0)
+    game_fees = int(g["matches"] * 0)
     
     net_profit = withdrawal_fees + game_fees
 
-    # 4. System Liquidity (User Balances)
-    user_res = await db["users"].aggregate([
-        {"$group": {"_id": None, "total": {"$sum": "$wallet_balance"}}}
-    ]).to_list(1)
-    liquidity_val = user_res[0]["total"] if user_res else 0
-    
     return {
         "metrics": {
             "net_profit": net_profit,
-            "system_liquidity": liquidity_val, 
+            "system_liquidity": g["liquidity"], 
             "gross_collections": gross_val,
             "total_payouts": payout_val 
+        },
+        "today": {
+            "gross_collections": today["deposits_total"],
+            "total_payouts": today["withdrawals_total"],
+            "entry_fees": today["entry_fees"],
+            "match_payouts": today["payouts"],
+            "matches": today["matches"]
         }
     }
 
+@router.post("/ledger/reconcile")
+async def reconcile_ledger(admin: dict = Depends(get_current_admin)):
+    """Recomputes the ledger counters from the source collections now."""
+    drift = await ledger_counters.reconcile()
+    return {"status": "success", "drift": drift}
+
 @router.get("/health")
 async def get_health(admin: dict = Depends(get_current_admin)):
     db = user_repo.collection.database
@@ -87,9 +90,9 @@ async def get_health(admin: dict = Depends(get_current_admin)):
     # 3. Real-time Metrics (Using the new Set approach)
     try:
         # Optimized: Get count from the Set instead of scanning keys
-        total_online = redis_client.scard("online_players_set")
+        total_online = await presence_service.count_online()
         
-        matches_count = redis_client.scard("active_matches_set")
+        matches_count = await active_match_registry.count()
     except Exception as e:
         logger.error(f"Redis Health Check Failed: {e}")
     
@@ -111,30 +114,21 @@ async def get_online_players_list(admin: dict = Depends(get_current_admin)):
         if not online_ids:
             return {"online_players": []}
 
-        # 2. Convert IDs to ObjectIds for MongoDB
-        # We decode from bytes (Redis returns bytes) and skip non-valid IDs
-        from bson import ObjectId
-        valid_oids = []
-        for uid in online_ids:
-            decoded_id = uid.decode('utf-8') if isinstance(uid, bytes) else uid
-            if ObjectId.is_valid(decoded_id):
-                valid_oids.append(ObjectId(decoded_id))
-
-        # 3. Fetch user details from MongoDB in ONE batch
-        db = user_repo.collection.database
-        users_cursor = db["users"].find(
-            {"_id": {"$in": valid_oids}},
-            {"username": 1, "email": 1, "created_at": 1} # Only fetch needed fields
+        # 2. Fetch user details from MongoDB in ONE batch (humans and bots alike)
+        decoded_ids = [uid.decode('utf-8') if isinstance(uid, bytes) else uid for uid in online_ids][:100]
+        profiles, statuses = await asyncio.gather(
+            user_repo.get_profile_map(decoded_ids, fields=("username", "email")),
+            presence_service.get_statuses(decoded_ids)
         )
-        users_data = await users_cursor.to_list(length=100)
 
-        # 4. Format for the frontend table
+        # 3. Format for the frontend table
         online_players = []
-        for u in users_data:
+        for u_id, u in profiles.items():
             online_players.append({
-                "user_id": str(u["_id"]),
+                "user_id": u_id,
                 "username": u.get("username", "Unknown"),
                 "email": u.get("email", "N/A"),
+                "status": statuses.get(u_id, "online"),
                 # We use created_at as a fallback if connected_at isn't stored
                 "connected_at": datetime.now(timezone.utc).isoformat() 
             })
@@ -148,37 +142,53 @@ async def get_online_players_list(admin: dict = Depends(get_current_admin)):
 @router.get("/active-matches/details")
 async def get_active_matches_details(admin: dict = Depends(get_current_admin)):
     try:
-        # 1. Get all active match IDs from Redis
-        match_ids = redis_client.smembers("active_matches_set")
-        if not match_ids:
-            return {"active_matches": []}
-
-        active_matches = []
-        for mid in match_ids:
-            # 2. Get the match data stored in Redis (usually as a hash or JSON string)
-            match_data = redis_client.get(f"match:{mid.decode('utf-8')}")
-            if match_data:
-                active_matches.append(json.loads(match_data))
-
-        return {"active_matches": active_matches}
+        # Registry + live scores in a single Redis round-trip
+        return {"active_matches": await active_match_registry.list_matches()}
     except Exception as e:
         return {"error": str(e), "active_matches": []}
 
 # --- 👥 USER MANAGEMENT (MISSING IN YOUR CODE) ---
+@router.get("/users/{user_id}/ledger")
+async def get_user_ledger(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """Pages through a user's wallet ledger (newest first)."""
+    try:
+        entries, next_cursor = await user_repo.ledger.get_entries(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"entries": entries, "next_cursor": next_cursor}
+
+@router.get("/users/{user_id}/audit")
+async def audit_user_wallet(user_id: str, admin: dict = Depends(get_current_admin)):
+    """Replays the ledger from the latest snapshot and compares it with the live balance."""
+    user = await user_repo.collection.find_one({"_id": user_repo._to_id(user_id)}, {"wallet_balance": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return await wallet_audit.audit_user(user_id, user.get("wallet_balance", 0))
+
 @router.get("/users")
 async def get_users(
     page: int = Query(1, ge=1), 
     search: str = "", 
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
     admin: dict = Depends(get_current_admin)
 ):
     """
     Coordinates with AuthService to provide paginated and 
     searchable data for the UserTable.tsx component.
+    Search is a case-insensitive prefix match on username or email.
     """
     # Use the service instance initialized at the top of your file
     result = await auth_service.get_all_users_for_admin(
         page=page, 
-        search=search
+        search=search,
+        cursor=cursor,
+        limit=limit
     )
     
     return result
@@ -187,6 +197,7 @@ async def get_users(
 async def get_pending_deposits(admin: dict = Depends(get_current_admin)):
     db = user_repo.collection.database
     deposits = await db["deposits"].find({"status": "PENDING"}).sort("created_at", -1).to_list(100)
+    await user_repo.enrich(deposits)
     for d in deposits:
         d["_id"] = str(d["_id"])
         d["user_id"] = str(d["user_id"])
@@ -215,6 +226,14 @@ async def process_deposit(trx_id: str, action: str, admin: dict = Depends(get_cu
         )
     return {"status": "success"}
 
+@router.post("/deposits/bulk")
+async def bulk_process_deposits(data: BulkActionRequest, admin: dict = Depends(get_current_admin)):
+    """
+    Approve/reject many pending deposits at once. Returns a per-item report;
+    items that were not PENDING are skipped, never credited twice.
+    """
+    return await wallet_service.bulk_process_deposits(data.ids, data.action)
+
 @router.post("/system/reset-finances")
 async def reset_financial_stats(admin: dict = Depends(get_current_admin)):
     db = user_repo.collection.database
@@ -233,6 +252,14 @@ async def reset_financial_stats(admin: dict = Depends(get_current_admin)):
         # If you don't do this, "System Liquidity" will still show the sum of current wallets
         await db["users"].update_many({}, {"$set": {"wallet_balance": 0}})
 
+        # 5. The ledger restarts from the zeroed balances
+        await user_repo.ledger.collection.delete_many({})
+        await user_repo.ledger.snapshots.delete_many({})
+
+        # 6. Bring the running counters back in line with the wiped collections
+        await ledger_counters.collection.delete_many({})
+        await ledger_counters.reconcile()
+
         return {"status": "success", "message": "Financial metrics reset to zero."}
     
     except Exception as e:
@@ -244,18 +271,22 @@ async def get_pending_withdrawals(admin: dict = Depends(get_current_admin)):
     db = user_repo.collection.database
     withdrawals = await db["withdrawals"].find({"status": "PENDING"}).sort("created_at", -1).to_list(100)
     
-    # Enrich with Username if possible, or just send IDs
+    # Enrich with Username in ONE batch (only for docs that didn't store it)
+    await user_repo.enrich(withdrawals)
     for w in withdrawals:
         w["_id"] = str(w["_id"])
         w["user_id"] = str(w["user_id"])
-        
-        # Optional: Fetch username for UI convenience
-        user = await db["users"].find_one({"_id": ObjectId(w["user_id"])})
-        if user:
-            w["username"] = user.get("username", "Unknown")
+        w["username"] = w.get("username") or "Unknown"
             
     return {"pending_withdrawals": withdrawals}
 
+@router.post("/withdrawals/bulk")
+async def bulk_process_withdrawals(data: BulkActionRequest, admin: dict = Depends(get_current_admin)):
+    """
+    Approve/reject many pending withdrawals at once (rejections refund the hold).
+    """
+    return await wallet_service.bulk_process_withdrawals(data.ids, data.action)
+
 @router.post("/withdraw/{withdraw_id}/{action}")
 async def process_withdrawal(withdraw_id: str, action: str, admin: dict = Depends(get_current_admin)):
     db = user_repo.collection.database
@@ -276,9 +307,18 @@ async def process_withdrawal(withdraw_id: str, action: str, admin: dict = Depend
             {"_id": w_oid},
             {"$set": {"status": "COMPLETED", "processed_at": datetime.now(timezone.utc)}}
         )
+        await ledger_counters.bump(
+            withdrawals_pending=-withdrawal["amount"],
+            withdrawals_total=withdrawal["amount"],
+            withdrawals_count=1
+        )
     elif action == "reject":
         # Refund the money to the user
-        await user_repo.update_wallet(str(withdrawal["user_id"]), withdrawal["amount"])
+        await user_repo.update_wallet(
+            str(withdrawal["user_id"]), withdrawal["amount"],
+            counters={"withdrawals_pending": -withdrawal["amount"]},
+            entry_type=WITHDRAWAL_REFUND, ref=withdraw_id
+        )
         
         await db["withdrawals"].update_one(
             {"_id": w_oid},
@@ -287,53 +327,34 @@ async def process_withdrawal(withdraw_id: str, action: str, admin: dict = Depend
         
     return {"status": "success"}
 @router.get("/stats/peak-times")
-async def get_peak_activity(admin: dict = Depends(get_current_admin)):
-    db = user_repo.collection.database
-    
-    # Aggregation: Extract hour from timestamp and count matches
-    pipeline = [
-        # 1. Project the hour from the ISO timestamp string
-        # Note: MongoDB stores strings in your schema, so we slice the string "YYYY-MM-DDTHH:..."
-        # Or if you stored standard ISODates: {"$hour": "$timestamp"}
-        {
-            "$project": {
-                "hour": {"$substr": ["$timestamp", 11, 2]} # Extracts "14" from "2024-01-01T14:30:00"
-            }
-        },
-        # 2. Group by Hour
-        {
-            "$group": {
-                "_id": "$hour",
-                "matches": {"$sum": 1}
-            }
-        },
-        # 3. Sort by Hour
-        {"$sort": {"_id": 1}}
-    ]
-
+async def get_peak_activity(
+    range: str = Query("30d", description="24h, 7d or 30d"),
+    admin: dict = Depends(get_current_admin)
+):
+    """Hour-of-day histogram read from the precomputed activity rollups."""
+    if range not in ACTIVITY_RANGES:
+        raise HTTPException(status_code=400, detail=f"range must be one of {', '.join(ACTIVITY_RANGES)}")
     try:
-        # We query the 'match_history' collection if you have one, 
-        # OR we query users and unwind their 'recent_matches' if you don't have a separate collection.
-        # Ideally, you should have a 'matches' collection for analytics.
-        
-        # Option A: If you have a 'matches' collection (Recommended):
-        # results = await db["matches"].aggregate(pipeline).to_list(24)
-
-        # Option B: Aggregate from Users (Slower but works with your current repo)
-        results = await db["users"].aggregate([
-            {"$unwind": "$recent_matches"},
-            {"$project": {"hour": {"$substr": ["$recent_matches.timestamp", 11, 2]}}},
-            {"$group": {"_id": "$hour", "matches": {"$sum": 1}}},
-            {"$sort": {"_id": 1}}
-        ]).to_list(24)
-
         # Format for Recharts
-        formatted_data = [{"hour": r["_id"], "matches": r["matches"]} for r in results]
-        return formatted_data
-
+        return await activity_rollups.get_peak_hours(range)
     except Exception as e:
-        print(f"Stats Error: {e}")
+        logger.error(f"Stats Error: {e}")
         return []
+
+@router.get("/stats/activity")
+async def get_activity_series(
+    range: str = Query("24h", description="24h (hourly points) or 7d/30d (daily points)"),
+    admin: dict = Depends(get_current_admin)
+):
+    if range not in ACTIVITY_RANGES:
+        raise HTTPException(status_code=400, detail=f"range must be one of {', '.join(ACTIVITY_RANGES)}")
+    return {"range": range, "series": await activity_rollups.get_series(range)}
+
+@router.post("/stats/activity/rebuild")
+async def rebuild_activity_rollups(days: int = Query(30, ge=1, le=90), admin: dict = Depends(get_current_admin)):
+    """Backfills the rollups from the matches collection (e.g. after first deploy)."""
+    rebuilt = await activity_rollups.rebuild_from_matches(days)
+    return {"status": "success", "days_rebuilt": rebuilt}
     
 @router.post("/broadcast")
 async def send_global_announcement(data: dict, admin: dict = Depends(get_current_admin)):
@@ -362,18 +383,33 @@ async def get_match_audit(match_id: str, admin: dict = Depends(get_current_admin
     }
 
 @router.get("/referral-leaderboard")
+@cached(lambda skip=0, limit=10, **_: f"cache:admin:referrals:{skip}:{limit}", ttl=120, stale_ttl=900)
 async def admin_referral_leaderboard(
     skip: int = Query(0, ge=0), 
     limit: int = Query(10, le=50),
     admin: dict = Depends(get_current_admin)
 ):
     # It is better to use the WalletService which we updated earlier
-    from app.services.wallet_service import WalletService
-    wallet_service = WalletService()
-    
     result = await wallet_service.get_admin_referral_stats(
         skip=skip, 
         limit=limit
     )
     
-    return result
\ No newline at end of file
+    return result
+
+# --- 🩺 SYSTEM ---
+@router.get("/system/loop-stalls")
+async def get_loop_stalls(limit: int = Query(20, ge=1, le=200), admin: dict = Depends(get_current_admin)):
+    """Top event-loop blockers on this worker, ranked by total time blocked."""
+    return loop_watchdog.report(limit)
+
+@router.delete("/system/loop-stalls")
+async def reset_loop_stalls(admin: dict = Depends(get_current_admin)):
+    """Clears the offender table, e.g. before verifying a fix."""
+    loop_watchdog.reset()
+    return {"status": "reset"}
+
+@router.get("/system/redis-usage")
+async def get_redis_usage(days: int = Query(1, ge=1, le=30), admin: dict = Depends(get_current_admin)):
+    """Redis commands per feature, per finished match and per active user."""
+    return await redis_usage.report(days)
@@ -1,17 +1,17 @@
 import random
 import asyncio
 import httpx  # Using httpx for async email sending
-import json
+from app.core.serialization import dumps, loads
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, status
 from pydantic import BaseModel, EmailStr
-from app.services.auth_service import AuthService
+from app.core.container import container
 from app.core.security import create_access_token
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user_profile
 from app.core.config import settings
 from app.db.redis import redis_client # Import our shared brain
 
 router = APIRouter()
-auth_service = AuthService()
+auth_service = container.auth_service
 
 # --- Pydantic Models ---
 class SignupRequest(BaseModel):
@@ -102,7 +102,7 @@ async def signup_request(user_data: SignupRequest, background_tasks: BackgroundT
     
     redis_client.set(
         f"signup:{user_data.email}", 
-        json.dumps(signup_data), 
+        dumps(signup_data), 
         ex=600
     )
     
@@ -117,7 +117,7 @@ async def signup_verify(data: VerifyRequest):
     if not cached_data:
         raise HTTPException(status_code=400, detail="OTP expired or email not found")
     
-    user_info = json.loads(cached_data)
+    user_info = loads(cached_data)
     
     if user_info["code"] != data.code:
         raise HTTPException(status_code=400, detail="Invalid verification code")
@@ -217,7 +217,7 @@ async def verify_reset_code(data: ForgotPasswordRequest, code: str):
     return {"msg": "Code verified. Proceed to reset."}
 
 @router.get("/me")
-async def get_current_user_details(user: dict = Depends(get_current_user)):
+async def get_current_user_details(user: dict = Depends(get_current_user_profile)):
     """
     Returns the full profile including referral data with serialized IDs.
     """
@@ -1,25 +1,36 @@
-import json
+from app.core.serialization import dumps, loads
 import time
 import asyncio
 from typing import Optional
 from fastapi import WebSocket, WebSocketDisconnect, Query
 from app.db.redis import redis_client
-from app.repositories.user_repo import UserRepository
+from app.db.keyspace import MatchKeys, match_redis
+from app.core.container import container
+from app.repositories.projections import UserFields
 from app.services.game_utils import to_str
+from app.core.metrics import ws_timer
+from app.core import ws_protocol
+from app.core.redis_budget import set_feature
 from app.services.game_redis import get_user_from_token
 from app.services.game_generator import generate_fair_game
 from app.services.game_lifecycle import wait_for_match_ready, finalize_match
+from app.services.match_authority import match_authorities
+from app.services.scoring_engine import OUTDATED_CLIENT, scoring_engine
 import logging
 
 logger = logging.getLogger("uvicorn.error")
 
+MATCH_MESSAGE_TYPES = frozenset({"PING", "ROUND_SUBMIT", "SCORE_UPDATE", "GAME_OVER"})
+
 async def game_websocket_endpoint(
     websocket: WebSocket, 
     match_id: str, 
     token: str = Query(...),
     bot_id: Optional[str] = Query(None) 
 ):
-    await websocket.accept()
+    # Negotiates JSON / msgpack / fixed binary frames (JSON for old clients)
+    sock = await ws_protocol.accept(websocket)
+    set_feature("gameplay")
     
     # 1. Authenticate user (Supports BOT_ID bypass)
     user_id = await get_user_from_token(token, bot_id)
@@ -29,27 +40,28 @@ async def game_websocket_endpoint(
         return
 
     u_id_str = str(user_id)
-    match_key = f"match:live:{match_id}"
-    user_repo = UserRepository()
+    match_key = MatchKeys.live(match_id)
+    match_store = match_redis(match_id)
+    user_repo = container.user_repo
     GRACE_PERIOD_SECONDS = 15 
     listen_task = None
 
     try:
         # 🚀 2. RECONNECTION KILL-SWITCH
-        raw_data = await asyncio.to_thread(redis_client.hgetall, match_key)
+        raw_data = await asyncio.to_thread(match_store.hgetall, match_key)
         match_data = {to_str(k): to_str(v) for k, v in raw_data.items()}
 
         if match_data.get("finalized") == "true":
             final_res = match_data.get(f"final_result:{u_id_str}")
             if final_res:
                 logger.info(f"User {u_id_str} reconnected to a finished match. Sending result.")
-                await websocket.send_json({"type": "RESULT", **json.loads(final_res)})
+                await sock.send({"type": "RESULT", **loads(final_res)})
                 await websocket.close()
                 return
 
         # --- Standard Match Logic ---
         # ✅ FIX: Fetch user with safety check to prevent crashing if bot isn't in DB yet
-        user = await user_repo.get_by_id(u_id_str)
+        user = await user_repo.get_by_id(u_id_str, UserFields.IDENTITY)
         
         if user:
             username = user.get("username", "Unknown Player")
@@ -61,8 +73,11 @@ async def game_websocket_endpoint(
             await websocket.close()
             return
         
+        # Attach before announcing ourselves in Redis, so a same-worker opponent finds us
+        match_authorities.attach(match_id, u_id_str, sock)
+
         # Metadata Setup in Redis
-        pipe = redis_client.pipeline()
+        pipe = match_store.pipeline()
         pipe.hset(match_key, f"name:{u_id_str}", username)
         pipe.hset(match_key, f"status:{u_id_str}", "PLAYING")
         pipe.hset(match_key, f"last_seen:{u_id_str}", str(time.time()))
@@ -71,20 +86,20 @@ async def game_websocket_endpoint(
         await asyncio.to_thread(pipe.exec)
 
         # 🚀 3. HOST INITIALIZATION
-        is_host = await asyncio.to_thread(redis_client.set, f"init:{match_id}", "true", nx=True, ex=30)
+        is_host = await asyncio.to_thread(match_store.set, MatchKeys.host_init(match_id), "true", nx=True, ex=30)
         
         if is_host:
             game_rounds = generate_fair_game(20)
             # Even for single fields, using the positional or 'values' argument is safer
-            await asyncio.to_thread(redis_client.hset, match_key, values={"rounds": json.dumps(game_rounds)})
-            await asyncio.to_thread(redis_client.expire, match_key, 600)
+            await asyncio.to_thread(match_store.hset, match_key, values={"rounds": dumps(game_rounds)})
+            await asyncio.to_thread(match_store.expire, match_key, 600)
             
             signal_data = {
                 "rounds": game_rounds,
                 "op_name": username,
                 "op_id": u_id_str
             }
-            await asyncio.to_thread(redis_client.publish, f"match_init:{match_id}", json.dumps(signal_data))
+            await asyncio.to_thread(redis_client.publish, f"match_init:{match_id}", dumps(signal_data))
         
         # 🚀 4. THE ARENA INITIALIZATION
         try:
@@ -92,61 +107,109 @@ async def game_websocket_endpoint(
         except Exception as e:
             if "timed out" in str(e).lower():
                 logger.error(f"Match {match_id} timed out. Refunding user {u_id_str}.")
-                await websocket.send_json({
+                await sock.send({
                     "type": "MATCH_CANCELLED",
                     "reason": "Opponent failed to connect. Your entry fee has been refunded."
                 })
-                from app.services.wallet_service import WalletService
-                wallet_service = WalletService()
-                bet_raw = await asyncio.to_thread(redis_client.hget, match_key, "bet_amount")
+                wallet_service = container.wallet_service
+                bet_raw = await asyncio.to_thread(match_store.hget, match_key, "bet_amount")
                 bet_amount = float(to_str(bet_raw)) if bet_raw else 100.0
-                await wallet_service.refund_user(u_id_str, bet_amount)
+                await wallet_service.refund_user(u_id_str, bet_amount, match_id=match_id)
                 await websocket.close()
                 return
             raise e
 
+        # Answer key for server-side scoring; a reconnect resumes the stored tally
+        scoring_engine.open(match_id, rounds_data)
+        scoring_engine.seed(
+            match_id, u_id_str,
+            int(match_data.get(f"score:{u_id_str}", 0) or 0),
+            int(match_data.get(f"round:{u_id_str}", 1) or 1),
+            match_data.get(f"ended:{u_id_str}") == "1"
+        )
+
         # 🚀 5. START THE GAME
-        await websocket.send_json({
+        await sock.send({
             "type": "GAME_START",
             "rounds": rounds_data,
             "opponent_name": opponent_name,
             "match_id": match_id
         })
 
-        # --- 6. CLIENT LISTENER ---
+        # --- 6. SAME-WORKER FAST PATH ---
+        # Both sockets live here: an in-process actor owns the match state
+        authority = await match_authorities.claim(match_id, u_id_str, opponent_id, user_repo)
+        if authority:
+            if await authority.serve(u_id_str, sock):
+                return
+            # The opponent left this worker: carry on polling Redis like any other match
+
+        # --- 7. CLIENT LISTENER (Redis path) ---
         async def listen_to_client():
-            try:
-                while True:
-                    data = await websocket.receive_json()
-                    if data.get("type") == "PING":
-                        await websocket.send_json({"type": "PONG"})
-                        continue
-                    if data.get("type") == "SCORE_UPDATE":
-                        new_score = int(data.get("score", 0))
-                        await asyncio.to_thread(redis_client.hset, match_key, values={f"score:{u_id_str}": new_score})
-                        await asyncio.to_thread(redis_client.hset, match_key, values={f"last_seen:{u_id_str}": str(time.time())})
-                    if data.get("type") == "GAME_OVER":
-                        await asyncio.to_thread(redis_client.hset, match_key, f"status:{u_id_str}", "FINISHED")
-            except:
-                pass
+            while True:
+                try:
+                    data = await sock.receive()
+                except ws_protocol.FrameError as e:
+                    # A bad frame must not end the listener, or last_seen stalls and we "flee"
+                    logger.debug(f"Dropped bad frame from {u_id_str}: {e}")
+                    try:
+                        await sock.send({"type": "ERROR", "message": "Malformed frame"})
+                    except Exception:
+                        return
+                    continue
+                except Exception:
+                    return  # Socket gone; the monitor loop handles the rest
+                try:
+                    with ws_timer("match", data.get("type"), MATCH_MESSAGE_TYPES):
+                        if data.get("type") == "PING":
+                            await sock.send({"type": "PONG"})
+                            continue
+                        if data.get("type") == "ROUND_SUBMIT":
+                            tally = scoring_engine.submit(match_id, u_id_str, data.get("round"), data.get("taps") or [])
+                            if tally:
+                                await asyncio.to_thread(match_store.hset, match_key, values={
+                                    f"score:{u_id_str}": tally.score,
+                                    f"round:{u_id_str}": tally.next_round,
+                                    f"ended:{u_id_str}": int(tally.ended),
+                                    f"last_seen:{u_id_str}": str(time.time())
+                                })
+                        if data.get("type") == "SCORE_UPDATE":
+                            # Bots and old clients: absolute score, clamped by the engine
+                            if not scoring_engine.accepts_legacy(u_id_str):
+                                await sock.send({"type": "ERROR", "message": OUTDATED_CLIENT})
+                                continue
+                            new_score = scoring_engine.legacy_score(match_id, u_id_str, data.get("score", 0))
+                            if new_score is not None:
+                                # Only an accepted update refreshes last_seen
+                                await asyncio.to_thread(match_store.hset, match_key, values={
+                                    f"score:{u_id_str}": new_score,
+                                    f"last_seen:{u_id_str}": str(time.time())
+                                })
+                        if data.get("type") == "GAME_OVER":
+                            await asyncio.to_thread(match_store.hset, match_key, f"status:{u_id_str}", "FINISHED")
+                except Exception as e:
+                    logger.error(f"Match Message Error ({u_id_str}): {e}")
 
         listen_task = asyncio.create_task(listen_to_client())
+        # The listener keeps "gameplay"; everything below is the polling monitor
+        set_feature("gameplay_monitor")
 
-        # --- 7. MONITOR LOOP ---
+        # --- 8. MONITOR LOOP ---
         last_sync_score = -1
         last_sync_op_score = -1
         GRACE_PERIOD_SECONDS = 15
 
         while True:
             await asyncio.sleep(2.0) 
-            raw_data = await asyncio.to_thread(redis_client.hgetall, match_key)
+            raw_data = await asyncio.to_thread(match_store.hgetall, match_key)
             match_data = {to_str(k): to_str(v) for k, v in raw_data.items()}
             
             # 1. Connection/Finalized Check
             if match_data.get("finalized") == "true":
+                scoring_engine.forget(match_id)  # Finalized on another worker
                 final_res_json = match_data.get(f"final_result:{u_id_str}")
                 if final_res_json:
-                    await websocket.send_json({"type": "RESULT", **json.loads(final_res_json)})
+                    await sock.send({"type": "RESULT", **loads(final_res_json)})
                 break 
 
             my_score = int(match_data.get(f"score:{u_id_str}", 0))
@@ -176,7 +239,7 @@ async def game_websocket_endpoint(
 
             # D. LIVE SCORE SYNCING
             if my_score != last_sync_score or op_score != last_sync_op_score:
-                await websocket.send_json({
+                await sock.send({
                     "type": "SYNC_STATE",
                     "your_score": my_score,
                     "opponent_score": op_score
@@ -188,7 +251,8 @@ async def game_websocket_endpoint(
     except Exception as e:
         logger.error(f"Gameplay Error: {e}")
     finally:
-        await asyncio.to_thread(redis_client.hincrby, match_key, "active_conns", -1)
+        await match_authorities.detach(match_id, u_id_str, sock)
+        await asyncio.to_thread(match_store.hincrby, match_key, "active_conns", -1)
         if listen_task: 
             listen_task.cancel()
             try:
@@ -6,18 +6,27 @@ from datetime import datetime
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, HTTPException
 from app.services.game_redis import get_user_from_token
 from app.services.lobby_manager import lobby_manager
-from app.services.wallet_service import WalletService
+from app.services.presence_service import presence_service
+from app.core.container import container
 from app.db.redis import redis_client
+from app.db.keyspace import MatchKeys, match_redis
 from app.services.game_utils import to_str
+from app.core.metrics import ws_timer
+from app.core.ws_protocol import FrameError
+from app.core.redis_budget import set_feature
 router = APIRouter()
 logger = logging.getLogger("uvicorn.error")
 
+LOBBY_MESSAGE_TYPES = frozenset({"ping", "pong", "SEND_CHALLENGE", "ACCEPT_CHALLENGE"})
+
 @router.websocket("/ws/lobby")
 async def lobby_endpoint(websocket: WebSocket, token: str = Query(...)):
     """
     Global Lobby Socket optimized for production and Redis Free Tier.
     """
     
+    set_feature("lobby")
+
     # 1. Authenticate
     user_id = await get_user_from_token(token)
     if not user_id:
@@ -25,10 +34,11 @@ async def lobby_endpoint(websocket: WebSocket, token: str = Query(...)):
         return
 
     # 2. Connect to Lobby Manager
-    await lobby_manager.connect(user_id, websocket)
+    sock = await lobby_manager.connect(user_id, websocket)
     await lobby_manager.update_status(user_id, "online")
     # 🚀 3. HEARTBEAT TASK
     async def heartbeat():
+        set_feature("lobby_heartbeat")
         try:
             while True:
                 await asyncio.sleep(25)
@@ -38,7 +48,7 @@ async def lobby_endpoint(websocket: WebSocket, token: str = Query(...)):
                 if to_str(raw) != "playing":
                     redis_client.expire(f"user_status:{user_id}", 120)
                 
-                await websocket.send_json({"type": "ping"})
+                await sock.send({"type": "ping"})
         except Exception:
             pass
 
@@ -46,100 +56,110 @@ async def lobby_endpoint(websocket: WebSocket, token: str = Query(...)):
 
     try:
         while True:
-            data = await websocket.receive_json()
+            try:
+                data = await sock.receive()
+            except FrameError:
+                await sock.send({"type": "ERROR", "message": "Malformed frame"})
+                continue
             msg_type = data.get('type')
+            with ws_timer("lobby", msg_type, LOBBY_MESSAGE_TYPES):
+                if msg_type in ['pong', 'ping']:
+                    continue
 
-            if msg_type in ['pong', 'ping']:
-                continue
+                # ==========================================
+                # 1. SEND CHALLENGE
+                # ==========================================
+                if msg_type == 'SEND_CHALLENGE':
+                    target_id = data.get('target_id')
+                    challenger_name = data.get('username', 'Unknown')
 
-            # ==========================================
-            # 1. SEND CHALLENGE
-            # ==========================================
-            if msg_type == 'SEND_CHALLENGE':
-                target_id = data.get('target_id')
-                challenger_name = data.get('username', 'Unknown')
-                
-                # 1. Send the challenge to the target player
-                sent = await lobby_manager.send_personal_message({
-                    "type": "INCOMING_CHALLENGE",
-                    "challenger_id": user_id,
-                    "challenger_name": challenger_name,
-                    "bet_amount": 100,
-                    "expires_in": 6 # Syncs with frontend timer
-                }, target_id)
+                    # Don't ring a player who is already mid-match
+                    if await presence_service.get_status(target_id) == "playing":
+                        await sock.send({"type": "ERROR", "message": "User is in a match"})
+                        continue
+
+                    # 1. Send the challenge to the target player
+                    sent = await lobby_manager.send_personal_message({
+                        "type": "INCOMING_CHALLENGE",
+                        "challenger_id": user_id,
+                        "challenger_name": challenger_name,
+                        "bet_amount": 100,
+                        "expires_in": 6 # Syncs with frontend timer
+                    }, target_id)
                 
-                if sent:
-                    # 🚀 2. Spawn a background task to handle expiry
-                    async def auto_expire_challenge(c_id, t_id):
-                        await asyncio.sleep(6)
-                        expire_msg = {
-                            "type": "CHALLENGE_EXPIRED", 
-                            "challenger_id": c_id
-                        }
-                        # Notify both so the UI disappears for both players
-                        await lobby_manager.send_personal_message(expire_msg, t_id)
-                        await lobby_manager.send_personal_message(expire_msg, c_id)
+                    if sent:
+                        # 🚀 2. Spawn a background task to handle expiry
+                        async def auto_expire_challenge(c_id, t_id):
+                            await asyncio.sleep(6)
+                            expire_msg = {
+                                "type": "CHALLENGE_EXPIRED", 
+                                "challenger_id": c_id
+                            }
+                            # Notify both so the UI disappears for both players
+                            await lobby_manager.send_personal_message(expire_msg, t_id)
+                            await lobby_manager.send_personal_message(expire_msg, c_id)
                     
-                    asyncio.create_task(auto_expire_challenge(user_id, target_id))
-                else:
-                    await websocket.send_json({"type": "ERROR", "message": "User is offline"})
-
-            # ==========================================
-            # 2. ACCEPT CHALLENGE
-            # ==========================================
-            elif msg_type == 'ACCEPT_CHALLENGE':
-                challenger_id = data.get('challenger_id')
-                accepter_id = user_id
-                wallet = WalletService()
-                bet_amount = 100.0
-
-                try:
-                    await wallet.deduct_entry_fee(challenger_id, bet_amount)
-                except HTTPException:
-                    error_msg = {"type": "ERROR", "message": "Challenger has insufficient funds"}
-                    await websocket.send_json(error_msg)
-                    await lobby_manager.send_personal_message(error_msg, challenger_id)
-                    continue
+                        asyncio.create_task(auto_expire_challenge(user_id, target_id))
+                    else:
+                        await sock.send({"type": "ERROR", "message": "User is offline"})
 
-                try:
-                    await wallet.deduct_entry_fee(accepter_id, bet_amount)
-                except HTTPException:
-                    await wallet.refund_user(challenger_id, bet_amount)
-                    error_msg = {"type": "ERROR", "message": "Insufficient funds for entry fee"}
-                    await websocket.send_json(error_msg)
-                    await lobby_manager.send_personal_message({
-                        "type": "ERROR", 
-                        "message": "Opponent has insufficient funds. Fee refunded."
-                    }, challenger_id)
-                    continue
+                # ==========================================
+                # 2. ACCEPT CHALLENGE
+                # ==========================================
+                elif msg_type == 'ACCEPT_CHALLENGE':
+                    challenger_id = data.get('challenger_id')
+                    accepter_id = user_id
+                    wallet = container.wallet_service
+                    bet_amount = 100.0
+
+                    try:
+                        await wallet.deduct_entry_fee(challenger_id, bet_amount)
+                    except HTTPException:
+                        error_msg = {"type": "ERROR", "message": "Challenger has insufficient funds"}
+                        await sock.send(error_msg)
+                        await lobby_manager.send_personal_message(error_msg, challenger_id)
+                        continue
 
-                # C. Success: Register Match in Redis
-                match_id = f"match_{uuid.uuid4().hex[:8]}"
-                match_key = f"match:live:{match_id}"
-                await lobby_manager.update_status(user_id, "playing")
-                await lobby_manager.update_status(challenger_id, "playing")
-
-                # ✅ FIXED: Flattening the dictionary for Upstash compatibility
-                # We pass the key-value pairs directly into hset
-                pipe = redis_client.pipeline()
-                pipe.hset(match_key, "p1_id", challenger_id)
-                pipe.hset(match_key, "p2_id", accepter_id)
-                pipe.hset(match_key, "bet_pkr", str(bet_amount))
-                pipe.hset(match_key, "status", "CREATED")
-                pipe.hset(match_key, "mode", "challenge")
-                pipe.hset(match_key, "created_at", str(datetime.now()))
+                    try:
+                        await wallet.deduct_entry_fee(accepter_id, bet_amount)
+                    except HTTPException:
+                        await wallet.refund_user(challenger_id, bet_amount)
+                        error_msg = {"type": "ERROR", "message": "Insufficient funds for entry fee"}
+                        await sock.send(error_msg)
+                        await lobby_manager.send_personal_message({
+                            "type": "ERROR", 
+                            "message": "Opponent has insufficient funds. Fee refunded."
+                        }, challenger_id)
+                        continue
+
+                    # C. Success: Register Match in Redis
+                    match_id = f"match_{uuid.uuid4().hex[:8]}"
+                    match_key = MatchKeys.live(match_id)
+                    match_store = match_redis(match_id)
+                    await lobby_manager.update_status(user_id, "playing")
+                    await lobby_manager.update_status(challenger_id, "playing")
+
+                    # ✅ FIXED: Flattening the dictionary for Upstash compatibility
+                    # We pass the key-value pairs directly into hset
+                    pipe = match_store.pipeline()
+                    pipe.hset(match_key, "p1_id", challenger_id)
+                    pipe.hset(match_key, "p2_id", accepter_id)
+                    pipe.hset(match_key, "bet_pkr", str(bet_amount))
+                    pipe.hset(match_key, "status", "CREATED")
+                    pipe.hset(match_key, "mode", "challenge")
+                    pipe.hset(match_key, "created_at", str(datetime.now()))
                 
-                pipe.expire(match_key, 600) 
-                await asyncio.to_thread(pipe.exec)
-
-                start_msg = {
-                    "type": "MATCH_START", 
-                    "match_id": match_id,
-                    "mode": "challenge"
-                }
+                    pipe.expire(match_key, 600) 
+                    await asyncio.to_thread(pipe.exec)
+
+                    start_msg = {
+                        "type": "MATCH_START", 
+                        "match_id": match_id,
+                        "mode": "challenge"
+                    }
                 
-                await websocket.send_json(start_msg)
-                await lobby_manager.send_personal_message(start_msg, challenger_id)
+                    await sock.send(start_msg)
+                    await lobby_manager.send_personal_message(start_msg, challenger_id)
 
     except WebSocketDisconnect:
         pass 
@@ -4,8 +4,10 @@ import logging
 import random
 from fastapi import WebSocket, Query, status
 from app.db.redis import redis_mgr, redis_client
-from app.repositories.user_repo import UserRepository
-from app.repositories.match_repo import MatchRepository
+from app.db.keyspace import MatchKeys, match_redis
+from app.core.container import container
+from app.core.redis_budget import set_feature
+from app.repositories.ledger_repo import ENTRY_FEE, REFUND
 from app.services.game_redis import (
     get_user_from_token, 
     redis_lock_user, 
@@ -15,12 +17,15 @@ import httpx
 import os
 
 BOT_SERVER_URL = os.getenv("BOT_SERVER_URL", "http://127.0.0.1:10000")
+ENTRY_FEE_COUNTERS = {"entry_fees": 100.0}
+REFUND_COUNTERS = {"entry_fees": -100.0}
 logger = logging.getLogger("uvicorn.error")
 
 async def matchmaking_endpoint(websocket: WebSocket, token: str = Query(...)):
     await websocket.accept()
-    user_repo = UserRepository()
-    match_repo = MatchRepository()
+    set_feature("matchmaking")
+    user_repo = container.user_repo
+    match_repo = container.match_repo
     
     # 1. Identity & Auth
     user_id = await get_user_from_token(token)
@@ -45,14 +50,17 @@ async def matchmaking_endpoint(websocket: WebSocket, token: str = Query(...)):
         return
 
     matched_successfully = False 
+    fee_paid = False
     match_id = None
 
     try:
         # 3. Wallet Check & Initial Deduction
-        if not await user_repo.update_wallet(u_id_str, -100.0):
+        if not await user_repo.update_wallet(u_id_str, -100.0, counters=ENTRY_FEE_COUNTERS, entry_type=ENTRY_FEE):
             await websocket.send_json({"type": "ERROR", "message": "Insufficient Balance"})
             await websocket.close()
             return
+        # Only a committed deduction may be refunded below
+        fee_paid = True
 
         # 4. THE ATOMIC MOMENT (Lua Script)
         result = await redis_mgr.try_match_or_join(u_id_str)
@@ -66,9 +74,10 @@ async def matchmaking_endpoint(websocket: WebSocket, token: str = Query(...)):
             await asyncio.to_thread(redis_client.set, f"notify:{opponent_id}", match_id, ex=300)
             
             # 🔥 ADD THIS: Create the live key for Human vs Human matches
-            match_key = f"match:live:{match_id}"
+            match_key = MatchKeys.live(match_id)
+            match_store = match_redis(match_id)
             await asyncio.to_thread(
-                redis_client.hset, 
+                match_store.hset, 
                 match_key, 
                 values={ # Use 'mapping' to be safe
                     "p1_id": u_id_str,
@@ -77,7 +86,7 @@ async def matchmaking_endpoint(websocket: WebSocket, token: str = Query(...)):
                     "bet_amount": "100.0"
                 }
             )
-            await asyncio.to_thread(redis_client.expire, match_key, 120) # Match the 120s expiry
+            await asyncio.to_thread(match_store.expire, match_key, 120) # Match the 120s expiry
             
             await websocket.send_json({"type": "MATCH_FOUND", "match_id": match_id})
             matched_successfully = True
@@ -113,9 +122,10 @@ async def matchmaking_endpoint(websocket: WebSocket, token: str = Query(...)):
 
             await match_repo.create_match_record(match_id, bot_id, u_id_str, 100.0)
             
-            match_key = f"match:live:{match_id}"
+            match_key = MatchKeys.live(match_id)
+            match_store = match_redis(match_id)
             await asyncio.to_thread(
-                redis_client.hset, 
+                match_store.hset, 
                 match_key, 
                 values={
                     "p1_id": u_id_str,
@@ -124,7 +134,7 @@ async def matchmaking_endpoint(websocket: WebSocket, token: str = Query(...)):
                     "bet_amount": "100.0"
                 }
             )
-            await asyncio.to_thread(redis_client.expire, match_key, 120)
+            await asyncio.to_thread(match_store.expire, match_key, 120)
             logger.info(f"📡 Sending wake-up call to Bot Server for match {match_id}")
             try:
                 async with httpx.AsyncClient() as client:
@@ -152,8 +162,8 @@ async def matchmaking_endpoint(websocket: WebSocket, token: str = Query(...)):
         # PROFESSIONAL FIX: Ensure the lock is released first
         await redis_release_lock(u_id_str)
         
-        # If we didn't confirm a successful match, we MUST attempt a refund
-        if not matched_successfully:
+        # If we took the fee but didn't confirm a successful match, we MUST attempt a refund
+        if fee_paid and not matched_successfully:
             
             try:
                 # Attempt to remove from pool
@@ -164,14 +174,14 @@ async def matchmaking_endpoint(websocket: WebSocket, token: str = Query(...)):
                 
                 # If they were in the pool OR they were matched but never played
                 if removed or notif:
-                    await user_repo.update_wallet(u_id_str, 100.0)
+                    await user_repo.update_wallet(u_id_str, 100.0, counters=REFUND_COUNTERS, entry_type=REFUND, ref=match_id)
                     if notif:
                         await asyncio.to_thread(redis_client.delete, f"notify:{u_id_str}")
                     logger.info(f"✅ Emergency Refund for {u_id_str} after WebSocket Error")
                 else:
                     # Final Fallback: If we deducted but can't find them in Redis, 
                     # they are entitled to a refund.
-                    await user_repo.update_wallet(u_id_str, 100.0)
+                    await user_repo.update_wallet(u_id_str, 100.0, counters=REFUND_COUNTERS, entry_type=REFUND, ref=match_id)
                     logger.warning(f"🚨 Forced Refund for {u_id_str} due to state mismatch")
             except Exception as refund_err:
                 logger.error(f"❌ CRITICAL: Refund failed during cleanup: {refund_err}")
\ No newline at end of file
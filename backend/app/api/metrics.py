@@ -0,0 +1,21 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from app.core.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics(
+    token: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None)
+):
+    """Prometheus scrape endpoint. Guarded by METRICS_TOKEN when one is configured."""
+    if settings.METRICS_TOKEN:
+        supplied = token or (authorization or "").replace("Bearer ", "", 1)
+        if not hmac.compare_digest(supplied, settings.METRICS_TOKEN):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -5,6 +5,7 @@ import jwt
 
 # Import the new Repository
 from app.repositories.report_repo import ReportRepository
+from app.core.container import get_report_repo
 
 router = APIRouter()
 
@@ -36,7 +37,7 @@ async def verify_token(authorization: str = Header(...)):
 
 # 4. API Endpoint (Saves to DB)
 @router.post("/report")
-async def submit_report(report: ReportModel, user_id: str = Depends(verify_token)):
+async def submit_report(report: ReportModel, user_id: str = Depends(verify_token), repo: ReportRepository = Depends(get_report_repo)):
     
     # Prepare data for the repository
     report_data = {
@@ -47,7 +48,6 @@ async def submit_report(report: ReportModel, user_id: str = Depends(verify_token
     }
     
     # Save to MongoDB
-    repo = ReportRepository()
     await repo.create_report(report_data)
 
     print(f"✅ REPORT SAVED to DB for User: {user_id}")
@@ -55,8 +55,7 @@ async def submit_report(report: ReportModel, user_id: str = Depends(verify_token
     return {"status": "saved", "message": "Report submitted successfully"}
 
 @router.get("/all")
-async def get_all_reports(user_id: str = Depends(verify_token)):
+async def get_all_reports(user_id: str = Depends(verify_token), repo: ReportRepository = Depends(get_report_repo)):
     # In a real app, you should check if user_id is an Admin here!
-    repo = ReportRepository()
     reports = await repo.get_all_reports()
     return reports
\ No newline at end of file
@@ -1,16 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from app.services.wallet_service import WalletService
-from app.repositories.user_repo import UserRepository
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from app.core.container import container
 from app.core.deps import get_current_user 
 from app.models.deposit import DepositCreate, WithdrawalRequest 
 from app.db.redis import redis_client  # 🚀 Shared Brain for Locking
+from app.repositories.ledger_repo import WITHDRAWAL
+from app.services.ledger_counters import ledger_counters
 from bson import ObjectId
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 router = APIRouter()
-wallet_service = WalletService()
-user_repo = UserRepository()
+wallet_service = container.wallet_service
+user_repo = container.user_repo
 
 # --- 🚀 USER ROUTES ONLY ---
 
@@ -56,24 +57,36 @@ async def request_withdrawal(data: WithdrawalRequest, current_user: dict = Depen
         # 🛡️ ATOMIC BALANCE CHECK & DEDUCT
         # This is the most critical line. It prevents the user from withdrawing money they don't have.
         # It deducts the balance immediately. If the admin rejects it later, we refund it.
-        res = await user_repo.collection.update_one(
-            {"_id": user_oid, "wallet_balance": {"$gte": data.amount}},
-            {"$inc": {"wallet_balance": -data.amount}}
-        )
-        
-        if res.modified_count == 0:
+        # The debit, its ledger entry and the withdrawal document commit together,
+        # so the ledger never references a withdrawal admins cannot see.
+        withdrawal_oid = ObjectId()
+
+        async def debit_and_record(s):
+            if not await user_repo.update_wallet(
+                user_id, -data.amount, session=s,
+                entry_type=WITHDRAWAL, ref=str(withdrawal_oid)
+            ):
+                return False
+            await db["withdrawals"].insert_one({
+                "_id": withdrawal_oid,
+                "user_id": user_oid,
+                "username": current_user.get("username", "Unknown"), # Useful for Admin Dashboard
+                "amount": data.amount, 
+                "method": data.method,
+                "account_number": data.account_number, 
+                "account_name": data.account_name,
+                "status": "PENDING", 
+                "created_at": datetime.now(timezone.utc)
+            }, session=s)
+            return True
+
+        async with await db.client.start_session() as session:
+            deducted = await session.with_transaction(debit_and_record)
+
+        if not deducted:
             raise HTTPException(status_code=400, detail="Insufficient balance")
 
-        await db["withdrawals"].insert_one({
-            "user_id": user_oid,
-            "username": current_user.get("username", "Unknown"), # Useful for Admin Dashboard
-            "amount": data.amount, 
-            "method": data.method,
-            "account_number": data.account_number, 
-            "account_name": data.account_name,
-            "status": "PENDING", 
-            "created_at": datetime.now(timezone.utc)
-        })
+        await ledger_counters.bump(liquidity=-data.amount, withdrawals_pending=data.amount)
         return {"status": "success"}
     
     finally:
@@ -89,7 +102,6 @@ async def claim_bonus(payload: dict, current_user = Depends(get_current_user)):
     if not code:
         raise HTTPException(status_code=400, detail="Referral code is required")
         
-    wallet_service = WalletService()
     
     # 🚀 TIP: current_user from get_current_user is a dict. 
     # Ensure it doesn't contain raw ObjectIds before passing if your service doesn't handle them.
@@ -110,38 +122,29 @@ async def claim_bonus(payload: dict, current_user = Depends(get_current_user)):
 @router.get("/history")
 async def get_transaction_history(current_user: dict = Depends(get_current_user)):
     """
-    Fetches and combines both deposits and withdrawals into a single timeline.
+    Legacy timeline (plain list) for existing clients: the first page of
+    /history/page with pending items pinned to the top.
     """
-    db = user_repo.collection.database
-    user_id = ObjectId(current_user["id"])
-
-    # 1. Fetch latest 50 of each type
-    deposits = await db["deposits"].find({"user_id": user_id}).sort("created_at", -1).to_list(50)
-    withdrawals = await db["withdrawals"].find({"user_id": user_id}).sort("created_at", -1).to_list(50)
+    history, _ = await wallet_service.get_history_page(current_user["id"], limit=50)
 
-    history = []
-    
-    # 2. Standardize Deposit objects
-    for d in deposits:
-        history.append({
-            "type": "DEPOSIT",
-            "amount": d["amount"],
-            "status": d["status"],
-            "trx_id": d.get("trx_id"),
-            "created_at": d["created_at"]
-        })
-
-    # 3. Standardize Withdrawal objects
-    for w in withdrawals:
-        history.append({
-            "type": "WITHDRAWAL",
-            "amount": w["amount"],
-            "status": w["status"],
-            "account_number": w.get("account_number"),
-            "created_at": w["created_at"]
-        })
-
-    # 4. Sort the combined list by date (newest first)
+    # Sort the page by status then date (newest first), as clients expect
     history.sort(key=lambda x: (x.get("status") == "PENDING", x.get("created_at", datetime.min)), reverse=True)
     
-    return history
\ No newline at end of file
+    return history
+
+@router.get("/history/page")
+async def get_transaction_history_page(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    type: Optional[str] = Query(None, description="DEPOSIT or WITHDRAWAL"),
+    entry_status: Optional[str] = Query(None, alias="status", description="PENDING, COMPLETED or REJECTED"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    🚀 Keyset-paginated history. Pass back `next_cursor` to load older items.
+    """
+    types = [type.upper()] if type else None
+    items, next_cursor = await wallet_service.get_history_page(
+        current_user["id"], limit=limit, cursor=cursor, types=types, status=entry_status
+    )
+    return {"items": items, "next_cursor": next_cursor}
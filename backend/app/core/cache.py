@@ -0,0 +1,130 @@
+from app.core.serialization import dumps, loads
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Union
+from app.db.redis import redis_client
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 🧊 STALE-WHILE-REVALIDATE CACHE ---
+# Each cached value uses two keys:
+#   "{key}"        -> JSON payload, lives for ttl + stale_ttl
+#   "{key}:fresh"  -> marker, lives for ttl
+# A missing marker means "serve what we have, refresh in the background".
+# Recomputation is single-flight: one task per key inside a worker,
+# and a Redis lock ("lock:cache:{key}") across workers.
+
+_inflight: Dict[str, asyncio.Task] = {}
+
+KeyBuilder = Union[str, Callable[..., str]]
+
+
+def _fresh_key(cache_key: str) -> str:
+    return f"{cache_key}:fresh"
+
+
+async def _store(cache_key: str, data: Any, ttl: int, stale_ttl: int):
+    pipe = redis_client.pipeline()
+    pipe.set(cache_key, dumps(data), ex=ttl + stale_ttl)
+    pipe.set(_fresh_key(cache_key), "1", ex=ttl)
+    await asyncio.to_thread(pipe.exec)
+
+
+async def _recompute(
+    cache_key: str,
+    compute: Callable[[], Awaitable[Any]],
+    ttl: int,
+    stale_ttl: int,
+    lock_ttl: int,
+    wait_for_peer: bool
+):
+    lock_key = f"lock:cache:{cache_key}"
+    got_lock = await asyncio.to_thread(redis_client.set, lock_key, "1", ex=lock_ttl, nx=True)
+
+    if not got_lock:
+        if not wait_for_peer:
+            # Another worker is already refreshing; the stale copy is good enough
+            return None
+        # Give the lock holder a moment to publish its result
+        for _ in range(20):
+            await asyncio.sleep(0.1)
+            raw = await asyncio.to_thread(redis_client.get, cache_key)
+            if raw:
+                return loads(raw)
+
+    try:
+        data = await compute()
+        await _store(cache_key, data, ttl, stale_ttl)
+        return data
+    finally:
+        if got_lock:
+            await asyncio.to_thread(redis_client.delete, lock_key)
+
+
+def _single_flight(cache_key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+    task = _inflight.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(factory())
+        _inflight[cache_key] = task
+        task.add_done_callback(lambda _t: _inflight.pop(cache_key, None))
+    return task
+
+
+def _log_refresh_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error(f"Background cache refresh failed: {task.exception()}")
+
+
+async def get_or_compute(
+    cache_key: str,
+    compute: Callable[[], Awaitable[Any]],
+    ttl: int = 30,
+    stale_ttl: int = 300,
+    lock_ttl: int = 15
+):
+    """
+    Returns a cached value, serving stale data while one task refreshes it.
+    Only a cold miss makes the caller wait for the recomputation.
+    """
+    raw, fresh = await asyncio.to_thread(redis_client.mget, cache_key, _fresh_key(cache_key))
+
+    if raw:
+        if not fresh and cache_key not in _inflight:
+            task = _single_flight(
+                cache_key,
+                lambda: _recompute(cache_key, compute, ttl, stale_ttl, lock_ttl, wait_for_peer=False)
+            )
+            task.add_done_callback(_log_refresh_error)
+        return loads(raw)
+
+    task = _single_flight(
+        cache_key,
+        lambda: _recompute(cache_key, compute, ttl, stale_ttl, lock_ttl, wait_for_peer=True)
+    )
+    return await asyncio.shield(task)
+
+
+async def invalidate(cache_key: str):
+    """
+    Marks a value as stale instead of deleting it, so the next reader
+    still gets an instant answer and triggers a single background refresh.
+    """
+    await asyncio.to_thread(redis_client.delete, _fresh_key(cache_key))
+
+
+def cached(key: KeyBuilder, ttl: int = 30, stale_ttl: int = 300, lock_ttl: int = 15):
+    """
+    Decorator for async read endpoints/functions with JSON-safe results.
+    `key` is either a fixed string or a callable receiving the same kwargs
+    as the wrapped function.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs) if callable(key) else key
+            return await get_or_compute(
+                cache_key, lambda: func(*args, **kwargs), ttl=ttl, stale_ttl=stale_ttl, lock_ttl=lock_ttl
+            )
+        return wrapper
+    return decorator
@@ -34,7 +34,41 @@ class Settings(BaseSettings):
     MIN_REQUIRED_MOBILE_VERSION: str = Field(default="1.0.0")
     MOBILE_DOWNLOAD_URL: str = Field(default="https://www.brainbufferofficial.com")
 
-    # 6. Environment Config
+    # 6. Ledger Counters (0 disables the background reconciliation job)
+    LEDGER_RECONCILE_INTERVAL_SECONDS: int = Field(default=3600)
+    WALLET_SNAPSHOT_INTERVAL_SECONDS: int = Field(default=86400)
+    BULK_APPROVAL_CONCURRENCY: int = Field(default=8)
+    BULK_CLAIM_TIMEOUT_SECONDS: int = Field(default=600)  # PROCESSING items older than this are requeued (0 disables)
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: int = Field(default=300)
+
+    # 7. Instrumentation (slow-operation log thresholds; 0 disables)
+    SLOW_REDIS_MS: float = Field(default=250)
+    SLOW_MONGO_MS: float = Field(default=500)
+    SLOW_HTTP_MS: float = Field(default=1500)
+    SLOW_WS_MS: float = Field(default=500)
+    LOOP_WATCHDOG_INTERVAL_MS: float = Field(default=100)  # Heartbeat period; 0 disables the stall detector
+    LOOP_STALL_THRESHOLD_MS: float = Field(default=200)
+    METRICS_TOKEN: str = Field(default="")  # If set, /metrics requires ?token= or a Bearer header
+    REDIS_USAGE_FLUSH_SECONDS: int = Field(default=60)
+    REDIS_DAILY_COMMAND_BUDGET: int = Field(default=0)  # Upstash plan limit, for the usage report (0 = unset)
+
+    # 8. WebSocket Compression (opt-in per socket via the "+deflate" subprotocol)
+    WS_COMPRESSION_ENABLED: bool = Field(default=True)
+    WS_COMPRESS_MIN_BYTES: int = Field(default=512)  # Smaller payloads are sent raw
+    WS_COMPRESSION_LEVEL: int = Field(default=6)  # zlib level, 1 (fast) - 9 (small)
+
+    # 9. Match-State Sharding (comma-separated Upstash REST endpoints; empty = primary Redis only)
+    REDIS_MATCH_SHARD_URLS: str = Field(default="")
+    REDIS_MATCH_SHARD_TOKENS: str = Field(default="")
+
+    # 10. In-Process Match Authority (both players on one worker)
+    MATCH_AUTHORITY_ENABLED: bool = Field(default=True)
+    MATCH_SNAPSHOT_SECONDS: float = Field(default=5)  # Redis snapshot period for crash recovery
+
+    # 11. Scoring
+    SCORING_ACCEPT_SCORE_UPDATE: bool = Field(default=False)  # Old clients' absolute scores; bots' are always accepted
+
+    # 12. Environment Config
     model_config = SettingsConfigDict(
         env_file=".env", 
         env_file_encoding='utf-8',
@@ -0,0 +1,91 @@
+from typing import Any, Callable, Dict
+from app.repositories.user_repo import UserRepository
+from app.repositories.match_repo import MatchRepository
+from app.repositories.friend_repo import FriendRepository
+from app.repositories.report_repo import ReportRepository
+from app.services.wallet_service import WalletService
+from app.services.auth_service import AuthService
+from app.services.revenue_service import RevenueService
+import logging
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class Container:
+    """
+    📦 Long-lived repositories and services, shared by every request,
+    socket and background loop on this worker.
+
+    Instances are built on first access and warmed in the lifespan hook
+    (after Mongo connects). Tests swap any of them with override().
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[["Container"], Any]] = {
+            "user_repo": lambda c: UserRepository(),
+            "match_repo": lambda c: MatchRepository(),
+            "report_repo": lambda c: ReportRepository(),
+            # These resolve collection handles in __init__, so they need Mongo up
+            "friend_repo": lambda c: FriendRepository(),
+            "revenue_service": lambda c: RevenueService(user_repo=c.user_repo),
+            "wallet_service": lambda c: WalletService(user_repo=c.user_repo),
+            "auth_service": lambda c: AuthService(user_repo=c.user_repo),
+        }
+        self._instances: Dict[str, Any] = {}
+        self._overrides: Dict[str, Any] = {}
+
+    def resolve(self, name: str):
+        if name in self._overrides:
+            return self._overrides[name]
+        if name not in self._instances:
+            self._instances[name] = self._factories[name](self)
+        return self._instances[name]
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not found normally, i.e. the registered names
+        if name.startswith("_") or name not in self._factories:
+            raise AttributeError(name)
+        return self.resolve(name)
+
+    def init(self):
+        """Builds every instance up front so the first request pays nothing."""
+        for name in self._factories:
+            self.resolve(name)
+        logger.info(f"📦 Container ready: {', '.join(self._factories)}")
+
+    def reset(self):
+        self._instances.clear()
+
+    # --- 🧪 TEST HOOKS ---
+    def override(self, name: str, instance: Any):
+        if name not in self._factories:
+            raise KeyError(f"Unknown dependency: {name}")
+        self._overrides[name] = instance
+
+    def clear_overrides(self):
+        self._overrides.clear()
+
+
+# Global instance
+container = Container()
+
+
+# --- 🔌 FastAPI providers (also overridable via app.dependency_overrides) ---
+# async so FastAPI resolves them on the event loop, not via a threadpool hop
+async def get_user_repo() -> UserRepository:
+    return container.user_repo
+
+async def get_match_repo() -> MatchRepository:
+    return container.match_repo
+
+async def get_friend_repo() -> FriendRepository:
+    return container.friend_repo
+
+async def get_report_repo() -> ReportRepository:
+    return container.report_repo
+
+async def get_wallet_service() -> WalletService:
+    return container.wallet_service
+
+async def get_auth_service() -> AuthService:
+    return container.auth_service
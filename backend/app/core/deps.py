@@ -2,18 +2,16 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.core.security import decode_access_token
 from app.repositories.user_repo import UserRepository
+from app.repositories.projections import Fields, UserFields
 from app.db.redis import redis_mgr
+from app.core.redis_budget import redis_budget, redis_feature
+from app.core.container import get_user_repo
 from app.core.config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
-async def get_user_repo():
-    return UserRepository()
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    repo: UserRepository = Depends(get_user_repo)
-):
+async def _resolve_user(token: str, repo: UserRepository, fields: Fields):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Session expired or invalid. Please log in again.",
@@ -29,15 +27,31 @@ async def get_current_user(
         raise credentials_exception
         
     # Heartbeat for online status
-    await redis_mgr.set_player_online(user_id)
+    redis_budget.note_user(user_id)
+    with redis_feature("auth"):
+        await redis_mgr.set_player_online(user_id)
     
-    user = await repo.get_by_id(user_id)
+    user = await repo.get_by_id(user_id, fields)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found.")
     
     user["id"] = str(user["_id"])
     return user
 
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    repo: UserRepository = Depends(get_user_repo)
+):
+    """Session fields only; recent_matches and credential hashes are not loaded."""
+    return await _resolve_user(token, repo, UserFields.SESSION)
+
+async def get_current_user_profile(
+    token: str = Depends(oauth2_scheme),
+    repo: UserRepository = Depends(get_user_repo)
+):
+    """Session fields plus recent_matches, for the profile screen."""
+    return await _resolve_user(token, repo, UserFields.PROFILE)
+
 # --- 🚀 NEW: EMAIL VERIFICATION GATE ---
 async def require_verified_user(current_user: dict = Depends(get_current_user)):
     """
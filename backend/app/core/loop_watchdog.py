@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("uvicorn.error")
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MAX_SITES = 200       # Distinct call sites kept; the rarest is evicted beyond this
+STACK_DEPTH = 15      # Frames kept from the most recent stack per site
+
+metrics.describe("event_loop_lag_seconds", "How late the event loop woke the watchdog heartbeat")
+metrics.describe("event_loop_stalls_total", "Heartbeats delayed past LOOP_STALL_THRESHOLD_MS")
+metrics.describe("event_loop_max_lag_seconds", "Worst event loop lag since start or last reset")
+
+
+def _call_site(stack: traceback.StackSummary) -> str:
+    """Innermost frame inside our own code (falls back to the innermost frame)."""
+    for frame in reversed(stack):
+        if frame.filename.startswith(APP_ROOT) and frame.filename != __file__ and "site-packages" not in frame.filename:
+            return f"{os.path.relpath(frame.filename, APP_ROOT)}:{frame.lineno} in {frame.name}"
+    if stack:
+        frame = stack[-1]
+        return f"{os.path.basename(frame.filename)}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+class LoopWatchdog:
+    """
+    ⏱️ Event-loop stall detector.
+
+    A heartbeat coroutine sleeps for a fixed interval and measures how late
+    it wakes up (loop lag). A daemon thread watches the heartbeat: when it
+    falls behind by more than the threshold, the loop is blocked *right now*,
+    so the thread snapshots the loop thread's stack and attributes the stall
+    to the innermost frame in our code. Offenders are aggregated by call site.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._beat = time.monotonic()
+        self._pending: Optional[Tuple[str, List[str]]] = None
+        self._sites: Dict[str, dict] = {}
+        self._stalls = 0
+        self._max_lag = 0.0
+
+    # --- 💓 HEARTBEAT (runs on the loop) ---
+    async def _heartbeat(self, interval: float, threshold: float):
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            lag = max(time.perf_counter() - expected, 0.0)
+            self._beat = time.monotonic()
+            metrics.observe("event_loop_lag_seconds", lag)
+            if lag >= threshold:
+                self._close_stall(lag)
+
+    def _close_stall(self, lag: float):
+        with self._lock:
+            site, stack = self._pending or ("unattributed (ended before capture)", [])
+            self._pending = None
+            self._stalls += 1
+            self._max_lag = max(self._max_lag, lag)
+            entry = self._sites.get(site)
+            if entry is None:
+                if len(self._sites) >= MAX_SITES:
+                    del self._sites[min(self._sites, key=lambda s: self._sites[s]["total_ms"])]
+                entry = self._sites[site] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            lag_ms = lag * 1000
+            entry["count"] += 1
+            entry["total_ms"] += lag_ms
+            entry["max_ms"] = max(entry["max_ms"], lag_ms)
+            entry["last_seen"] = datetime.now(timezone.utc).isoformat()
+            if stack:
+                entry["stack"] = stack
+        metrics.inc("event_loop_stalls_total")
+        metrics.set_gauge("event_loop_max_lag_seconds", self._max_lag)
+        logger.warning(f"⏱️ Event loop blocked {lag * 1000:.0f}ms at {site}")
+
+    # --- 🔍 WATCHER (runs in a thread, so it still sees a blocked loop) ---
+    def _watch(self, interval: float, threshold: float):
+        while not self._stop.wait(interval / 2):
+            behind = time.monotonic() - self._beat - interval
+            if behind < threshold or self._pending is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            with self._lock:
+                if self._pending is None:
+                    self._pending = (_call_site(stack), stack.format()[-STACK_DEPTH:])
+
+    # --- 📋 REPORTING ---
+    def report(self, limit: int = 20) -> dict:
+        with self._lock:
+            offenders = sorted(self._sites.items(), key=lambda kv: kv[1]["total_ms"], reverse=True)[:limit]
+            return {
+                "running": self._task is not None,
+                "threshold_ms": settings.LOOP_STALL_THRESHOLD_MS,
+                "stalls_total": self._stalls,
+                "max_lag_ms": round(self._max_lag * 1000, 1),
+                "offenders": [
+                    {
+                        "site": site,
+                        "count": e["count"],
+                        "total_ms": round(e["total_ms"], 1),
+                        "avg_ms": round(e["total_ms"] / e["count"], 1),
+                        "max_ms": round(e["max_ms"], 1),
+                        "last_seen": e.get("last_seen"),
+                        "stack": e.get("stack", []),
+                    }
+                    for site, e in offenders
+                ],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._sites.clear()
+            self._stalls = 0
+            self._max_lag = 0.0
+        metrics.set_gauge("event_loop_max_lag_seconds", 0.0)
+
+    # --- ⚙️ LIFECYCLE ---
+    def start(self):
+        interval = settings.LOOP_WATCHDOG_INTERVAL_MS / 1000
+        threshold = settings.LOOP_STALL_THRESHOLD_MS / 1000
+        if interval <= 0 or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(interval, threshold))
+        self._thread = threading.Thread(target=self._watch, args=(interval, threshold), name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+# Global instance
+loop_watchdog = LoopWatchdog()
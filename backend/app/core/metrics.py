@@ -0,0 +1,144 @@
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 📊 IN-PROCESS METRICS ---
+# Histograms and counters keyed by (name, labels), rendered in the
+# Prometheus text format at /metrics. Sync Redis calls run in worker
+# threads, so every update takes the registry lock.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+INF_LABEL = 'le="+Inf"'
+
+
+def _key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _fmt_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, seconds: float, labels: Optional[Dict[str, str]] = None):
+        key = _key(labels)
+        with self._lock:
+            hist = self._histograms.setdefault(name, {}).get(key)
+            if hist is None:
+                hist = self._histograms[name][key] = _Histogram(len(self.buckets))
+            hist.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            hist.sum += seconds
+            hist.count += 1
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None):
+        key = _key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_key(labels)] = value
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines += self._header(name, "histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, n in zip(self.buckets, h.counts):
+                        cumulative += n
+                        le = 'le="%s"' % bound
+                        lines.append(f"{name}_bucket{_fmt_labels(key, le)} {cumulative}")
+                    lines.append(f"{name}_bucket{_fmt_labels(key, INF_LABEL)} {h.count}")
+                    lines.append(f"{name}_sum{_fmt_labels(key)} {h.sum:.6f}")
+                    lines.append(f"{name}_count{_fmt_labels(key)} {h.count}")
+            for kind, store in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(store.items()):
+                    lines += self._header(name, kind)
+                    for key, value in series.items():
+                        lines.append(f"{name}{_fmt_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name: str, kind: str):
+        out = [f"# HELP {name} {self._help[name]}"] if name in self._help else []
+        return out + [f"# TYPE {name} {kind}"]
+
+
+metrics = MetricsRegistry()
+
+metrics.describe("redis_command_seconds", "Redis command latency by command")
+metrics.describe("mongo_command_seconds", "MongoDB command latency by collection and command")
+metrics.describe("http_request_seconds", "HTTP request latency by route template")
+metrics.describe("ws_message_seconds", "WebSocket message handling time by endpoint and message type")
+metrics.describe("slow_operations_total", "Operations over their slow-log threshold")
+
+
+# --- 🐢 SLOW-OPERATION LOG ---
+def _threshold_ms(kind: str) -> float:
+    return {
+        "redis": settings.SLOW_REDIS_MS,
+        "mongo": settings.SLOW_MONGO_MS,
+        "http": settings.SLOW_HTTP_MS,
+        "ws": settings.SLOW_WS_MS,
+    }.get(kind, 0)
+
+
+def record(kind: str, metric: str, seconds: float, labels: Dict[str, str]):
+    """Observe a timing and log it if it crossed the slow threshold for its kind."""
+    metrics.observe(metric, seconds, labels)
+    threshold = _threshold_ms(kind)
+    if threshold and seconds * 1000 >= threshold:
+        metrics.inc("slow_operations_total", labels={"kind": kind})
+        desc = " ".join(f"{k}={v}" for k, v in labels.items())
+        logger.warning(f"🐢 Slow {kind} op ({seconds * 1000:.1f}ms >= {threshold}ms): {desc}")
+
+
+@contextmanager
+def timed(kind: str, metric: str, **labels: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, metric, time.perf_counter() - start, labels)
+
+
+def ws_timer(endpoint: str, msg_type: Optional[str], known: Iterable[str] = ()):
+    """
+    Times the handling of one inbound WebSocket message. Types outside `known`
+    are bucketed as "other" so clients can't mint new label values.
+    """
+    label = msg_type if msg_type in known else "other"
+    return timed("ws", "ws_message_seconds", endpoint=endpoint, type=label)
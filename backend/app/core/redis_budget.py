@@ -0,0 +1,90 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter
+from typing import Dict, Set, Tuple
+from app.core.metrics import metrics
+
+# --- 🧾 REDIS COMMAND ACCOUNTING ---
+# Every command sent through redis_client is charged to the feature label
+# active in the current context. asyncio tasks and asyncio.to_thread copy
+# the context, so tagging an endpoint (or a loop) once covers everything
+# it spawns. Untagged calls land in "other".
+FEATURES = (
+    "matchmaking", "gameplay", "gameplay_monitor", "lobby", "lobby_heartbeat",
+    "auth", "leaderboard", "wallet", "friends", "admin", "background", "other",
+)
+
+# First path segment after /api/ -> feature, for HTTP routes
+ROUTE_FEATURES = {
+    "auth": "auth",
+    "leaderboard": "leaderboard",
+    "wallet": "wallet",
+    "friends": "friends",
+    "admin": "admin",
+    "game": "matchmaking",
+}
+
+_feature: ContextVar[str] = ContextVar("redis_feature", default="other")
+
+metrics.describe("redis_commands_total", "Redis commands sent, by feature")
+
+
+def set_feature(name: str):
+    """Tags the rest of the current task (and tasks it creates) with a feature."""
+    _feature.set(name)
+
+
+@contextmanager
+def redis_feature(name: str):
+    """Tags just the enclosed block, e.g. a shared helper called from many places."""
+    token = _feature.set(name)
+    try:
+        yield
+    finally:
+        _feature.reset(token)
+
+
+def feature_for_path(path: str) -> str:
+    parts = path.strip("/").split("/")
+    if len(parts) >= 2 and parts[0] == "api":
+        return ROUTE_FEATURES.get(parts[1], "other")
+    return "other"
+
+
+class RedisBudget:
+    """Per-worker counters, drained periodically by the redis_usage service."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands: Counter = Counter()   # (feature, command) -> n
+        self._users: Set[str] = set()
+
+    def count(self, command: str, n: int = 1):
+        feature = _feature.get()
+        with self._lock:
+            self._commands[(feature, command)] += n
+        metrics.inc("redis_commands_total", n, {"feature": feature})
+
+    def note_user(self, user_id: str):
+        """Marks a user as active, for commands-per-active-user."""
+        if user_id:
+            with self._lock:
+                self._users.add(str(user_id))
+
+    def drain(self) -> Tuple[Dict[Tuple[str, str], int], Set[str]]:
+        with self._lock:
+            commands, users = dict(self._commands), self._users
+            self._commands = Counter()
+            self._users = set()
+        return commands, users
+
+    def restore(self, commands: Dict[Tuple[str, str], int], users: Set[str]):
+        """Puts drained counts back after a failed flush so nothing is lost."""
+        with self._lock:
+            self._commands.update(commands)
+            self._users |= users
+
+
+# Global instance
+redis_budget = RedisBudget()
@@ -0,0 +1,59 @@
+import json
+import datetime as _dt
+from decimal import Decimal
+from typing import Any, Union
+from bson import ObjectId
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib with the same output types
+    orjson = None
+
+# --- ⚡ JSON SERIALIZATION ---
+# One place for every JSON payload: API responses, Redis blobs, WS frames.
+# orjson handles datetime natively (ISO 8601, same as .isoformat()), the
+# default hook covers the Mongo types, and anything else becomes str(),
+# which is what the Redis cache used to do with default=str.
+_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def _default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (_dt.datetime, _dt.date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    to_decimal = getattr(obj, "to_decimal", None)  # bson Decimal128
+    if to_decimal is not None:
+        return float(to_decimal())
+    return str(obj)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+def dumps(obj: Any) -> str:
+    """JSON text, e.g. for Redis values."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+    return json.dumps(obj, default=_default, separators=(",", ":"))
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: same media type as JSONResponse, orjson render."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
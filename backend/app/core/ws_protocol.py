@@ -0,0 +1,265 @@
+import time
+import zlib
+import struct
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+from fastapi import WebSocket, WebSocketDisconnect
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.serialization import dumps, dumps_bytes, loads
+
+try:
+    import msgpack
+except ImportError:  # Optional: the msgpack subprotocol is only offered when installed
+    msgpack = None
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 📦 WEBSOCKET FRAME PROTOCOLS ---
+# Clients pick one via Sec-WebSocket-Protocol; the server takes the first
+# offered protocol it supports. No header (old clients) means JSON text.
+SUBPROTOCOL_JSON = "bb.json.v1"
+SUBPROTOCOL_MSGPACK = "bb.msgpack.v1"
+SUBPROTOCOL_BINARY = "bb.bin.v1"
+
+# --- 🗜️ COMPRESSION ---
+# Any protocol + DEFLATE_SUFFIX (e.g. "bb.json.v1+deflate") turns on
+# per-message compression. Payloads of WS_COMPRESS_MIN_BYTES or more are
+# raw-deflated (no shared context, so frames decode independently); smaller
+# ones go uncompressed so PONGs cost no CPU. Binary frames then carry a
+# flag byte: 0x00 raw, 0x01 deflated. JSON text frames are always raw.
+DEFLATE_SUFFIX = "+deflate"
+FLAG_RAW = b"\x00"
+FLAG_DEFLATE = b"\x01"
+MAX_INBOUND_BYTES = 64 * 1024  # Cap on inflated client frames
+
+# Short type codes shared by the msgpack and binary protocols
+TYPE_CODES = {
+    "PING": 1, "PONG": 2, "SCORE_UPDATE": 3, "GAME_OVER": 4, "SYNC_STATE": 5,
+    "GAME_START": 6, "RESULT": 7, "MATCH_CANCELLED": 8, "ERROR": 9,
+    "ROUND_SUBMIT": 10,
+}
+CODE_TYPES = {v: k for k, v in TYPE_CODES.items()}
+
+metrics.describe("ws_sessions_total", "WebSocket sessions by negotiated frame protocol")
+metrics.describe("ws_bytes_sent_total", "WebSocket payload bytes sent (after compression) by frame protocol")
+metrics.describe("ws_compress_input_bytes_total", "Bytes fed to the per-message compressor")
+metrics.describe("ws_compress_output_bytes_total", "Bytes produced by the per-message compressor")
+metrics.describe("ws_compress_seconds", "Time spent deflating one outbound message")
+metrics.describe("ws_frames_sent_total", "Outbound frames by whether they were compressed")
+metrics.describe("ws_bad_frames_total", "Inbound frames dropped because they did not decode")
+
+
+class FrameError(ValueError):
+    """A client frame that doesn't decode. Readers drop it and keep the session."""
+
+
+class JsonCodec:
+    name = SUBPROTOCOL_JSON
+    binary = False
+
+    def encode(self, msg: Dict[str, Any]) -> str:
+        return dumps(msg)
+
+    def decode(self, data) -> Dict[str, Any]:
+        return _as_message(loads(data))
+
+
+def _as_message(body) -> Dict[str, Any]:
+    if not isinstance(body, dict):
+        raise FrameError("Frame is not an object")
+    return body
+
+
+class MsgpackCodec:
+    """Same messages as JSON, with "type" swapped for a small int under "t"."""
+    name = SUBPROTOCOL_MSGPACK
+    binary = True
+
+    def encode(self, msg: Dict[str, Any]) -> bytes:
+        body = dict(msg)
+        msg_type = body.pop("type", None)
+        body["t"] = TYPE_CODES.get(msg_type, msg_type)
+        return msgpack.packb(body, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        body = _as_message(msgpack.unpackb(data, raw=False))
+        code = body.pop("t", None)
+        body["type"] = CODE_TYPES.get(code, code)
+        return body
+
+
+class BinaryCodec:
+    """
+    Fixed layouts for the per-tick messages; anything else is a 0x00 byte
+    followed by UTF-8 JSON (GAME_START, RESULT, ...).
+
+        PING / PONG / GAME_OVER   [code:u8]
+        SCORE_UPDATE              [code:u8][score:i32]
+        SYNC_STATE                [code:u8][your_score:i32][opponent_score:i32]
+        ROUND_SUBMIT              [code:u8][round:u8][count:u8][tap:u8 * count]
+    """
+    name = SUBPROTOCOL_BINARY
+    binary = True
+    JSON_FRAME = 0
+    LAYOUTS = {
+        "PING": (struct.Struct(">B"), ()),
+        "PONG": (struct.Struct(">B"), ()),
+        "GAME_OVER": (struct.Struct(">B"), ()),
+        "SCORE_UPDATE": (struct.Struct(">Bi"), ("score",)),
+        "SYNC_STATE": (struct.Struct(">Bii"), ("your_score", "opponent_score")),
+    }
+    ROUND_HEADER = struct.Struct(">BBB")
+
+    def encode(self, msg: Dict[str, Any]) -> bytes:
+        msg_type = msg.get("type")
+        if msg_type == "ROUND_SUBMIT" and set(msg) == {"type", "round", "taps"}:
+            taps = msg["taps"]
+            return self.ROUND_HEADER.pack(TYPE_CODES[msg_type], int(msg["round"]), len(taps)) + bytes(taps)
+        layout = self.LAYOUTS.get(msg_type)
+        if layout and len(msg) == len(layout[1]) + 1:
+            fmt, fields = layout
+            return fmt.pack(TYPE_CODES[msg_type], *(int(msg[f]) for f in fields))
+        return bytes([self.JSON_FRAME]) + dumps_bytes(msg)
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        if not data:
+            raise FrameError("Empty frame")
+        code = data[0]
+        if code == self.JSON_FRAME:
+            return _as_message(loads(data[1:]))
+        msg_type = CODE_TYPES.get(code)
+        if msg_type == "ROUND_SUBMIT":
+            if len(data) < self.ROUND_HEADER.size:
+                raise FrameError("Truncated ROUND_SUBMIT frame")
+            _, round_no, count = self.ROUND_HEADER.unpack_from(data)
+            if len(data) != self.ROUND_HEADER.size + count:
+                raise FrameError("ROUND_SUBMIT length mismatch")
+            return {"type": msg_type, "round": round_no, "taps": list(data[self.ROUND_HEADER.size:])}
+        layout = self.LAYOUTS.get(msg_type)
+        if layout is None:
+            raise FrameError(f"Unknown frame code {code}")
+        fmt, fields = layout
+        if len(data) != fmt.size:
+            raise FrameError(f"{msg_type} frame is {len(data)} bytes, expected {fmt.size}")
+        values = fmt.unpack(data)
+        return {"type": msg_type, **dict(zip(fields, values[1:]))}
+
+
+CODECS = {SUBPROTOCOL_JSON: JsonCodec(), SUBPROTOCOL_BINARY: BinaryCodec()}
+if msgpack is not None:
+    CODECS[SUBPROTOCOL_MSGPACK] = MsgpackCodec()
+
+
+def negotiate(offered) -> Optional[str]:
+    """First client-offered subprotocol we support, in the client's order."""
+    for proto in offered or ():
+        base, deflate = _split(proto)
+        if base in CODECS and (not deflate or settings.WS_COMPRESSION_ENABLED):
+            return proto
+    return None
+
+
+def _split(subprotocol: str) -> Tuple[str, bool]:
+    if subprotocol.endswith(DEFLATE_SUFFIX):
+        return subprotocol[:-len(DEFLATE_SUFFIX)], True
+    return subprotocol, False
+
+
+def _deflate(raw: bytes) -> bytes:
+    compressor = zlib.compressobj(settings.WS_COMPRESSION_LEVEL, zlib.DEFLATED, -15)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def _inflate(body: bytes) -> bytes:
+    decompressor = zlib.decompressobj(-15)
+    out = decompressor.decompress(body, MAX_INBOUND_BYTES)
+    if decompressor.unconsumed_tail:
+        raise FrameError("Inflated frame too large")
+    return out
+
+
+class FrameSocket:
+    """
+    send()/receive() in the negotiated protocol. Text frames are always
+    read as JSON, so a client can fall back mid-session without breaking.
+    """
+
+    def __init__(self, websocket: WebSocket, subprotocol: Optional[str], endpoint: str = "match"):
+        self.websocket = websocket
+        self.protocol = subprotocol or SUBPROTOCOL_JSON
+        base, self.deflate = _split(self.protocol)
+        self.codec = CODECS[base]
+        self.endpoint = endpoint
+        self._json = CODECS[SUBPROTOCOL_JSON]
+
+    async def send(self, msg: Dict[str, Any]):
+        await self._send_payload(self.codec.encode(msg))
+
+    async def send_serialized(self, text: str):
+        """Sends JSON that was already encoded once for many sockets (broadcasts)."""
+        if self.codec is self._json:
+            await self._send_payload(text)
+        else:
+            await self.send(loads(text))
+
+    async def _send_payload(self, payload: Union[str, bytes]):
+        labels = {"protocol": self.protocol, "endpoint": self.endpoint}
+        if self.deflate:
+            raw = payload.encode() if isinstance(payload, str) else payload
+            if len(raw) >= settings.WS_COMPRESS_MIN_BYTES:
+                start = time.perf_counter()
+                packed = _deflate(raw)
+                metrics.observe("ws_compress_seconds", time.perf_counter() - start, {"endpoint": self.endpoint})
+                metrics.inc("ws_compress_input_bytes_total", len(raw), {"endpoint": self.endpoint})
+                metrics.inc("ws_compress_output_bytes_total", len(packed), {"endpoint": self.endpoint})
+                if len(packed) < len(raw):
+                    await self.websocket.send_bytes(FLAG_DEFLATE + packed)
+                    metrics.inc("ws_frames_sent_total", labels={"endpoint": self.endpoint, "compressed": "yes"})
+                    metrics.inc("ws_bytes_sent_total", len(packed) + 1, labels)
+                    return
+            metrics.inc("ws_frames_sent_total", labels={"endpoint": self.endpoint, "compressed": "no"})
+            if self.codec.binary:
+                payload = FLAG_RAW + raw
+
+        if isinstance(payload, str):
+            await self.websocket.send_text(payload)
+        else:
+            await self.websocket.send_bytes(payload)
+        metrics.inc("ws_bytes_sent_total", len(payload), labels)
+
+    async def receive(self) -> Dict[str, Any]:
+        """Next client message; raises FrameError (and only that) for a frame that doesn't decode."""
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        try:
+            return self._decode(message)
+        except FrameError:
+            metrics.inc("ws_bad_frames_total", labels={"endpoint": self.endpoint})
+            raise
+        except Exception as e:
+            # struct.error, zlib.error, msgpack/JSON errors...: one type for readers to catch
+            metrics.inc("ws_bad_frames_total", labels={"endpoint": self.endpoint})
+            raise FrameError(f"Malformed frame: {e}") from e
+
+    def _decode(self, message) -> Dict[str, Any]:
+        data = message.get("bytes")
+        if data is None:
+            return self._json.decode(message.get("text") or "")
+        if self.deflate:
+            if not data:
+                raise FrameError("Empty frame")
+            data = _inflate(data[1:]) if data[:1] == FLAG_DEFLATE else data[1:]
+        return self.codec.decode(data)
+
+    async def close(self, code: int = 1000):
+        await self.websocket.close(code=code)
+
+
+async def accept(websocket: WebSocket, endpoint: str = "match") -> FrameSocket:
+    """Accepts the socket, echoing the chosen subprotocol back to the client."""
+    chosen = negotiate(websocket.scope.get("subprotocols"))
+    await websocket.accept(subprotocol=chosen)
+    metrics.inc("ws_sessions_total", labels={"protocol": chosen or SUBPROTOCOL_JSON, "endpoint": endpoint})
+    return FrameSocket(websocket, chosen, endpoint)
@@ -0,0 +1,92 @@
+import bisect
+import hashlib
+import logging
+from typing import Dict, Iterable, List
+from upstash_redis import Redis
+from app.core.config import settings
+from app.db.redis import redis_client, InstrumentedRedis
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 🗺️ KEYSPACE ROUTER ---
+# Per-match keys carry the match id as a hash tag ("{match_ab12cd34}"), so
+# on a Redis Cluster they land in one slot and multi-key scripts work, and
+# here the same tag picks the node on a consistent-hash ring. Global keys
+# (matchmaking pool, presence, locks, leaderboards, counters) stay on
+# redis_client. With no shards configured every match maps to redis_client.
+VNODES_PER_SHARD = 160
+
+
+class MatchKeys:
+    """Every key that belongs to a single match."""
+
+    @staticmethod
+    def tag(match_id: str) -> str:
+        return f"{{{match_id}}}"
+
+    @staticmethod
+    def live(match_id: str) -> str:
+        return f"match:live:{{{match_id}}}"
+
+    @staticmethod
+    def host_init(match_id: str) -> str:
+        return f"init:{{{match_id}}}"
+
+    @staticmethod
+    def finalize_lock(match_id: str) -> str:
+        return f"lock:finalizing:{{{match_id}}}"
+
+
+def _point(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class KeyspaceRouter:
+    def __init__(self, global_client, shards: List = None, vnodes: int = VNODES_PER_SHARD):
+        self.global_client = global_client
+        self.shards = shards or [global_client]
+        # Adding a node only moves ~1/N of the ring; live matches expire in minutes anyway
+        ring = sorted((_point(f"shard-{i}#{v}"), i) for i in range(len(self.shards)) for v in range(vnodes))
+        self._points = [p for p, _ in ring]
+        self._owners = [i for _, i in ring]
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.shards) > 1 or self.shards[0] is not self.global_client
+
+    def shard_index(self, match_id: str) -> int:
+        if len(self.shards) == 1:
+            return 0
+        pos = bisect.bisect(self._points, _point(match_id)) % len(self._points)
+        return self._owners[pos]
+
+    def for_match(self, match_id: str):
+        return self.shards[self.shard_index(match_id)]
+
+    def group(self, match_ids: Iterable[str]) -> Dict[int, List[str]]:
+        """Match ids bucketed by owning shard, for one pipeline per node."""
+        groups: Dict[int, List[str]] = {}
+        for mid in match_ids:
+            groups.setdefault(self.shard_index(mid), []).append(mid)
+        return groups
+
+
+def _build_shards() -> List:
+    urls = [u.strip() for u in settings.REDIS_MATCH_SHARD_URLS.split(",") if u.strip()]
+    tokens = [t.strip() for t in settings.REDIS_MATCH_SHARD_TOKENS.split(",") if t.strip()]
+    if not urls:
+        return []
+    if len(tokens) != len(urls):
+        logger.error("❌ REDIS_MATCH_SHARD_URLS/TOKENS length mismatch. Match state stays on the primary Redis.")
+        return []
+    logger.info(f"🗺️ Match state sharded across {len(urls)} Redis nodes")
+    return [InstrumentedRedis(Redis(url=u, token=t)) for u, t in zip(urls, tokens)]
+
+
+# Global instance
+keyspace = KeyspaceRouter(redis_client, _build_shards())
+
+
+def match_redis(match_id: str):
+    """Client that owns this match's keys."""
+    return keyspace.for_match(match_id)
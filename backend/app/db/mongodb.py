@@ -1,9 +1,42 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from app.core.config import settings
+from app.core.metrics import record
 import logging
+import threading
 
 logger = logging.getLogger("uvicorn.error")
 
+
+class CommandTimer(monitoring.CommandListener):
+    """
+    📊 Times every driver command into mongo_command_seconds{collection,command}.
+    Uses the driver's own duration, so pool waits are not counted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = target if isinstance(target, str) else "-"
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        labels = {"collection": collection, "command": event.command_name}
+        if outcome != "ok":
+            labels["outcome"] = outcome
+        record("mongo", "mongo_command_seconds", event.duration_micros / 1_000_000, labels)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
 class MongoDB:
     def __init__(self):
         self.client: AsyncIOMotorClient = None
@@ -49,7 +82,8 @@ async def connect_to_mongo():
             waitQueueTimeoutMS=5000,
             connectTimeoutMS=10000,
             # 💡 Tip: For Atlas, retryWrites is usually good to have enabled
-            retryWrites=True
+            retryWrites=True,
+            event_listeners=[CommandTimer()]
         )
         
         # We set the private _db attribute
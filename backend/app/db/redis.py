@@ -1,14 +1,79 @@
 from upstash_redis import Redis
 from app.core.config import settings
+from app.core.metrics import record
+from app.core.redis_budget import redis_budget
 import logging
+import time
 
 logger = logging.getLogger("uvicorn.error")
 
+
+class _InstrumentedPipeline:
+    """Queues like the Upstash pipeline; exec() is timed as one round-trip."""
+
+    def __init__(self, pipe):
+        self._pipe = pipe
+        self._size = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._pipe, name)
+        if name == "exec" or not callable(attr):
+            return attr
+
+        def queue(*args, **kwargs):
+            self._size += 1
+            redis_budget.count(name)
+            return attr(*args, **kwargs)
+        return queue
+
+    def exec(self):
+        start = time.perf_counter()
+        try:
+            return self._pipe.exec()
+        finally:
+            record("redis", "redis_command_seconds", time.perf_counter() - start,
+                   {"command": "pipeline", "size": _size_bucket(self._size)})
+
+
+def _size_bucket(n: int) -> str:
+    return "1-5" if n <= 5 else "6-20" if n <= 20 else "21+"
+
+
+class InstrumentedRedis:
+    """
+    📊 Thin proxy over the Upstash client: every command is timed into
+    redis_command_seconds{command=...}, checked against SLOW_REDIS_MS and
+    charged to the caller's feature in the command budget.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def pipeline(self):
+        return _InstrumentedPipeline(self._client.pipeline())
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            redis_budget.count(name)
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                record("redis", "redis_command_seconds", time.perf_counter() - start, {"command": name})
+        # Cache the wrapper so hot commands skip __getattr__ next time
+        setattr(self, name, call)
+        return call
+
+
 # Initialize Upstash Redis Client
-redis_client = Redis(
+redis_client = InstrumentedRedis(Redis(
     url=settings.UPSTASH_REDIS_REST_URL, 
     token=settings.UPSTASH_REDIS_REST_TOKEN
-)
+))
 
 # --- LUA SCRIPT FOR ATOMIC MATCHMAKING ---
 # This script ensures that finding an opponent and removing them is ONE action.
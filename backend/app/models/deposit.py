@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List, Literal
 from bson import ObjectId
 
 # ==========================================
@@ -60,4 +60,22 @@ class WithdrawalRequest(BaseModel):
                 "account_number": "03001234567",
                 "account_name": "Muhammad Yasir"
             }
-        }
\ No newline at end of file
+        }
+
+# ==========================================
+# 3. ADMIN BULK ACTIONS
+# ==========================================
+class BulkActionRequest(BaseModel):
+    """
+    Payload for bulk approve/reject of pending deposits (trx_ids) or withdrawals (ids).
+    """
+    ids: List[str] = Field(..., min_length=1, max_length=500, description="trx_id for deposits, _id for withdrawals")
+    action: Literal["approve", "reject"]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "ids": ["882736451", "882736452"],
+                "action": "approve"
+            }
+        }
@@ -0,0 +1,135 @@
+from app.db.mongodb import db
+from app.db.redis import redis_client
+from app.services.game_utils import to_str
+from pymongo import UpdateOne
+from datetime import datetime
+from typing import List, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 🕸️ FRIEND GRAPH ---
+# One edge per direction in "friend_edges":
+#   {owner_id, friend_id, status, request_id, created_at}
+# status: "outgoing" / "incoming" while pending, "accepted" once both agree.
+# The pair document in "friendships" stays the source of truth for request ids;
+# callers write it and its edges in one transaction (pass `session`), then
+# invalidate the cached friend sets once it commits.
+OUTGOING = "outgoing"
+INCOMING = "incoming"
+ACCEPTED = "accepted"
+
+FRIEND_IDS_PREFIX = "friends"  # Redis Set: friends:{user_id} -> accepted friend ids
+FRIEND_IDS_TTL = 3600
+EMPTY_MARKER = "__none__"  # Cached "has no friends" so empty lists don't miss forever
+
+
+class FriendGraphRepository:
+    """
+    🚀 Per-user adjacency lists: every friend lookup is a single
+    range scan on (owner_id, status) instead of an $or over both sides.
+    """
+
+    @property
+    def collection(self):
+        if db.db is None:
+            raise ConnectionError("MongoDB Database not initialized.")
+        return db.db.friend_edges
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("owner_id", 1), ("friend_id", 1)], unique=True)
+        await self.collection.create_index([("owner_id", 1), ("status", 1), ("created_at", -1)])
+        # Backs send_request's pair check (both directions are point lookups)
+        await db.db.friendships.create_index([("requester_id", 1), ("recipient_id", 1)])
+
+        # First boot: derive edges from the existing pair documents
+        if await self.collection.estimated_document_count() == 0:
+            rebuilt = await self.rebuild_from_friendships()
+            if rebuilt:
+                logger.info(f"🕸️ Friend graph rebuilt from {rebuilt} friendships")
+
+    async def rebuild_from_friendships(self) -> int:
+        ops, count = [], 0
+        async for doc in db.db.friendships.find({}, {"requester_id": 1, "recipient_id": 1, "status": 1, "created_at": 1}):
+            ops.extend(self._edge_ops(doc["requester_id"], doc["recipient_id"], doc["status"], doc["_id"], doc.get("created_at")))
+            count += 1
+            if len(ops) >= 1000:
+                await self.collection.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            await self.collection.bulk_write(ops, ordered=False)
+        return count
+
+    # --- ✍️ WRITE PATH ---
+    @staticmethod
+    def _edge_ops(requester_id: str, recipient_id: str, status: str, request_id, created_at=None):
+        accepted = status == ACCEPTED
+        now = created_at or datetime.utcnow()
+        return [
+            UpdateOne(
+                {"owner_id": requester_id, "friend_id": recipient_id},
+                {"$set": {"status": ACCEPTED if accepted else OUTGOING, "request_id": request_id, "created_at": now}},
+                upsert=True
+            ),
+            UpdateOne(
+                {"owner_id": recipient_id, "friend_id": requester_id},
+                {"$set": {"status": ACCEPTED if accepted else INCOMING, "request_id": request_id, "created_at": now}},
+                upsert=True
+            ),
+        ]
+
+    async def add_request(self, requester_id: str, recipient_id: str, request_id, session=None):
+        await self.collection.bulk_write(
+            self._edge_ops(requester_id, recipient_id, "pending", request_id), ordered=True, session=session
+        )
+
+    async def accept(self, requester_id: str, recipient_id: str, request_id, session=None):
+        await self.collection.bulk_write(
+            self._edge_ops(requester_id, recipient_id, ACCEPTED, request_id), ordered=True, session=session
+        )
+
+    async def remove(self, user_a: str, user_b: str, session=None):
+        await self.collection.delete_many({"$or": [
+            {"owner_id": user_a, "friend_id": user_b},
+            {"owner_id": user_b, "friend_id": user_a}
+        ]}, session=session)
+
+    async def invalidate(self, *user_ids: str):
+        try:
+            await asyncio.to_thread(redis_client.delete, *[f"{FRIEND_IDS_PREFIX}:{u}" for u in user_ids])
+        except Exception as e:
+            logger.error(f"Friend Cache Invalidate Failed: {e}")
+
+    # --- 📖 READ PATH ---
+    async def get_edge(self, owner_id: str, friend_id: str) -> Optional[dict]:
+        """Point lookup on the unique (owner_id, friend_id) index."""
+        return await self.collection.find_one({"owner_id": owner_id, "friend_id": friend_id}, {"status": 1})
+
+    async def get_edges(self, owner_id: str, status: str, limit: int = 200) -> List[dict]:
+        return await self.collection.find(
+            {"owner_id": owner_id, "status": status},
+            {"_id": 0, "friend_id": 1, "request_id": 1, "created_at": 1}
+        ).sort("created_at", -1).to_list(limit)
+
+    async def friend_ids(self, owner_id: str, limit: int = 200) -> List[str]:
+        """Accepted friend ids, served from the Redis set when it is warm."""
+        key = f"{FRIEND_IDS_PREFIX}:{owner_id}"
+        try:
+            cached = await asyncio.to_thread(redis_client.smembers, key)
+            if cached:
+                return [m for m in (to_str(c) for c in cached) if m != EMPTY_MARKER]
+        except Exception as e:
+            logger.error(f"Friend Cache Read Failed: {e}")
+
+        edges = await self.get_edges(owner_id, ACCEPTED, limit)
+        ids = [e["friend_id"] for e in edges]
+
+        try:
+            pipe = redis_client.pipeline()
+            pipe.sadd(key, *(ids or [EMPTY_MARKER]))
+            pipe.expire(key, FRIEND_IDS_TTL)
+            await asyncio.to_thread(pipe.exec)
+        except Exception as e:
+            logger.error(f"Friend Cache Write Failed: {e}")
+        return ids
@@ -1,17 +1,23 @@
 from app.db.mongodb import db
 from bson import ObjectId
 from datetime import datetime
-from app.db.redis import redis_client  # ✅ Import Redis for live status
-from app.services.game_utils import to_str
+from app.services.presence_service import presence_service  # ✅ Batched live status
+from app.repositories.friend_graph_repo import FriendGraphRepository, ACCEPTED, INCOMING
+from app.repositories.user_search_repo import UserSearchRepository
 
 class FriendRepository:
+    # Only what the friend list / request list render
+    PROFILE_FIELDS = {"username": 1, "avatar_url": 1}
+
     def __init__(self):
         self.collection = db.get_collection("friendships")
         self.users = db.get_collection("users")
+        self.graph = FriendGraphRepository()
+        self.user_search = UserSearchRepository()
 
     async def send_request(self, requester_id: str, recipient_username: str):
         # 1. Find Recipient
-        recipient = await self.users.find_one({"username": recipient_username})
+        recipient = await self.users.find_one({"username": recipient_username}, {"_id": 1})
         if not recipient:
             return {"error": "User not found"}
         
@@ -19,96 +25,100 @@ class FriendRepository:
         if recipient_id == requester_id:
             return {"error": "You cannot add yourself"}
 
-        # 2. Check existing relationship (Pending or Accepted)
-        existing = await self.collection.find_one({
-            "$or": [
+        # 2. Create Request: the pair check, pair document and both adjacency
+        # edges commit together, so the graph can't drift from the pairs
+        async def create(session):
+            existing = await self.collection.find_one({"$or": [
                 {"requester_id": requester_id, "recipient_id": recipient_id},
                 {"requester_id": recipient_id, "recipient_id": requester_id}
-            ]
-        })
-        
-        if existing:
-            if existing["status"] == "accepted":
-                return {"error": "Already friends"}
-            if existing["status"] == "pending":
-                return {"error": "Request already pending"}
-
-        # 3. Create Request
-        await self.collection.insert_one({
-            "requester_id": requester_id,
-            "recipient_id": recipient_id,
-            "status": "pending",
-            "created_at": datetime.utcnow()
-        })
+            ]}, {"status": 1}, session=session)
+            if existing:
+                return "Already friends" if existing["status"] == ACCEPTED else "Request already pending"
+
+            result = await self.collection.insert_one({
+                "requester_id": requester_id,
+                "recipient_id": recipient_id,
+                "status": "pending",
+                "created_at": datetime.utcnow()
+            }, session=session)
+            await self.graph.add_request(requester_id, recipient_id, result.inserted_id, session=session)
+            return None
+
+        async with await db.client.start_session() as session:
+            error = await session.with_transaction(create)
+        if error:
+            return {"error": error}
         return {"message": "Friend request sent"}
 
     async def accept_request(self, request_id: str, user_id: str):
         # Only the recipient can accept a pending request
-        result = await self.collection.update_one(
-            {"_id": ObjectId(request_id), "recipient_id": user_id, "status": "pending"},
-            {"$set": {"status": "accepted"}}
-        )
-        return result.modified_count > 0
+        async def accept(session):
+            doc = await self.collection.find_one_and_update(
+                {"_id": ObjectId(request_id), "recipient_id": user_id, "status": "pending"},
+                {"$set": {"status": "accepted"}},
+                projection={"requester_id": 1},
+                session=session
+            )
+            if doc:
+                await self.graph.accept(doc["requester_id"], user_id, doc["_id"], session=session)
+            return doc
+
+        async with await db.client.start_session() as session:
+            doc = await session.with_transaction(accept)
+        if not doc:
+            return False
+        await self.graph.invalidate(doc["requester_id"], user_id)
+        return True
+
+    @staticmethod
+    def _oids(ids):
+        return [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
 
     async def get_friends(self, user_id: str):
-    # 1. Get accepted friendships
-        cursor = self.collection.find({
-            "$or": [{"requester_id": user_id}, {"recipient_id": user_id}],
-            "status": "accepted"
-            })
-        friendship_docs = await cursor.to_list(length=200)
-        if not friendship_docs: return []
+    # 1. Accepted friend ids: cached set, or one indexed range scan on the graph
+        friend_ids = await self.graph.friend_ids(user_id)
+        if not friend_ids: return []
 
-    # 2. Extract IDs and fetch profiles
-        friend_ids = [ObjectId(d["recipient_id"] if d["requester_id"] == user_id else d["requester_id"]) for d in friendship_docs]
-        profiles = await self.users.find({"_id": {"$in": friend_ids}}).to_list(length=200)
+    # 2. Fetch only the profile fields the list renders
+        profiles = await self.users.find(
+            {"_id": {"$in": self._oids(friend_ids)}}, self.PROFILE_FIELDS
+        ).to_list(length=200)
 
-    # 3. ⚡ BATCH FETCH STATUS (Professional & Efficient)
-    # Get everyone who is NOT offline in one command
-        online_set = redis_client.smembers("online_players_set") or []
+    # 3. ⚡ BATCH FETCH STATUS: one pipelined round-trip for the whole list
+        statuses = await presence_service.get_statuses(str(u["_id"]) for u in profiles)
     
         results = []
         for u in profiles:
             u_id = str(u["_id"])
-            current_status = "offline"  # Default logic
-        
-            if u_id in online_set:
-                # This only hits Redis if the user is in the online set
-                status_val = redis_client.get(f"user_status:{u_id}")
-                current_status = to_str(status_val) if status_val else "online"
-
             results.append({
                 "id": u_id,
                 "username": u.get("username", "Unknown"),
                 "avatar": u.get("avatar_url", "/default-avatar.png"),
-                "status": current_status 
+                "status": statuses.get(u_id, "offline")
             })
         return results # This must be outside the loop
 
     async def get_pending_requests(self, user_id: str):
         """
-        🚀 OPTIMIZED: Uses $in to fetch requester data in bulk.
+        🚀 OPTIMIZED: Incoming edges from the graph, then one projected $in for profiles.
         """
         # 1. Find all incoming pending requests
-        cursor = self.collection.find({"recipient_id": user_id, "status": "pending"})
-        request_docs = await cursor.to_list(length=100)
-        if not request_docs:
+        request_edges = await self.graph.get_edges(user_id, INCOMING, limit=100)
+        if not request_edges:
             return []
 
-        # 2. Extract requester IDs
-        requester_ids = [ObjectId(doc["requester_id"]) for doc in request_docs]
-
-        # 3. Batch Fetch Profiles
-        profiles = await self.users.find({"_id": {"$in": requester_ids}}).to_list(length=100)
+        # 2. Batch Fetch Profiles
+        requester_ids = self._oids(e["friend_id"] for e in request_edges)
+        profiles = await self.users.find({"_id": {"$in": requester_ids}}, self.PROFILE_FIELDS).to_list(length=100)
         profile_map = {str(p["_id"]): p for p in profiles}
 
-        # 4. Merge profile data with request IDs
+        # 3. Merge profile data with request IDs
         requests = []
-        for doc in request_docs:
-            rid = doc["requester_id"]
+        for edge in request_edges:
+            rid = edge["friend_id"]
             if rid in profile_map:
                 requests.append({
-                    "request_id": str(doc["_id"]),
+                    "request_id": str(edge["request_id"]),
                     "username": profile_map[rid].get("username"),
                     "avatar": profile_map[rid].get("avatar_url", "/default-avatar.png")
                 })
@@ -118,24 +128,23 @@ class FriendRepository:
         if not query:
             return []
             
-        # Search with a limit to keep the database response small
-        cursor = self.users.find({
-            "username": {"$regex": f"^{query}", "$options": "i"}, # Prefix match is faster than full regex
-            "_id": {"$ne": ObjectId(current_user_id)}
-        }).limit(10)
-        
-        results = []
-        async for user in cursor:
-            results.append({
-                "id": str(user["_id"]),
-                "username": user["username"],
-                "avatar": user.get("avatar_url", "/default-avatar.png")
-            })
-        return results
+        # Indexed, cached prefix lookup; ask for one extra so dropping yourself still leaves 10
+        results = await self.user_search.typeahead(query, limit=11)
+        return [r for r in results if r["id"] != current_user_id][:10]
 
     async def decline_request(self, request_id: str, user_id: str):
-        result = await self.collection.delete_one({
-            "_id": ObjectId(request_id),
-            "recipient_id": user_id
-        })
-        return result.deleted_count > 0
\ No newline at end of file
+        async def decline(session):
+            doc = await self.collection.find_one_and_delete({
+                "_id": ObjectId(request_id),
+                "recipient_id": user_id
+            }, projection={"requester_id": 1}, session=session)
+            if doc:
+                await self.graph.remove(doc["requester_id"], user_id, session=session)
+            return doc
+
+        async with await db.client.start_session() as session:
+            doc = await session.with_transaction(decline)
+        if not doc:
+            return False
+        await self.graph.invalidate(doc["requester_id"], user_id)
+        return True
\ No newline at end of file
@@ -0,0 +1,210 @@
+from app.db.mongodb import db
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import base64
+import logging
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 📒 WALLET LEDGER ENTRY TYPES ---
+DEPOSIT = "DEPOSIT"
+WITHDRAWAL = "WITHDRAWAL"
+WITHDRAWAL_REFUND = "WITHDRAWAL_REFUND"
+ENTRY_FEE = "ENTRY_FEE"
+REFUND = "REFUND"
+PAYOUT = "PAYOUT"
+ADJUSTMENT = "ADJUSTMENT"
+
+
+def encode_cursor(created_at: datetime, _id: ObjectId) -> str:
+    """Opaque keyset cursor over (created_at, _id)."""
+    ms = int(created_at.replace(tzinfo=created_at.tzinfo or timezone.utc).timestamp() * 1000)
+    return base64.urlsafe_b64encode(f"{ms}:{_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, ObjectId]]:
+    try:
+        ms, oid = base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+        return datetime.fromtimestamp(int(ms) / 1000, tz=timezone.utc), ObjectId(oid)
+    except Exception:
+        return None
+
+
+def keyset_filter(cursor: Optional[str]) -> dict:
+    """
+    Newest-first page filter: everything strictly older than the cursor.
+    Raises ValueError for a cursor that doesn't decode, rather than
+    silently restarting from the newest item.
+    """
+    if not cursor:
+        return {}
+    decoded = decode_cursor(cursor)
+    if not decoded:
+        raise ValueError("Invalid cursor")
+    created_at, oid = decoded
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": oid}}
+    ]}
+
+
+class WalletLedgerRepository:
+    """
+    Append-only record of every wallet balance change.
+    Entries are written in the same session as the balance update.
+    """
+
+    def _to_id(self, id_val):
+        id_str = str(id_val)
+        if ObjectId.is_valid(id_str):
+            return ObjectId(id_str)
+        return id_str
+
+    @property
+    def collection(self):
+        if db.db is None:
+            raise ConnectionError("MongoDB Database not initialized.")
+        return db.db.wallet_ledger
+
+    @property
+    def snapshots(self):
+        return db.db.wallet_snapshots
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+        await self.collection.create_index([("user_id", 1), ("type", 1), ("created_at", -1), ("_id", -1)])
+        await self.collection.create_index([("created_at", 1)])
+        await self.snapshots.create_index([("user_id", 1), ("as_of", -1)])
+        await self.snapshots.create_index([("created_at", -1)])
+
+    async def append(
+        self,
+        user_id: str,
+        entry_type: str,
+        amount: float,
+        balance_after: float,
+        ref: Optional[str] = None,
+        session=None
+    ):
+        await self.collection.insert_one({
+            "user_id": self._to_id(user_id),
+            "type": entry_type,
+            "amount": round(float(amount), 2),
+            "balance_after": round(float(balance_after), 2),
+            "ref": ref,
+            "created_at": datetime.now(timezone.utc)
+        }, session=session)
+
+    async def append_many(self, entries: List[dict], session=None):
+        """Batch variant of append(); entries carry user_id, type, amount, balance_after, ref."""
+        if not entries:
+            return
+        now = datetime.now(timezone.utc)
+        await self.collection.insert_many([{
+            "user_id": self._to_id(e["user_id"]),
+            "type": e["type"],
+            "amount": round(float(e["amount"]), 2),
+            "balance_after": round(float(e["balance_after"]), 2),
+            "ref": e.get("ref"),
+            "created_at": now
+        } for e in entries], ordered=True, session=session)
+
+    async def get_entries(
+        self,
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        types: Optional[List[str]] = None
+    ):
+        """
+        🚀 Index-backed keyset page, newest first.
+        Returns (entries, next_cursor).
+        """
+        query = {"user_id": self._to_id(user_id), **keyset_filter(cursor)}
+        if types:
+            query["type"] = {"$in": types}
+
+        docs = await self.collection.find(query).sort(
+            [("created_at", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_cursor(docs[-1]["created_at"], docs[-1]["_id"])
+
+        for d in docs:
+            d["_id"] = str(d["_id"])
+            d["user_id"] = str(d["user_id"])
+        return docs, next_cursor
+
+    # --- 📸 BALANCE SNAPSHOTS ---
+
+    async def take_snapshots(self) -> int:
+        """
+        Writes one snapshot per user with ledger activity since the previous run,
+        holding their latest balance. Reads only the new slice of the ledger.
+        """
+        last = await self.snapshots.find_one({}, {"created_at": 1}, sort=[("created_at", -1)])
+        since = last["created_at"] if last else datetime.fromtimestamp(0, tz=timezone.utc)
+        now = datetime.now(timezone.utc)
+
+        rows = await self.collection.aggregate([
+            {"$match": {"created_at": {"$gt": since, "$lte": now}}},
+            {"$sort": {"created_at": 1, "_id": 1}},
+            {"$group": {
+                "_id": "$user_id",
+                "balance": {"$last": "$balance_after"},
+                "as_of": {"$last": "$created_at"},
+                "last_entry_id": {"$last": "$_id"},
+                "entries": {"$sum": 1}
+            }}
+        ]).to_list(None)
+
+        if not rows:
+            return 0
+
+        await self.snapshots.insert_many([{
+            "user_id": r["_id"],
+            "balance": r["balance"],
+            "as_of": r["as_of"],
+            "last_entry_id": r["last_entry_id"],
+            "entries": r["entries"],
+            "created_at": now
+        } for r in rows])
+        return len(rows)
+
+    async def audit_user(self, user_id: str, current_balance: float):
+        """
+        Replays the ledger from the latest snapshot and compares the result
+        with the live wallet balance.
+        """
+        u_id = self._to_id(user_id)
+        snap = await self.snapshots.find_one({"user_id": u_id}, sort=[("as_of", -1)])
+
+        query = {"user_id": u_id}
+        if snap:
+            query["created_at"] = {"$gt": snap["as_of"]}
+            opening = snap["balance"]
+        else:
+            # No snapshot yet: the balance before the first entry is the opening figure
+            first = await self.collection.find_one({"user_id": u_id}, sort=[("created_at", 1), ("_id", 1)])
+            opening = (first["balance_after"] - first["amount"]) if first else current_balance
+
+        res = await self.collection.aggregate([
+            {"$match": query},
+            {"$group": {"_id": None, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}}
+        ]).to_list(1)
+        delta, count = (res[0]["total"], res[0]["count"]) if res else (0, 0)
+
+        expected = round(opening + delta, 2)
+        return {
+            "user_id": str(user_id),
+            "snapshot_as_of": snap["as_of"].isoformat() if snap else None,
+            "opening_balance": round(opening, 2),
+            "entries_replayed": count,
+            "expected_balance": expected,
+            "actual_balance": round(current_balance, 2),
+            "consistent": abs(expected - round(current_balance, 2)) < 0.01
+        }
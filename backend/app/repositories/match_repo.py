@@ -4,6 +4,8 @@ from bson import ObjectId
 import json
 import logging
 from datetime import datetime, timezone
+from typing import Optional
+from app.repositories.projections import Fields, MatchFields, projection
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -72,12 +74,15 @@ class MatchRepository:
     async def cleanup_queue(self, user_id: str):
         redis_client.srem("matchmaking_pool", str(user_id))
         
-    async def get_match_audit_data(self, match_id: str):
+    async def get_by_match_id(self, match_id: str, fields: Optional[Fields] = MatchFields.SUMMARY):
+        return await self.collection.find_one({"match_id": match_id}, projection(fields))
+
+    async def get_match_audit_data(self, match_id: str, fields: Optional[Fields] = MatchFields.AUDIT):
         """
         Fetches raw match details including player names and final scores.
         """
         # Ensure the collection is accessed correctly
-        match = await self.collection.find_one({"match_id": match_id})
+        match = await self.get_by_match_id(match_id, fields)
         
         if not match:
             return None
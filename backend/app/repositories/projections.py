@@ -0,0 +1,37 @@
+from typing import FrozenSet, Iterable, Optional
+
+# --- 🎯 FIELD SETS ---
+# Callers ask for exactly the fields they read. Users carry a 20-entry
+# recent_matches array plus password/fingerprint hashes, which hot paths never need.
+Fields = FrozenSet[str]
+
+
+class UserFields:
+    EXISTS: Fields = frozenset({"_id"})
+    IDENTITY: Fields = frozenset({"username"})
+    WALLET: Fields = frozenset({"wallet_balance"})
+    STATS: Fields = frozenset({"username", "wallet_balance", "total_wins", "total_matches"})
+    # Everything an authenticated request handler may read from current_user
+    SESSION: Fields = frozenset({
+        "username", "email", "role", "is_verified", "wallet_balance",
+        "total_wins", "total_matches", "rank", "referral_code", "referred_by"
+    })
+    PROFILE: Fields = SESSION | {"recent_matches"}
+    LOGIN: Fields = frozenset({"username", "email", "wallet_balance", "hashed_password", "password", "recent_matches"})
+
+
+class MatchFields:
+    EXISTS: Fields = frozenset({"_id"})
+    STATUS: Fields = frozenset({"match_id", "status"})
+    SUMMARY: Fields = frozenset({
+        "match_id", "status", "player1_id", "player2_id", "winner_id",
+        "stake", "created_at", "finished_at"
+    })
+    AUDIT: Fields = SUMMARY | {"scores", "final_scores", "mode"}
+
+
+def projection(fields: Optional[Iterable[str]]) -> Optional[dict]:
+    """Mongo projection for a field set; None keeps the whole document."""
+    if fields is None:
+        return None
+    return {f: 1 for f in fields}
@@ -1,7 +1,16 @@
 from app.db.mongodb import db
 from app.db.redis import redis_client
+from app.services.leaderboard_service import leaderboard_service, LEADERBOARD_CACHE_KEY
+from app.core.cache import invalidate
+from app.services.ledger_counters import ledger_counters
+from app.services.activity_rollups import activity_rollups
+from app.repositories.ledger_repo import WalletLedgerRepository, ADJUSTMENT, PAYOUT
+from app.repositories.user_search_repo import UserSearchRepository, search_keys
+from app.repositories.projections import Fields, UserFields, MatchFields, projection
 from bson import ObjectId
+from pymongo import UpdateOne
 from datetime import datetime, timezone
+from typing import Optional
 import logging
 import asyncio
 
@@ -9,7 +18,8 @@ logger = logging.getLogger("uvicorn.error")
 
 class UserRepository:
     def __init__(self):
-        pass
+        self.ledger = WalletLedgerRepository()
+        self.search = UserSearchRepository()
 
     # --- 🛡️ SAFETY HELPER ---
     def _to_id(self, id_val):
@@ -35,20 +45,48 @@ class UserRepository:
 
     # --- 🛠️ CORE AUTH METHODS ---
 
-    async def get_by_id(self, user_id: str):
+    async def get_by_id(self, user_id: str, fields: Optional[Fields] = None):
+        """Pass a UserFields set to load only what the caller reads."""
         try:
             # ✅ FIX: Use _to_id to handle both Humans and Bots
-            return await self.collection.find_one({"_id": self._to_id(user_id)})
+            return await self.collection.find_one({"_id": self._to_id(user_id)}, projection(fields))
         except Exception as e:
             logger.error(f"Error in get_by_id: {e}")
             return None
         
-    async def get_by_email(self, email: str):
+    async def get_profile_map(self, user_ids, fields=("username",)):
+        """
+        🚀 Resolves many users in ONE $in query.
+        Returns {str_id: {field: value}}; unknown ids are simply absent.
+        """
+        ids = list({self._to_id(u) for u in user_ids if u})
+        if not ids:
+            return {}
+        cursor = self.collection.find({"_id": {"$in": ids}}, {f: 1 for f in fields})
+        return {str(u["_id"]): u async for u in cursor}
+
+    async def enrich(self, docs: list, fields=("username",), id_field: str = "user_id", only_missing: bool = True):
+        """
+        Batched join for list views: fills `fields` on each doc from its user.
+        With only_missing, docs that already carry every field (e.g. withdrawals
+        that stored username at request time) cost no lookup at all.
+        """
+        targets = [d for d in docs if not only_missing or any(d.get(f) is None for f in fields)]
+        profiles = await self.get_profile_map([d.get(id_field) for d in targets], fields)
+
+        for d in targets:
+            profile = profiles.get(str(d.get(id_field)))
+            for f in fields:
+                if d.get(f) is None:
+                    d[f] = profile.get(f) if profile else None
+        return docs
+
+    async def get_by_email(self, email: str, fields: Optional[Fields] = None):
         """
         Used by AuthService to find a user by their email during login.
         """
         try:
-            user = await self.collection.find_one({"email": email.lower().strip()})
+            user = await self.collection.find_one({"email": email.lower().strip()}, projection(fields))
             if user:
                 # Ensure the _id is converted to a string for the JWT payload
                 user["_id"] = str(user["_id"])
@@ -62,18 +100,19 @@ class UserRepository:
         Inserts a new user document into MongoDB and returns the new ID.
         """
         try:
+            user_data.update(search_keys(user_data.get("username"), user_data.get("email")))
             result = await self.collection.insert_one(user_data)
             return result.inserted_id
         except Exception as e:
             logger.error(f"Error creating user: {e}")
             raise e
     
-    async def get_by_username(self, username: str):
+    async def get_by_username(self, username: str, fields: Optional[Fields] = None):
         """
         Used by AuthService to find a user by their unique username during login/signup.
         """
         try:
-            user = await self.collection.find_one({"username": username.strip()})
+            user = await self.collection.find_one({"username": username.strip()}, projection(fields))
             if user:
                 user["_id"] = str(user["_id"])
             return user
@@ -81,7 +120,7 @@ class UserRepository:
             logger.error(f"Error fetching user by username: {e}")
             return None
     
-    async def get_by_fingerprint(self, fingerprint: str):
+    async def get_by_fingerprint(self, fingerprint: str, fields: Optional[Fields] = UserFields.EXISTS):
         """
         🚀 ANTI-CHEAT: Finds a user by their unique device fingerprint.
         Used during signup to prevent multiple accounts from one device.
@@ -89,7 +128,7 @@ class UserRepository:
         try:
             if not fingerprint:
                 return None
-            user = await self.collection.find_one({"device_fingerprint": fingerprint})
+            user = await self.collection.find_one({"device_fingerprint": fingerprint}, projection(fields))
             if user:
                 user["_id"] = str(user["_id"])
             return user
@@ -107,19 +146,87 @@ class UserRepository:
 
     # --- 💰 WALLET & STATS METHODS ---
 
-    async def update_wallet(self, user_id: str, amount: float, session=None):
+    async def update_wallet(
+        self,
+        user_id: str,
+        amount: float,
+        session=None,
+        counters: dict = None,
+        entry_type: str = ADJUSTMENT,
+        ref: str = None
+    ):
+        """
+        Single write path for balance changes.
+        The balance update and its ledger entry commit together in a transaction
+        of our own (retried on transient errors), and the ledger counters are
+        bumped once it has committed. `counters` tags the movement for the
+        ledger totals (e.g. {"entry_fees": 100.0}).
+        Inside a caller's `session` only the balance and ledger entry are
+        written; the caller bumps the counters after its own commit.
+        """
+        if session is not None:
+            return await self._apply_wallet_change(user_id, amount, session, entry_type, ref)
+
+        async with await db.client.start_session() as own_session:
+            applied = await own_session.with_transaction(
+                lambda s: self._apply_wallet_change(user_id, amount, s, entry_type, ref)
+            )
+        if applied:
+            await ledger_counters.bump(liquidity=amount, **(counters or {}))
+        return applied
+
+    async def _apply_wallet_change(self, user_id, amount, session, entry_type, ref):
         # ✅ FIX: Handle Bot/Human ID safely
         query = {"_id": self._to_id(user_id)}
         if amount < 0:
             query["wallet_balance"] = {"$gte": abs(amount)}
 
-        result = await self.collection.update_one(
+        user = await self.collection.find_one_and_update(
             query,
             {"$inc": {"wallet_balance": amount}},
-            session=session
+            projection={"wallet_balance": 1},
+            session=session,
+            return_document=True
         )
-        redis_client.delete("stats:total_pool")
-        return result.modified_count > 0
+        if not user:
+            return False
+
+        await self.ledger.append(user_id, entry_type, amount, user["wallet_balance"], ref=ref, session=session)
+        return True
+
+    async def bulk_credit(self, credits: list, session):
+        """
+        Applies many positive credits with one bulk_write, then writes their ledger
+        entries in one insert_many. Must run inside a transaction (`session`);
+        the caller bumps the ledger counters once it commits.
+        credits: [{"user_id", "amount", "type", "ref"}]
+        Returns the set of refs that were credited (unknown users are skipped).
+        """
+        if not credits:
+            return set()
+
+        ops = [
+            UpdateOne({"_id": self._to_id(c["user_id"])}, {"$inc": {"wallet_balance": c["amount"]}})
+            for c in credits
+        ]
+        await self.collection.bulk_write(ops, ordered=True, session=session)
+
+        ids = list({self._to_id(c["user_id"]) for c in credits})
+        cursor = self.collection.find({"_id": {"$in": ids}}, {"wallet_balance": 1}, session=session)
+        running = {str(u["_id"]): u.get("wallet_balance", 0) async for u in cursor}
+
+        # Walk backwards from the final balances to get each entry's balance_after
+        entries = []
+        for c in reversed(credits):
+            uid = str(c["user_id"])
+            if uid not in running:
+                continue
+            entries.append({**c, "balance_after": running[uid]})
+            running[uid] -= c["amount"]
+        entries.reverse()
+
+        await self.ledger.append_many(entries, session=session)
+        return {e["ref"] for e in entries}
 
     async def record_match_stats(self, user_id: str, is_win: bool, session=None):
         u_id_val = self._to_id(user_id)
@@ -135,14 +242,10 @@ class UserRepository:
         )
 
         if user:
-            total_wins = user.get("total_wins", 0)
-            # ✅ FIX FOR UPSTASH: Use a dictionary for the mapping
-            try:
-                redis_client.zadd("leaderboard:wins", {str(user_id): total_wins})
-            except Exception as e:
-                logger.error(f"Leaderboard Update Failed: {e}")
-                
-            redis_client.delete("cache:leaderboard_full")
+            # 🏆 Incremental update: all-time score, daily/season buckets, profile hash
+            await leaderboard_service.record_result(user, is_win)
+            # Mark stale only: readers keep the old copy while one task rebuilds it
+            await invalidate(LEADERBOARD_CACHE_KEY)
         
         return user
 
@@ -150,7 +253,7 @@ class UserRepository:
 
     async def process_match_payout(self, match_id: str, winner_id: str, player1_id: str, player2_id: str, p1_score: int, p2_score: int, is_draw: bool = False):
         try:
-            match_doc = await self.matches_collection.find_one({"match_id": match_id})
+            match_doc = await self.matches_collection.find_one({"match_id": match_id}, projection(MatchFields.STATUS))
             
             if not match_doc:
                 logger.info(f"Creating record for match: {match_id}")
@@ -179,10 +282,10 @@ class UserRepository:
                     )
 
                     if is_draw:
-                        await self.update_wallet(player1_id, 100.0, session=session)
-                        await self.update_wallet(player2_id, 100.0, session=session)
+                        await self.update_wallet(player1_id, 100.0, session=session, entry_type=PAYOUT, ref=match_id)
+                        await self.update_wallet(player2_id, 100.0, session=session, entry_type=PAYOUT, ref=match_id)
                     else:
-                        await self.update_wallet(winner_id, 200.0, session=session)
+                        await self.update_wallet(winner_id, 200.0, session=session, entry_type=PAYOUT, ref=match_id)
 
                     await self.record_match_stats(player1_id, is_win=(winner_id == player1_id), session=session)
                     await self.record_match_stats(player2_id, is_win=(winner_id == player2_id), session=session)
@@ -190,6 +293,9 @@ class UserRepository:
                     await self._quick_history_add(player1_id, match_id, player2_id, p1_score, p2_score, winner_id, session)
                     await self._quick_history_add(player2_id, match_id, player1_id, p2_score, p1_score, winner_id, session)
 
+            # Committed: bump the ledger totals and count it once in the hourly activity rollup
+            await ledger_counters.bump(liquidity=200.0, payouts=200.0, matches=1)
+            await activity_rollups.record_match()
             return True
         except Exception as e:
             logger.error(f"❌ Payout Failure: {e}")
@@ -262,8 +368,6 @@ class UserRepository:
                         session=session
                     )
             
-            # No balance was changed, but we clear the cache for stats consistency
-            redis_client.delete("stats:total_pool")
             return True
             
         except Exception as e:
@@ -271,40 +375,25 @@ class UserRepository:
             return False
     
         
-    async def get_all_users(self, page: int = 1, limit: int = 10, search: str = ""):
+    async def get_all_users(self, page: int = 1, limit: int = 10, search: str = "", cursor: Optional[str] = None):
         """
         Supports UserTable.tsx with pagination and search.
-        Returns (users_list, total_pages)
+        Returns (users_list, total_pages, next_cursor)
         """
-        skip = (page - 1) * limit
-        query = {}
-        
-        if search:
-            query = {
-                "$or": [
-                    {"username": {"$regex": search, "$options": "i"}},
-                    {"email": {"$regex": search, "$options": "i"}}
-                ]
-            }
-
         try:
-            total_count = await self.collection.count_documents(query)
-            total_pages = (total_count + limit - 1) // limit
-
-            cursor = self.collection.find(query).skip(skip).limit(limit)
-            users = await cursor.to_list(length=limit)
-
-            # ✅ THE FIX: Manually convert ObjectId to string for every user
-            for u in users:
-                u["_id"] = str(u["_id"])
-                # Also handle 'referred_by' if it exists and is an ObjectId
-                if u.get("referred_by"):
-                    u["referred_by"] = str(u["referred_by"])
-            
-            return users, total_pages
+            total_count = await self.search.count(search)
+            total_pages = max((total_count + limit - 1) // limit, 1)
+
+            # Keyset for the first page and any cursor-driven page; page numbers only for deep jumps
+            if cursor or page == 1:
+                users, next_cursor = await self.search.search(search, limit=limit, cursor=cursor)
+            else:
+                users, next_cursor = await self.search.get_page(search, page=page, limit=limit), None
+
+            return users, total_pages, next_cursor
         except Exception as e:
             logger.error(f"Error fetching users: {e}")
-            return [], 1
+            return [], 1, None
 
     async def get_referral_leaderboard(self, skip: int = 0, limit: int = 10):
         """
@@ -0,0 +1,156 @@
+from app.db.mongodb import db
+from app.db.redis import redis_client
+from bson import ObjectId
+from typing import List, Optional
+import asyncio
+from app.core.serialization import dumps, loads
+import re
+import time
+import logging
+
+logger = logging.getLogger("uvicorn.error")
+
+# Filtered searches report an exact total up to this many hits, "1000+" after
+SEARCH_COUNT_CAP = 1000
+# estimated_document_count is cheap, but the UserTable polls it on every page
+TOTAL_CACHE_SECONDS = 60
+
+# Typeahead: results per prefix are shared by every user typing it
+TYPEAHEAD_PREFIX = "typeahead:users"
+TYPEAHEAD_TTL = 30
+TYPEAHEAD_MAX_PREFIX = 32
+
+
+def search_keys(username: Optional[str], email: Optional[str]) -> dict:
+    """Normalized, index-friendly copies of the searchable fields."""
+    return {
+        "username_lc": (username or "").strip().lower(),
+        "email_lc": (email or "").strip().lower()
+    }
+
+
+def prefix_query(search: str) -> dict:
+    """
+    Case-sensitive, ^-anchored regex on the lowercase keys. Unlike
+    {"$options": "i"}, this compiles to an index range scan.
+    """
+    prefix = "^" + re.escape(search.strip().lower())
+    return {"$or": [
+        {"username_lc": {"$regex": prefix}},
+        {"email_lc": {"$regex": prefix}}
+    ]}
+
+
+class UserSearchRepository:
+    """
+    🔎 User search on normalized keys: admin listing (prefix match, keyset
+    pagination over _id, approximate totals) and the friend-search typeahead.
+    """
+
+    PROJECTION = {"hashed_password": 0, "device_fingerprint": 0, "recent_matches": 0}
+
+    def __init__(self):
+        self._total_cache = (0.0, 0)
+
+    @property
+    def collection(self):
+        if db.db is None:
+            raise ConnectionError("MongoDB Database not initialized.")
+        return db.db.users
+
+    async def ensure_indexes(self):
+        # Fill in keys for users created before they existed (and for seeded bots)
+        res = await self.collection.update_many(
+            {"username_lc": {"$exists": False}},
+            [{"$set": {
+                "username_lc": {"$toLower": {"$ifNull": ["$username", ""]}},
+                "email_lc": {"$toLower": {"$ifNull": ["$email", ""]}}
+            }}]
+        )
+        if res.modified_count:
+            logger.info(f"🔎 Backfilled search keys for {res.modified_count} users")
+
+        await self.collection.create_index([("username_lc", 1), ("_id", -1)])
+        await self.collection.create_index([("email_lc", 1), ("_id", -1)])
+
+    async def estimated_total(self) -> int:
+        """Collection-metadata count, cached in-process for a minute."""
+        cached_at, total = self._total_cache
+        if time.monotonic() - cached_at < TOTAL_CACHE_SECONDS:
+            return total
+        total = await self.collection.estimated_document_count()
+        self._total_cache = (time.monotonic(), total)
+        return total
+
+    async def count(self, search: str = "") -> int:
+        if not search.strip():
+            return await self.estimated_total()
+        return await self.collection.count_documents(prefix_query(search), limit=SEARCH_COUNT_CAP)
+
+    @staticmethod
+    def _serialize(users: list) -> list:
+        for u in users:
+            u["_id"] = str(u["_id"])
+            if u.get("referred_by"):
+                u["referred_by"] = str(u["referred_by"])
+        return users
+
+    async def search(self, search: str = "", limit: int = 10, cursor: Optional[str] = None):
+        """
+        🚀 Keyset page, newest first. The cursor is the last _id of the previous page.
+        Returns (users, next_cursor).
+        """
+        query = prefix_query(search) if search.strip() else {}
+        if cursor and ObjectId.is_valid(cursor):
+            query = {"$and": [query, {"_id": {"$lt": ObjectId(cursor)}}]} if query else {"_id": {"$lt": ObjectId(cursor)}}
+
+        users = await self.collection.find(query, self.PROJECTION).sort("_id", -1).limit(limit + 1).to_list(limit + 1)
+
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = str(users[-1]["_id"])
+        return self._serialize(users), next_cursor
+
+    async def get_page(self, search: str = "", page: int = 1, limit: int = 10):
+        """Page-number access for the legacy UserTable, on the same indexed query."""
+        query = prefix_query(search) if search.strip() else {}
+        users = await self.collection.find(query, self.PROJECTION).sort("_id", -1).skip(
+            (page - 1) * limit
+        ).limit(limit).to_list(limit)
+        return self._serialize(users)
+
+    # --- ⌨️ TYPEAHEAD ---
+    async def typeahead(self, prefix: str, limit: int = 10) -> List[dict]:
+        """
+        Usernames starting with `prefix`, in alphabetical order. Served from a
+        short-lived Redis entry per prefix, else one bounded scan of the
+        (username_lc, _id) index.
+        """
+        norm = prefix.strip().lower()[:TYPEAHEAD_MAX_PREFIX]
+        if not norm:
+            return []
+
+        key = f"{TYPEAHEAD_PREFIX}:{limit}:{norm}"
+        try:
+            cached = await asyncio.to_thread(redis_client.get, key)
+            if cached:
+                return loads(cached)
+        except Exception as e:
+            logger.error(f"Typeahead Cache Read Failed: {e}")
+
+        users = await self.collection.find(
+            {"username_lc": {"$regex": "^" + re.escape(norm)}},
+            {"username": 1, "avatar_url": 1}
+        ).sort("username_lc", 1).limit(limit).to_list(limit)
+        results = [{
+            "id": str(u["_id"]),
+            "username": u.get("username"),
+            "avatar": u.get("avatar_url", "/default-avatar.png")
+        } for u in users]
+
+        try:
+            await asyncio.to_thread(redis_client.set, key, dumps(results), ex=TYPEAHEAD_TTL)
+        except Exception as e:
+            logger.error(f"Typeahead Cache Write Failed: {e}")
+        return results
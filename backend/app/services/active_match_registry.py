@@ -0,0 +1,112 @@
+from app.core.serialization import dumps, loads
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from app.db.redis import redis_client
+from app.db.keyspace import MatchKeys, keyspace
+from app.services.game_utils import to_str
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 🎮 ACTIVE MATCH REGISTRY ---
+# One hash for every live match: match_id -> details JSON.
+# Replaces the old "active_matches_set" + per-match "match_details:{id}" keys.
+ACTIVE_MATCHES_KEY = "active_matches"
+LIVE_FIELD_KINDS = ("score", "name", "status")
+
+
+class ActiveMatchRegistry:
+    """
+    🚀 Admin-facing view of live matches.
+    Reads cost one round-trip for the registry plus one pipeline per shard,
+    regardless of how many matches are running.
+    """
+
+    async def register(self, match_id: str, players: Dict[str, str], stake: float = 100):
+        """Called by each player once the match is ready; the second call just refreshes it."""
+        ids = list(players.keys())
+        details = {
+            "id": match_id,
+            "p1_name": players.get(ids[0]) if ids else None,
+            "p2_name": players.get(ids[1]) if len(ids) > 1 else None,
+            "players": players,
+            "stake": stake,
+            "started_at": datetime.now(timezone.utc).isoformat()
+        }
+        try:
+            await asyncio.to_thread(redis_client.hsetnx, ACTIVE_MATCHES_KEY, match_id, dumps(details))
+        except Exception as e:
+            logger.error(f"Active Match Register Failed: {e}")
+
+    async def unregister(self, match_id: str):
+        try:
+            await asyncio.to_thread(redis_client.hdel, ACTIVE_MATCHES_KEY, match_id)
+        except Exception as e:
+            logger.error(f"Active Match Unregister Failed: {e}")
+
+    async def count(self) -> int:
+        return int(await asyncio.to_thread(redis_client.hlen, ACTIVE_MATCHES_KEY) or 0)
+
+    async def list_matches(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Every live match with its current scores."""
+        rows = await self._read_live()
+
+        matches = []
+        for _, raw_details, live in rows:
+            details = loads(to_str(raw_details))
+            scores, names, statuses = {}, {}, {}
+            for j in range(0, len(live), 2):
+                field, value = to_str(live[j]), to_str(live[j + 1])
+                kind, _, uid = field.partition(":")
+                if kind == "score":
+                    scores[uid] = int(value or 0)
+                elif kind == "name":
+                    names[uid] = value
+                elif kind == "status":
+                    statuses[uid] = value
+
+            details["players"] = {**details.get("players", {}), **names}
+            details["scores"] = scores
+            details["statuses"] = statuses
+            matches.append(details)
+
+        matches.sort(key=lambda m: m.get("started_at") or "")
+        return matches[:limit] if limit else matches
+
+    async def _read_live(self) -> List[Tuple[str, Any, List[str]]]:
+        """
+        Registry from the primary node, then one HGETALL pipeline per shard,
+        all shards in parallel. Live keys are only ever named in commands
+        (never built inside a script), so this is safe on Redis Cluster.
+        Entries whose live hash has expired are pruned on the way.
+        """
+        raw = await asyncio.to_thread(redis_client.hgetall, ACTIVE_MATCHES_KEY) or {}
+        entries = {to_str(k): v for k, v in raw.items()}
+
+        async def read_shard(idx: int, match_ids: List[str]):
+            pipe = keyspace.shards[idx].pipeline()
+            for mid in match_ids:
+                pipe.hgetall(MatchKeys.live(mid))
+            return match_ids, await asyncio.to_thread(pipe.exec)
+
+        results = await asyncio.gather(*(read_shard(i, ids) for i, ids in keyspace.group(entries).items()))
+
+        rows, expired = [], []
+        for match_ids, lives in results:
+            for mid, live in zip(match_ids, lives):
+                if not live:
+                    expired.append(mid)
+                    continue
+                fields = []
+                for k, v in live.items():
+                    if to_str(k).partition(":")[0] in LIVE_FIELD_KINDS:
+                        fields += [k, v]
+                rows.append((mid, entries[mid], fields))
+        if expired:
+            await asyncio.to_thread(redis_client.hdel, ACTIVE_MATCHES_KEY, *expired)
+        return rows
+
+
+# Global instance
+active_match_registry = ActiveMatchRegistry()
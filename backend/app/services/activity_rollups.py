@@ -0,0 +1,198 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from app.db.mongodb import db
+from app.db.redis import redis_client
+from app.core.config import settings
+from app.services.game_utils import to_str
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 📈 ACTIVITY ROLLUPS ---
+# Redis (hot):  activity:hourly:{YYYY-MM-DD}  Hash  "HH" -> finished matches
+# Mongo (cold): activity_rollups {_id: "YYYY-MM-DD", hours: {"HH": n}, total: n}
+# Match finalization does one HINCRBY; a periodic flush copies recent days to Mongo.
+HOURLY_PREFIX = "activity:hourly"
+REDIS_RETENTION = 35 * 86400
+FLUSH_LOCK = "lock:activity_flush"
+RANGES = {"24h": 2, "7d": 7, "30d": 30}  # range -> number of UTC days to read
+HOURS = [f"{h:02d}" for h in range(24)]
+
+
+def _day(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d")
+
+
+def _last_24_hours(now: datetime) -> List[datetime]:
+    """The 24 hourly buckets ending at the current hour, oldest first."""
+    return [now - timedelta(hours=i) for i in reversed(range(24))]
+
+
+class ActivityRollupService:
+    def __init__(self):
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self):
+        if db.db is None:
+            raise ConnectionError("MongoDB Database not initialized.")
+        return db.db.activity_rollups
+
+    # --- ✍️ WRITE PATH ---
+    async def record_match(self, when: Optional[datetime] = None):
+        """One pipelined HINCRBY per finished match."""
+        when = when or datetime.now(timezone.utc)
+        key = f"{HOURLY_PREFIX}:{_day(when)}"
+        pipe = redis_client.pipeline()
+        pipe.hincrby(key, when.strftime("%H"), 1)
+        pipe.expire(key, REDIS_RETENTION)
+        try:
+            await asyncio.to_thread(pipe.exec)
+        except Exception as e:
+            logger.error(f"Activity Rollup Update Failed: {e}")
+
+    # --- 📖 READ PATH ---
+    async def _load_days(self, days: List[str]) -> Dict[str, Dict[str, int]]:
+        """Reads day hashes in one pipeline, falling back to Mongo for missing days."""
+        pipe = redis_client.pipeline()
+        for d in days:
+            pipe.hgetall(f"{HOURLY_PREFIX}:{d}")
+        raw = await asyncio.to_thread(pipe.exec)
+
+        result = {}
+        for d, h in zip(days, raw):
+            if h:
+                result[d] = {to_str(k): int(to_str(v)) for k, v in h.items()}
+
+        missing = [d for d in days if d not in result]
+        if missing:
+            async for doc in self.collection.find({"_id": {"$in": missing}}):
+                result[doc["_id"]] = doc.get("hours", {})
+        return result
+
+    async def get_series(self, range_key: str = "24h"):
+        """
+        24h -> 24 hourly points ending at the current hour.
+        7d/30d -> one point per day.
+        """
+        now = datetime.now(timezone.utc)
+        day_count = RANGES[range_key]
+        days = [_day(now - timedelta(days=i)) for i in reversed(range(day_count))]
+        data = await self._load_days(days)
+
+        if range_key == "24h":
+            points = []
+            for t in _last_24_hours(now):
+                points.append({
+                    "time": t.strftime("%Y-%m-%dT%H:00:00Z"),
+                    "matches": data.get(_day(t), {}).get(t.strftime("%H"), 0)
+                })
+            return points
+
+        return [{"date": d, "matches": sum(data.get(d, {}).values())} for d in days]
+
+    async def get_daily_totals(self, days: List[str]) -> Dict[str, int]:
+        """Finished matches per UTC day ("YYYY-MM-DD")."""
+        data = await self._load_days(days)
+        return {d: sum(data.get(d, {}).values()) for d in days}
+
+    async def get_peak_hours(self, range_key: str = "30d"):
+        """Hour-of-day histogram over the range (the Recharts 'peak times' shape)."""
+        now = datetime.now(timezone.utc)
+        days = [_day(now - timedelta(days=i)) for i in range(RANGES[range_key])]
+        data = await self._load_days(days)
+
+        totals = {h: 0 for h in HOURS}
+        if range_key == "24h":
+            # Two UTC days are loaded; keep only the last 24 hourly buckets
+            for t in _last_24_hours(now):
+                totals[t.strftime("%H")] += data.get(_day(t), {}).get(t.strftime("%H"), 0)
+        else:
+            for hours in data.values():
+                for h, n in hours.items():
+                    totals[h] = totals.get(h, 0) + n
+        return [{"hour": h, "matches": totals[h]} for h in HOURS]
+
+    # --- 💾 MONGO FLUSH ---
+    async def flush(self, days_back: int = 1):
+        """Copies today's (and recent) Redis hashes into Mongo. Idempotent ($set)."""
+        now = datetime.now(timezone.utc)
+        days = [_day(now - timedelta(days=i)) for i in range(days_back + 1)]
+
+        pipe = redis_client.pipeline()
+        for d in days:
+            pipe.hgetall(f"{HOURLY_PREFIX}:{d}")
+        raw = await asyncio.to_thread(pipe.exec)
+
+        for d, h in zip(days, raw):
+            if not h:
+                continue
+            hours = {to_str(k): int(to_str(v)) for k, v in h.items()}
+            await self.collection.update_one(
+                {"_id": d},
+                {"$set": {"hours": hours, "total": sum(hours.values()), "flushed_at": now}},
+                upsert=True
+            )
+
+    async def rebuild_from_matches(self, days: int = 30):
+        """One-off backfill from the matches collection (finished_at) into both tiers."""
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        rows = await db.db.matches.aggregate([
+            {"$match": {"status": "completed", "finished_at": {"$gte": since}}},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$finished_at"}},
+                    "hour": {"$dateToString": {"format": "%H", "date": "$finished_at"}}
+                },
+                "matches": {"$sum": 1}
+            }}
+        ]).to_list(None)
+
+        by_day: Dict[str, Dict[str, int]] = {}
+        for r in rows:
+            by_day.setdefault(r["_id"]["day"], {})[r["_id"]["hour"]] = r["matches"]
+
+        pipe = redis_client.pipeline()
+        for d, hours in by_day.items():
+            pipe.delete(f"{HOURLY_PREFIX}:{d}")
+            pipe.hset(f"{HOURLY_PREFIX}:{d}", values=hours)
+            pipe.expire(f"{HOURLY_PREFIX}:{d}", REDIS_RETENTION)
+        if by_day:
+            await asyncio.to_thread(pipe.exec)
+
+        for d, hours in by_day.items():
+            await self.collection.update_one(
+                {"_id": d},
+                {"$set": {"hours": hours, "total": sum(hours.values()), "flushed_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+        return len(by_day)
+
+    async def _flush_loop(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Only one worker flushes per interval
+                if redis_client.set(FLUSH_LOCK, "1", ex=max(interval - 5, 30), nx=True):
+                    await self.flush()
+            except Exception as e:
+                logger.error(f"Activity Rollup Flush Failed: {e}")
+
+    def start_flusher(self):
+        interval = settings.ACTIVITY_FLUSH_INTERVAL_SECONDS
+        if interval > 0 and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop(interval))
+
+    async def stop_flusher(self):
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+
+
+# Global instance
+activity_rollups = ActivityRollupService()
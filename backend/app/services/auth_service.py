@@ -1,29 +1,21 @@
 from app.repositories.user_repo import UserRepository
+from app.repositories.projections import UserFields
 from app.core.security import get_password_hash, verify_password
 from app.db.redis import redis_client
-import json
+from app.core.serialization import dumps, loads
 from datetime import datetime, timezone
-from bson import ObjectId
 import random
 import string
-# --- 🚀 CUSTOM ENCODER ---
-class MongoEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        return super().default(obj)
 
 class AuthService:
-    def __init__(self):
-        self.repo = UserRepository()
+    def __init__(self, user_repo: UserRepository = None):
+        self.repo = user_repo or UserRepository()
 
     def _prepare_for_cache(self, data: dict) -> str:
         """
-        Uses the Custom Encoder to handle nested dates and IDs automatically.
+        Nested dates and ObjectIds are handled by the shared serializer.
         """
-        return json.dumps(data, cls=MongoEncoder)
+        return dumps(data)
 
     async def get_user_by_email(self, email: str):
         """
@@ -31,9 +23,9 @@ class AuthService:
         """
         cached_user = redis_client.get(f"user:email:{email}")
         if cached_user:
-            return json.loads(cached_user)
+            return loads(cached_user)
 
-        user = await self.repo.get_by_email(email)
+        user = await self.repo.get_by_email(email, UserFields.LOGIN)
         
         if user:
             serialized_user = self._prepare_for_cache(user)
@@ -48,7 +40,7 @@ class AuthService:
         user = await self.get_user_by_email(identifier)
         
         if not user:
-            user = await self.repo.get_by_username(identifier)
+            user = await self.repo.get_by_username(identifier, UserFields.LOGIN)
             
         if not user:
             return None
@@ -76,8 +68,8 @@ class AuthService:
         if existing_device:
             return None # Or raise a custom exception
 
-        existing_email = await self.repo.get_by_email(email)
-        existing_user = await self.repo.get_by_username(username)
+        existing_email = await self.repo.get_by_email(email, UserFields.EXISTS)
+        existing_user = await self.repo.get_by_username(username, UserFields.EXISTS)
         
         if existing_email or existing_user:
             return None
@@ -104,22 +96,24 @@ class AuthService:
         
         return user_id
     
-    async def get_all_users_for_admin(self, page: int = 1, search: str = ""):
+    async def get_all_users_for_admin(self, page: int = 1, search: str = "", cursor: str = None, limit: int = 10):
         """
         Coordinates with UserRepository to provide paginated and 
         searchable data for the UserTable.tsx component.
+        Pass next_cursor back as `cursor` to page without skip().
         """
-        # We pass the logic down to the repo you just updated
-        users, total_pages = await self.repo.get_all_users(
+        users, total_pages, next_cursor = await self.repo.get_all_users(
             page=page, 
-            limit=10, 
-            search=search
+            limit=limit, 
+            search=search,
+            cursor=cursor
         )
         
         return {
             "users": users,
             "total_pages": total_pages,
-            "current_page": page
+            "current_page": page,
+            "next_cursor": next_cursor
         }
     
     async def is_device_registered(self, fingerprint: str) -> bool:
@@ -155,9 +149,7 @@ class AuthService:
         online_players = []
         for player in raw_list:
             try:
-                import json
-                p_str = player.decode("utf-8") if isinstance(player, bytes) else player
-                online_players.append(json.loads(p_str))
+                online_players.append(loads(player))
             except Exception:
                 continue
         return online_players
\ No newline at end of file
@@ -1,10 +1,13 @@
 import asyncio
-import json
+from app.core.serialization import dumps, loads
 import logging
 import time
 from app.db.redis import redis_client
+from app.db.keyspace import MatchKeys, match_redis
 from app.services.game_utils import to_str
 from app.services.wallet_service import WalletService
+from app.services.active_match_registry import active_match_registry
+from app.services.scoring_engine import scoring_engine
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -13,12 +16,13 @@ async def wait_for_match_ready(match_id: str, user_id: str, timeout: int = 30):
     🚀 UPSTASH OPTIMIZED: Efficient polling for match readiness.
     Ensures that both players are present in Redis before starting the UI.
     """
-    match_key = f"match:live:{match_id}"
+    match_key = MatchKeys.live(match_id)
+    match_store = match_redis(match_id)
     start_time = time.time()
     
     while time.time() - start_time < timeout:
         # 1. Fetch current state
-        raw_state = await asyncio.to_thread(redis_client.hgetall, match_key)
+        raw_state = await asyncio.to_thread(match_store.hgetall, match_key)
         match_state = {to_str(k): to_str(v) for k, v in raw_state.items()}
         
         rounds_json = match_state.get("rounds")
@@ -40,14 +44,15 @@ async def wait_for_match_ready(match_id: str, user_id: str, timeout: int = 30):
                 logger.info(f"Match {match_id} Ready: {user_id} vs {opponent_name}")
                 from app.services.lobby_manager import lobby_manager
                 await lobby_manager.broadcast_user_status(user_id, "playing")
-                # 🚀 ADD THIS: Save details for Admin Dashboard
-                match_info = {"id": match_id, "p1_name": user_id, "p2_name": opponent_name, "stake": 100} # Adjust stake as needed
-                redis_client.set(f"match_details:{match_id}", json.dumps(match_info), ex=1800)
-                redis_client.sadd("active_matches_set", match_id)
+                # Register for the Admin Dashboard (one hash for all live matches)
+                await active_match_registry.register(match_id, {
+                    user_id: match_state.get(f"name:{user_id}", user_id),
+                    opponent_id: opponent_name
+                })
                 redis_client.set(f"user_status:{user_id}", "playing", ex=600)
                 redis_client.incr(f"conn_count:{user_id}")
                 logger.info(f"Match {match_id} Ready: {user_id} vs {opponent_name}")
-                return json.loads(rounds_json), opponent_name, opponent_id
+                return loads(rounds_json), opponent_name, opponent_id
 
         # 3. Adaptive polling: Wait 1s between checks to save Upstash quota
         await asyncio.sleep(2.0)
@@ -58,15 +63,15 @@ async def finalize_match(ws, match_id, user_id, opponent_id, result_type, my_sco
     """
     🚀 UPDATED FINALIZE: Handles Paid Friendly Matches with Early Termination support.
     """
-    match_key = f"match:live:{match_id}"
-    lock_key = f"lock:finalizing:{match_id}"
+    match_key = MatchKeys.live(match_id)
+    lock_key = MatchKeys.finalize_lock(match_id)
+    match_store = match_redis(match_id)
     
-    locked = await asyncio.to_thread(redis_client.set, lock_key, "true", nx=True, ex=30)
+    locked = await asyncio.to_thread(match_store.set, lock_key, "true", nx=True, ex=30)
     
     if locked:
         logger.info(f"🏁 Finalizing match {match_id}. Reason: {result_type}")
-        redis_client.srem("active_matches_set", match_id)
-        redis_client.delete(f"match_details:{match_id}")
+        await active_match_registry.unregister(match_id)
         new_count = redis_client.decr(f"conn_count:{user_id}")
         if new_count > 0:
             redis_client.set(f"user_status:{user_id}", "online", ex=3600)
@@ -75,7 +80,7 @@ async def finalize_match(ws, match_id, user_id, opponent_id, result_type, my_sco
             redis_client.delete(f"user_status:{user_id}")
             redis_client.srem("online_players_set", user_id)
         
-        raw_data = await asyncio.to_thread(redis_client.hgetall, match_key)
+        raw_data = await asyncio.to_thread(match_store.hgetall, match_key)
         match_data = {to_str(k): to_str(v) for k, v in raw_data.items()}
         
         # Get the actual scores from Redis (source of truth)
@@ -147,12 +152,12 @@ async def finalize_match(ws, match_id, user_id, opponent_id, result_type, my_sco
             f"status:{user_id}": "FINISHED",
             f"status:{opponent_id}": "FINISHED",
             "finalized": "true",
-            f"final_result:{user_id}": json.dumps(results[user_id]),
-            f"final_result:{opponent_id}": json.dumps(results[opponent_id])
+            f"final_result:{user_id}": dumps(results[user_id]),
+            f"final_result:{opponent_id}": dumps(results[opponent_id])
         }
         
-        for field, value in final_update.items():
-            await asyncio.to_thread(redis_client.hset, match_key, field, value)
+        await asyncio.to_thread(match_store.hset, match_key, values=final_update)
+        scoring_engine.forget(match_id)
         
         return results[user_id]
     
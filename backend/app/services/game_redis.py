@@ -3,6 +3,7 @@ import logging
 from typing import Optional
 from app.core.security import decode_access_token
 from app.db.redis import redis_client
+from app.core.redis_budget import redis_budget
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -22,7 +23,9 @@ async def get_user_from_token(token: str, bot_id: Optional[str] = None) -> Optio
     # 👤 2. HUMAN JWT LOGIC
     try:
         payload = decode_access_token(token)
-        return payload.get("sub") if payload else None
+        user_id = payload.get("sub") if payload else None
+        redis_budget.note_user(user_id)
+        return user_id
     except Exception as e:
         logger.warning(f"❌ Token Auth Failed: {str(e)}")
         return None
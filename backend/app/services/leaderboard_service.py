@@ -0,0 +1,174 @@
+from app.core.serialization import dumps, loads
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+from app.db.redis import redis_client
+from app.services.game_utils import to_str
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 🏆 LEADERBOARD KEYS ---
+# All-time board keeps the absolute win count (ZADD), time buckets are
+# incremented per win (ZINCRBY) and expire on their own.
+BOARD_ALL_TIME = "leaderboard:wins"
+BOARD_DAILY_PREFIX = "leaderboard:wins:daily"
+BOARD_SEASON_PREFIX = "leaderboard:wins:season"
+PROFILES_KEY = "leaderboard:profiles"  # Hash: user_id -> pre-built profile JSON (no balance: it changes outside matches)
+LEADERBOARD_CACHE_KEY = "cache:leaderboard_full"  # /stats response (see app.core.cache)
+
+DAILY_TTL = 3 * 86400
+SEASON_TTL = 62 * 86400
+BOARDS = ("all", "daily", "season")
+
+# --- LUA SCRIPT FOR ONE-TRIP PAGE READS ---
+# Range + profiles + total + "my rank" in a single Upstash request.
+PAGE_LUA_SCRIPT = """
+local board = KEYS[1]
+local profiles = KEYS[2]
+local me = ARGV[3]
+
+local rows = redis.call('ZREVRANGE', board, tonumber(ARGV[1]), tonumber(ARGV[2]), 'WITHSCORES')
+local ids = {}
+for i = 1, #rows, 2 do
+    ids[#ids + 1] = rows[i]
+end
+
+local profs = {}
+if #ids > 0 then
+    profs = redis.call('HMGET', profiles, unpack(ids))
+end
+
+local total = redis.call('ZCARD', board)
+local my_rank = -1
+local my_score = ''
+local my_prof = ''
+if me ~= '' then
+    my_rank = redis.call('ZREVRANK', board, me) or -1
+    my_score = redis.call('ZSCORE', board, me) or ''
+    my_prof = redis.call('HGET', profiles, me) or ''
+end
+
+return {total, rows, profs, my_rank, my_score, my_prof}
+"""
+
+
+class LeaderboardService:
+    """
+    🚀 Incremental leaderboard engine.
+    Writes happen once per finished match, reads never touch MongoDB
+    unless the all-time board is completely empty.
+    """
+
+    # --- 🔑 KEY HELPERS ---
+    @staticmethod
+    def board_key(board: str = "all", period: Optional[str] = None) -> str:
+        now = datetime.now(timezone.utc)
+        if board == "daily":
+            return f"{BOARD_DAILY_PREFIX}:{period or now.strftime('%Y-%m-%d')}"
+        if board == "season":
+            return f"{BOARD_SEASON_PREFIX}:{period or now.strftime('%Y-%m')}"
+        return BOARD_ALL_TIME
+
+    @staticmethod
+    def _profile_blob(user: dict) -> str:
+        return dumps({
+            "username": user.get("username", "Unknown"),
+            "total_matches": int(user.get("total_matches", 0) or 0)
+        })
+
+    # --- ✍️ WRITE PATH ---
+    async def record_result(self, user: dict, is_win: bool):
+        """
+        Called from record_match_stats with the post-update user document.
+        One pipeline: absolute all-time score, bucket increments, profile refresh.
+        """
+        u_id = str(user["_id"])
+        daily_key = self.board_key("daily")
+        season_key = self.board_key("season")
+
+        pipe = redis_client.pipeline()
+        pipe.zadd(BOARD_ALL_TIME, {u_id: user.get("total_wins", 0)})
+        if is_win:
+            pipe.zincrby(daily_key, 1, u_id)
+            pipe.zincrby(season_key, 1, u_id)
+            pipe.expire(daily_key, DAILY_TTL)
+            pipe.expire(season_key, SEASON_TTL)
+        pipe.hset(PROFILES_KEY, u_id, self._profile_blob(user))
+
+        try:
+            await asyncio.to_thread(pipe.exec)
+        except Exception as e:
+            logger.error(f"Leaderboard Update Failed: {e}")
+
+    async def rebuild_from_mongo(self, users_collection, limit: int = 100):
+        """Cold-start fallback: seeds the all-time board from MongoDB."""
+        cursor = users_collection.find(
+            {}, {"username": 1, "total_wins": 1, "total_matches": 1}
+        ).sort("total_wins", -1).limit(limit)
+        mongo_users = await cursor.to_list(length=limit)
+        if not mongo_users:
+            return 0
+
+        pipe = redis_client.pipeline()
+        pipe.zadd(BOARD_ALL_TIME, {str(u["_id"]): u.get("total_wins", 0) for u in mongo_users})
+        pipe.hset(PROFILES_KEY, values={str(u["_id"]): self._profile_blob(u) for u in mongo_users})
+        await asyncio.to_thread(pipe.exec)
+        return len(mongo_users)
+
+    # --- 📖 READ PATH ---
+    async def get_page(
+        self,
+        board: str = "all",
+        page: int = 1,
+        limit: int = 10,
+        user_id: Optional[str] = None,
+        period: Optional[str] = None
+    ) -> Dict[str, Any]:
+        key = self.board_key(board, period)
+        start = (page - 1) * limit
+        stop = start + limit - 1
+
+        res = await asyncio.to_thread(
+            redis_client.eval,
+            PAGE_LUA_SCRIPT,
+            [key, PROFILES_KEY],
+            [str(start), str(stop), user_id or ""]
+        )
+        total, rows, profiles, my_rank, my_score, my_prof = res
+
+        players: List[Dict[str, Any]] = []
+        for i in range(0, len(rows), 2):
+            u_id = to_str(rows[i])
+            prof = profiles[i // 2] if i // 2 < len(profiles) else None
+            p_data = loads(prof) if prof else {}
+            players.append({
+                "rank": start + i // 2 + 1,
+                "user_id": u_id,
+                "username": p_data.get("username", "Unknown"),
+                "total_wins": int(float(rows[i + 1]))
+            })
+
+        me = None
+        if user_id:
+            rank = int(my_rank) if my_rank is not None else -1
+            me = {
+                "user_id": user_id,
+                "rank": rank + 1 if rank >= 0 else None,
+                "score": int(float(my_score)) if my_score else 0,
+                "username": loads(my_prof).get("username") if my_prof else None
+            }
+
+        return {
+            "board": board,
+            "key": key,
+            "page": page,
+            "limit": limit,
+            "total": int(total or 0),
+            "players": players,
+            "me": me
+        }
+
+
+# Global instance
+leaderboard_service = LeaderboardService()
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from pymongo import UpdateOne
+from app.db.mongodb import db
+from app.db.redis import redis_client
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 📒 LEDGER COUNTERS ---
+# Running financial totals, updated with $inc after every money movement.
+# Each total is spread over COUNTER_SHARDS documents (a bump picks one at
+# random) so concurrent writers don't all contend on a single document;
+# readers sum the shards:
+#   {_id: "global:<n>"}          -> all-time totals
+#   {_id: "day:YYYY-MM-DD:<n>"}  -> per-day buckets (UTC)
+# Unsharded "global" / "day:YYYY-MM-DD" docs from before sharding are still
+# summed in, so existing totals carry over.
+#
+# Fields:
+#   liquidity            sum of all wallet balances
+#   deposits_total/count completed deposits
+#   withdrawals_total/count completed withdrawals
+#   withdrawals_pending  requested but not yet approved/rejected
+#   entry_fees           match entry fees collected (net of refunds)
+#   payouts              prize money paid out by finished matches
+#   matches              finished matches
+COUNTER_FIELDS = (
+    "liquidity",
+    "deposits_total", "deposits_count",
+    "withdrawals_total", "withdrawals_count", "withdrawals_pending",
+    "entry_fees", "payouts", "matches",
+)
+
+GLOBAL_ID = "global"
+COUNTER_SHARDS = 8
+RECONCILE_LOCK = "lock:ledger_reconcile"
+
+
+def _day_id(now: Optional[datetime] = None) -> str:
+    return f"day:{(now or datetime.now(timezone.utc)).strftime('%Y-%m-%d')}"
+
+
+def _shard_ids(base: str) -> List[str]:
+    return [base] + [f"{base}:{n}" for n in range(COUNTER_SHARDS)]
+
+
+class LedgerCounterService:
+    def __init__(self):
+        self._reconciler: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self):
+        if db.db is None:
+            raise ConnectionError("MongoDB Database not initialized.")
+        return db.db.ledger_counters
+
+    # --- ✍️ WRITE PATH ---
+    async def bump(self, session=None, **deltas: float):
+        """
+        Adds deltas to one random shard of the global and today's counters in one bulk_write.
+        Call it after the money movement has committed. Inside a `session` the
+        error is re-raised so the caller's transaction fails with it; on its own
+        it is only logged, as the reconciler repairs any drift.
+        """
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return
+
+        now = datetime.now(timezone.utc)
+        shard = random.randrange(COUNTER_SHARDS)
+        # `writes` lets the reconciler notice bumps that land while it aggregates
+        inc = {**deltas, "writes": 1}
+        ops = [
+            UpdateOne({"_id": f"{GLOBAL_ID}:{shard}"}, {"$inc": inc, "$set": {"updated_at": now}}, upsert=True),
+            UpdateOne(
+                {"_id": f"{_day_id(now)}:{shard}"},
+                {"$inc": inc, "$set": {"updated_at": now}, "$setOnInsert": {"date": now.strftime("%Y-%m-%d")}},
+                upsert=True
+            ),
+        ]
+        try:
+            await self.collection.bulk_write(ops, ordered=False, session=session)
+        except Exception as e:
+            if session is not None:
+                raise
+            logger.error(f"Ledger Counter Update Failed ({deltas}): {e}")
+
+    async def _sum_shards(self, base: str) -> Dict[str, float]:
+        docs = await self.collection.find({"_id": {"$in": _shard_ids(base)}}).to_list(COUNTER_SHARDS + 1)
+        return {f: sum(d.get(f, 0) for d in docs) for f in COUNTER_FIELDS + ("writes",)}
+
+    # --- 📖 READ PATH ---
+    async def get_totals(self) -> Dict[str, Dict[str, float]]:
+        """O(1) read: the global shards plus today's, summed."""
+        global_totals, today = await asyncio.gather(self._sum_shards(GLOBAL_ID), self._sum_shards(_day_id()))
+
+        def clean(totals):
+            return {f: totals[f] for f in COUNTER_FIELDS}
+
+        return {"global": clean(global_totals), "today": clean(today)}
+
+    async def get_liquidity(self) -> float:
+        docs = await self.collection.find(
+            {"_id": {"$in": _shard_ids(GLOBAL_ID)}}, {"liquidity": 1}
+        ).to_list(COUNTER_SHARDS + 1)
+        return float(sum(d.get("liquidity", 0) for d in docs))
+
+    # --- 🧮 RECONCILIATION ---
+    async def reconcile(self) -> Dict[str, float]:
+        """
+        Recomputes the counters that can be derived from source collections
+        and $inc's the drift into the global counters. Fee/payout totals have no
+        source of truth yet, so they are left as accumulated.
+        If any bump lands while the sources are being aggregated, the pass is
+        skipped (returns {}) rather than repairing against a moving target;
+        the next interval tries again.
+        """
+        database = self.collection.database
+        before = await self._sum_shards(GLOBAL_ID)
+
+        async def _sum(collection: str, match: dict, field: str):
+            res = await database[collection].aggregate([
+                {"$match": match},
+                {"$group": {"_id": None, "total": {"$sum": f"${field}"}, "count": {"$sum": 1}}}
+            ]).to_list(1)
+            return (res[0]["total"], res[0]["count"]) if res else (0, 0)
+
+        (dep_total, dep_count), (wd_total, wd_count), (wd_pending, _), (liquidity, _), (user_matches, _) = await asyncio.gather(
+            _sum("deposits", {"status": "COMPLETED"}, "amount"),
+            _sum("withdrawals", {"status": "COMPLETED"}, "amount"),
+            _sum("withdrawals", {"status": "PENDING"}, "amount"),
+            _sum("users", {}, "wallet_balance"),
+            _sum("users", {}, "total_matches"),
+        )
+
+        fresh = {
+            "liquidity": liquidity,
+            "deposits_total": dep_total,
+            "deposits_count": dep_count,
+            "withdrawals_total": wd_total,
+            "withdrawals_count": wd_count,
+            "withdrawals_pending": wd_pending,
+            # total_matches is counted once per player
+            "matches": user_matches // 2,
+        }
+
+        current = await self._sum_shards(GLOBAL_ID)
+        if current["writes"] != before["writes"]:
+            logger.info("📒 Ledger counters moved during reconciliation; retrying next interval")
+            return {}
+
+        drift = {k: round(v - current[k], 2) for k, v in fresh.items() if round(v - current[k], 2)}
+        if drift:
+            logger.warning(f"📒 Ledger counters drifted, repairing: {drift}")
+
+        # $inc, not $set: a bump committing right now is added on top, never erased
+        update = {"$set": {"reconciled_at": datetime.now(timezone.utc)}}
+        if drift:
+            update["$inc"] = drift
+        await self.collection.update_one({"_id": f"{GLOBAL_ID}:0"}, update, upsert=True)
+        return drift
+
+    async def _reconcile_loop(self, interval: int):
+        while True:
+            try:
+                # Only one worker reconciles per interval
+                if redis_client.set(RECONCILE_LOCK, "1", ex=max(interval - 5, 30), nx=True):
+                    await self.reconcile()
+            except Exception as e:
+                logger.error(f"Ledger Reconciliation Failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start_reconciler(self):
+        interval = settings.LEDGER_RECONCILE_INTERVAL_SECONDS
+        if interval > 0 and self._reconciler is None:
+            self._reconciler = asyncio.create_task(self._reconcile_loop(interval))
+
+    async def stop_reconciler(self):
+        if self._reconciler:
+            self._reconciler.cancel()
+            try:
+                await self._reconciler
+            except asyncio.CancelledError:
+                pass
+            self._reconciler = None
+
+
+# Global instance
+ledger_counters = LedgerCounterService()
@@ -1,7 +1,9 @@
 from fastapi import WebSocket
-from typing import Dict
+from typing import Dict, Optional
 import logging
-import json
+from app.core.serialization import dumps
+from app.core import ws_protocol
+from app.core.ws_protocol import FrameSocket
 from app.db.redis import redis_client
 from datetime import datetime
 import asyncio
@@ -11,14 +13,14 @@ logger = logging.getLogger("uvicorn.error")
 
 class LobbyManager:
     def __init__(self):
-        # Maps user_id -> WebSocket connection
-        self.active_connections: Dict[str, WebSocket] = {}
+        # Maps user_id -> lobby socket (negotiated frame protocol)
+        self.active_connections: Dict[str, FrameSocket] = {}
         # Track local presence
         self.local_presence: Dict[str, str] = {}
 
-    async def connect(self, user_id: str, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
+    async def connect(self, user_id: str, websocket: WebSocket) -> FrameSocket:
+        sock = await ws_protocol.accept(websocket, endpoint="lobby")
+        self.active_connections[user_id] = sock
     
         try:
             # --- SOLUTION A: REFERENCE COUNTING ---
@@ -36,6 +38,7 @@ class LobbyManager:
             
         except Exception as e:
             logger.error(f"Redis Error in connect: {e}")
+        return sock
 
     async def disconnect(self, user_id: str):
         # Remove from local dict first to stop message sending attempts
@@ -53,7 +56,7 @@ class LobbyManager:
 
             # ONLY mark offline if this was the last remaining socket
             if conn_count <= 0:
-                print(f"📡 DISCONNECT LOG: User {user_id} has 0 connections. Marking Offline.")
+                logger.debug(f"📡 DISCONNECT LOG: User {user_id} has 0 connections. Marking Offline.")
                 
                 redis_client.srem("online_players_set", user_id)
                 redis_client.delete(f"user_status:{user_id}")
@@ -63,37 +66,44 @@ class LobbyManager:
                 if user_id in self.local_presence:
                     del self.local_presence[user_id]
             else:
-                print(f"🛡️ PRESERVING STATUS: {user_id} still has {conn_count} socket(s) open.")
+                logger.debug(f"🛡️ PRESERVING STATUS: {user_id} still has {conn_count} socket(s) open.")
 
         except Exception as e:
             logger.error(f"Redis Error in disconnect: {e}")
 
     async def broadcast_user_status(self, user_id: str, status: str):
-        payload = {
+        await self._broadcast({
             "type": "USER_STATUS_CHANGE",
             "user_id": user_id,
             "status": status
-        }
-        
+        }, exclude=user_id)
+
+    async def broadcast_global_announcement(self, message: str):
+        await self._broadcast({"type": "GLOBAL_ANNOUNCEMENT", "message": message})
+
+    async def _broadcast(self, payload: dict, exclude: Optional[str] = None):
+        # Serialize once, not once per socket
+        message = dumps(payload)
+
         # ✅ FIXED: Using list() to prevent "dictionary changed size" error
         active_uids = list(self.active_connections.keys())
         
         for uid in active_uids:
-            if uid == user_id:
+            if uid == exclude:
                 continue
             socket = self.active_connections.get(uid)
             if socket:
                 try:
-                    await socket.send_json(payload)
+                    await socket.send_serialized(message)
                 except Exception:
                     # Don't call disconnect inside the loop; it's handled by the ping/pong or error catchers
                     pass
 
     async def send_personal_message(self, message: dict, user_id: str):
         if user_id in self.active_connections:
-            websocket = self.active_connections[user_id]
+            sock = self.active_connections[user_id]
             try:
-                await websocket.send_json(message)
+                await sock.send(message)
                 return True
             except Exception as e:
                 logger.error(f"⚠️ Failed to send lobby message to {user_id}: {e}")
@@ -0,0 +1,285 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.metrics import metrics, ws_timer
+from app.core.serialization import loads
+from app.core.ws_protocol import FrameError, FrameSocket
+from app.db.keyspace import MatchKeys, match_redis
+from app.services.game_utils import to_str
+from app.services.game_lifecycle import finalize_match
+from app.services.scoring_engine import OUTDATED_CLIENT, scoring_engine
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 🎯 IN-PROCESS MATCH AUTHORITY ---
+# When both players of a match are connected to this worker, one actor owns
+# the match: score updates are applied in memory and SYNC_STATE is pushed to
+# both sockets immediately, instead of HSET + a 2s HGETALL poll per player.
+# Redis still gets a snapshot every MATCH_SNAPSHOT_SECONDS (and right before
+# finalizing), so a reconnect after a crash resumes on the Redis path.
+# The actor only ever writes the players whose sockets it holds. When either
+# player leaves this worker, it writes their state back once and hands the
+# match to the Redis path: the remaining player falls through to polling, so
+# a reconnect on another worker is never overwritten or declared fled.
+GRACE_PERIOD_SECONDS = 15
+TICK_SECONDS = 1.0
+MESSAGE_TYPES = frozenset({"PING", "ROUND_SUBMIT", "SCORE_UPDATE", "GAME_OVER"})
+
+metrics.describe("match_sessions_total", "Player match sessions by state authority (local actor or Redis polling)")
+
+
+class MatchActor:
+    def __init__(self, match_id: str):
+        self.match_id = match_id
+        self.sockets: Dict[str, FrameSocket] = {}
+        self.players: Optional[tuple] = None
+        self.names: Dict[str, str] = {}
+        self.scores: Dict[str, int] = {}
+        self.statuses: Dict[str, str] = {}
+        self.last_seen: Dict[str, float] = {}
+        self.done = asyncio.Event()
+        self.finished = False  # done + finished: match over; done alone: handed back to Redis
+        self.handed_back = False
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._starting: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._last_synced: Dict[str, tuple] = {}
+
+    # --- 🚀 ACTIVATION ---
+    async def start(self, user_id: str, opponent_id: str, user_repo):
+        """Seeds state from the Redis hash once; the second player waits for the same seed."""
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._seed_and_run(user_id, opponent_id, user_repo))
+        await asyncio.shield(self._starting)
+
+    async def _seed_and_run(self, user_id: str, opponent_id: str, user_repo):
+        self.players = (user_id, opponent_id)
+        raw = await asyncio.to_thread(match_redis(self.match_id).hgetall, MatchKeys.live(self.match_id))
+        data = {to_str(k): to_str(v) for k, v in (raw or {}).items()}
+        now = time.time()
+        for uid in self.players:
+            self.names[uid] = data.get(f"name:{uid}", "Opponent")
+            tally = scoring_engine.tally(self.match_id, uid)
+            self.scores[uid] = tally.score if tally else int(data.get(f"score:{uid}", 0) or 0)
+            self.statuses[uid] = data.get(f"status:{uid}", "PLAYING")
+            self.last_seen[uid] = float(data.get(f"last_seen:{uid}", now) or now)
+        self._task = asyncio.create_task(self._run(user_repo))
+
+    def add_socket(self, user_id: str, sock: FrameSocket):
+        self.sockets[user_id] = sock
+        self._last_synced.pop(user_id, None)  # A reconnecting player gets a fresh SYNC_STATE
+
+    async def serve(self, user_id: str, sock: FrameSocket) -> bool:
+        """
+        Feeds one player's frames to the actor until the match ends or the socket drops.
+        Returns True once the match is finished, False if it was handed back to
+        the Redis path (the caller carries on polling with the same socket).
+        """
+        async def reader():
+            while True:
+                try:
+                    data = await sock.receive()
+                except FrameError:
+                    await sock.send({"type": "ERROR", "message": "Malformed frame"})
+                    continue
+                with ws_timer("match", data.get("type"), MESSAGE_TYPES):
+                    if data.get("type") == "PING":
+                        await sock.send({"type": "PONG"})
+                    elif data.get("type") == "SCORE_UPDATE" and not scoring_engine.accepts_legacy(user_id):
+                        await sock.send({"type": "ERROR", "message": OUTDATED_CLIENT})
+                    else:
+                        self._inbox.put_nowait((data.get("type"), user_id, data))
+
+        read_task = asyncio.create_task(reader())
+        done_task = asyncio.create_task(self.done.wait())
+        try:
+            await asyncio.wait({read_task, done_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for t in (read_task, done_task):
+                t.cancel()
+        if read_task.done() and not read_task.cancelled() and read_task.exception():
+            raise read_task.exception()  # detach() hands the match back
+        if not self.finished:
+            # Frames the reader queued after the actor stopped still count
+            self._drain()
+            await self._snapshot((user_id,))
+        self._drop(user_id, sock)
+        return self.finished
+
+    async def release(self, user_id: str, sock: FrameSocket):
+        """A player left this worker: write their state back once and hand the match to Redis."""
+        if self.sockets.get(user_id) is not sock:
+            return  # Already reconnected here on a new socket; that one stays
+        if self.players is None or self.done.is_set() or self.handed_back:
+            self._drop(user_id, sock)
+            return
+        self.handed_back = True
+        self._drain()
+        self._drop(user_id, sock)
+        self._inbox.put_nowait((None, None, None))  # Wake the loop
+        await self._snapshot((user_id,))
+
+    def _drop(self, user_id: str, sock: FrameSocket):
+        # A reconnect may have replaced the socket while the old handler unwinds
+        if self.sockets.get(user_id) is sock:
+            del self.sockets[user_id]
+
+    def _apply(self, kind: str, user_id: str, data: dict):
+        if kind == "ROUND_SUBMIT":
+            tally = scoring_engine.submit(self.match_id, user_id, data.get("round"), data.get("taps") or [])
+            if tally:
+                self.scores[user_id] = tally.score
+            self.last_seen[user_id] = time.time()
+            self._dirty = True
+        elif kind == "SCORE_UPDATE":
+            new_score = scoring_engine.legacy_score(self.match_id, user_id, data.get("score", 0))
+            if new_score is not None:
+                # Only an accepted update proves the player is still in the game
+                self.scores[user_id] = new_score
+                self.last_seen[user_id] = time.time()
+                self._dirty = True
+        elif kind == "GAME_OVER":
+            self.statuses[user_id] = "FINISHED"
+            self._dirty = True
+
+    def _drain(self):
+        while not self._inbox.empty():
+            kind, user_id, data = self._inbox.get_nowait()
+            if kind:
+                self._apply(kind, user_id, data)
+
+    # --- 🔁 ACTOR LOOP ---
+    async def _run(self, user_repo):
+        last_snapshot = time.monotonic()
+        while not self.done.is_set():
+            try:
+                kind, user_id, data = await asyncio.wait_for(self._inbox.get(), TICK_SECONDS)
+            except asyncio.TimeoutError:
+                kind = None
+            try:
+                if kind:
+                    self._apply(kind, user_id, data)
+
+                if self.handed_back or not self.sockets:
+                    # A player left this worker; the rest of the match runs on Redis
+                    await self._snapshot()
+                    break
+                await self._push_sync()
+                if await self._check_end(user_repo):
+                    break
+                if self._dirty and time.monotonic() - last_snapshot >= settings.MATCH_SNAPSHOT_SECONDS:
+                    await self._snapshot()
+                    last_snapshot = time.monotonic()
+            except Exception as e:
+                logger.error(f"Match Authority Error ({self.match_id}): {e}")
+        self.done.set()
+
+    async def _push_sync(self):
+        p1, p2 = self.players
+        for me, op in ((p1, p2), (p2, p1)):
+            state = (self.scores[me], self.scores[op])
+            sock = self.sockets.get(me)
+            if sock and self._last_synced.get(me) != state:
+                try:
+                    await sock.send({"type": "SYNC_STATE", "your_score": state[0], "opponent_score": state[1]})
+                    self._last_synced[me] = state
+                except Exception:
+                    pass  # The reader sees the dead socket and detach() hands the match back
+
+    async def _check_end(self, user_repo) -> bool:
+        """Same rules as the Redis monitor loop in gameplay.py, evaluated once for the pair."""
+        p1, p2 = self.players
+        s1, s2 = self.scores[p1], self.scores[p2]
+        f1, f2 = self.statuses[p1] == "FINISHED", self.statuses[p2] == "FINISHED"
+
+        if (f1 and s2 > s1) or (f2 and s1 > s2):
+            return await self._finish(p1, p2, "EARLY_WIN", user_repo)
+        if f1 and f2:
+            return await self._finish(p1, p2, "NORMAL", user_repo)
+        now = time.time()
+        for me, op in ((p1, p2), (p2, p1)):
+            if self.statuses[op] != "FINISHED" and now - self.last_seen[op] > GRACE_PERIOD_SECONDS and me in self.sockets:
+                return await self._finish(me, op, "OPPONENT_FLED", user_repo)
+        return False
+
+    async def _snapshot(self, players: Optional[tuple] = None):
+        """Writes the given players' state (default: those connected here) in one HSET."""
+        values = {}
+        for uid in players if players is not None else [p for p in self.players if p in self.sockets]:
+            values[f"score:{uid}"] = self.scores[uid]
+            values[f"status:{uid}"] = self.statuses[uid]
+            values[f"last_seen:{uid}"] = str(self.last_seen[uid])
+            tally = scoring_engine.tally(self.match_id, uid)
+            if tally:
+                values[f"round:{uid}"] = tally.next_round
+                values[f"ended:{uid}"] = int(tally.ended)
+        if not values:
+            return
+        await asyncio.to_thread(match_redis(self.match_id).hset, MatchKeys.live(self.match_id), values=values)
+        self._dirty = False
+
+    async def _finish(self, caller: str, opponent: str, result_type: str, user_repo) -> bool:
+        # finalize_match reads scores from Redis, so flush the in-memory state first
+        await self._snapshot()
+        self.finished = True
+        await finalize_match(
+            None, self.match_id, caller, opponent, result_type,
+            self.scores[caller], self.scores[opponent], self.names[opponent], user_repo
+        )
+        store, key = match_redis(self.match_id), MatchKeys.live(self.match_id)
+        results = await asyncio.to_thread(store.hmget, key, *[f"final_result:{uid}" for uid in self.players])
+        for uid, raw in zip(self.players, results or []):
+            sock = self.sockets.get(uid)
+            if sock and raw:
+                try:
+                    await sock.send({"type": "RESULT", **loads(to_str(raw))})
+                except Exception:
+                    pass
+        logger.info(f"🎯 Match {self.match_id} finished in-process ({result_type})")
+        return True
+
+
+class MatchAuthorityRegistry:
+    """Actors for matches whose players are connected to this worker."""
+
+    def __init__(self):
+        self._actors: Dict[str, MatchActor] = {}
+
+    def attach(self, match_id: str, user_id: str, sock: FrameSocket):
+        """Called on connect, before the player's name is written to Redis."""
+        if not settings.MATCH_AUTHORITY_ENABLED:
+            return
+        actor = self._actors.get(match_id)
+        if actor is None or actor.done.is_set():
+            actor = self._actors[match_id] = MatchActor(match_id)
+        actor.add_socket(user_id, sock)
+
+    async def detach(self, match_id: str, user_id: str, sock: FrameSocket):
+        actor = self._actors.get(match_id)
+        if actor is None:
+            return
+        # A running actor writes this player back and hands the match to Redis
+        await actor.release(user_id, sock)
+        if not actor.sockets:
+            self._actors.pop(match_id, None)
+
+    async def claim(self, match_id: str, user_id: str, opponent_id: str, user_repo) -> Optional[MatchActor]:
+        """
+        The actor, if the opponent's socket is on this worker too. Both players
+        attach before announcing themselves in Redis, so once wait_for_match_ready
+        has seen the opponent, a same-worker opponent is already attached.
+        """
+        actor = self._actors.get(match_id)
+        local = actor is not None and user_id in actor.sockets and opponent_id in actor.sockets
+        metrics.inc("match_sessions_total", labels={"authority": "local" if local else "redis"})
+        if not local:
+            return None
+        await actor.start(user_id, opponent_id, user_repo)
+        return actor
+
+
+# Global instance
+match_authorities = MatchAuthorityRegistry()
@@ -7,7 +7,10 @@ from datetime import datetime, timezone
 from fastapi import HTTPException
 from app.repositories.match_repo import MatchRepository
 from app.repositories.user_repo import UserRepository
+from app.repositories.projections import UserFields
+from app.repositories.ledger_repo import ENTRY_FEE, REFUND
 from app.db.redis import redis_client
+from app.db.keyspace import MatchKeys, match_redis
 import httpx # Add this at the top of your file
 import os
 
@@ -18,13 +21,13 @@ BOT_SERVER_URL = os.getenv("BOT_SERVER_URL", "http://127.0.0.1:10000")
 class MatchmakingService:
     
   
-    def __init__(self):
-        self.match_repo = MatchRepository()
-        self.user_repo = UserRepository()
+    def __init__(self, match_repo: MatchRepository = None, user_repo: UserRepository = None):
+        self.match_repo = match_repo or MatchRepository()
+        self.user_repo = user_repo or UserRepository()
 
     async def find_or_create_match(self, user_id: str):
         # 1. 💰 Wallet Check
-        user = await self.user_repo.get_by_id(user_id)
+        user = await self.user_repo.get_by_id(user_id, UserFields.WALLET)
         if not user or user.get("wallet_balance", 0) < 100:
             raise HTTPException(status_code=400, detail="Insufficient funds")
 
@@ -47,7 +50,7 @@ class MatchmakingService:
                     return {"status": "WAITING"}
 
                 # --- ✅ MATCH FOUND: DEDUCT & CREATE ---
-                await self.user_repo.update_wallet(user_id, -100.0)
+                await self.user_repo.update_wallet(user_id, -100.0, counters={"entry_fees": 100.0}, entry_type=ENTRY_FEE)
                 
                 match_id = f"match_{uuid.uuid4().hex[:8]}"
 
@@ -64,13 +67,13 @@ class MatchmakingService:
 
                 except Exception as db_error:
                     logger.error(f"❌ Failed to create match in DB: {db_error}")
-                    await self.user_repo.update_wallet(user_id, 100.0)
+                    await self.user_repo.update_wallet(user_id, 100.0, counters={"entry_fees": -100.0}, entry_type=REFUND)
                     redis_client.sadd("matchmaking_pool", opponent_id)
                     raise HTTPException(status_code=500, detail="Match creation failed. Funds refunded.")
 
             else:
                 # --- ⏳ JOIN THE POOL & START BOT TIMER ---
-                await self.user_repo.update_wallet(user_id, -100.0)
+                await self.user_repo.update_wallet(user_id, -100.0, counters={"entry_fees": 100.0}, entry_type=ENTRY_FEE)
                 
                 try:
                     redis_client.sadd("matchmaking_pool", user_id)
@@ -98,14 +101,15 @@ class MatchmakingService:
                     # 3. Create Record & Redis Metadata
                     await self.match_repo.create_match_record(match_id, bot_id, user_id, 100.0)
                     
-                    match_key = f"match:live:{match_id}"
-                    redis_client.hset(match_key, mapping={ 
+                    match_key = MatchKeys.live(match_id)
+                    match_store = match_redis(match_id)
+                    match_store.hset(match_key, mapping={ 
                         "p1_id": user_id,
                         "p2_id": bot_id,
                         "status": "CREATED",
                         "bet_amount": "100.0"
                     })
-                    redis_client.expire(match_key, 600)
+                    match_store.expire(match_key, 600)
 
                     # ✅ TRIGGER THE BOT: Wake it up via HTTP
                     # We use create_task so we don't block the user's response
@@ -120,7 +124,7 @@ class MatchmakingService:
 
                 except Exception as redis_err:
                     logger.error(f"Bot/Pool Error: {redis_err}")
-                    await self.user_repo.update_wallet(user_id, 100.0) 
+                    await self.user_repo.update_wallet(user_id, 100.0, counters={"entry_fees": -100.0}, entry_type=REFUND) 
                     redis_client.srem("matchmaking_pool", user_id)
                     raise HTTPException(status_code=500, detail="Matchmaking server busy. Funds refunded.")
 
@@ -149,7 +153,7 @@ class MatchmakingService:
             # 1. Standard Case: User is still in the pool
             removed = redis_client.srem("matchmaking_pool", user_id)
             if removed:
-                await self.user_repo.update_wallet(user_id, 100.0)
+                await self.user_repo.update_wallet(user_id, 100.0, counters={"entry_fees": -100.0}, entry_type=REFUND)
                 logger.info(f"✅ User {user_id} cancelled and was refunded 50 PKR.")
                 return {"status": "cancelled", "refunded": True}
             
@@ -157,16 +161,17 @@ class MatchmakingService:
             notif = redis_client.get(f"notify:{user_id}")
             if notif:
                 match_id = notif.decode() if isinstance(notif, bytes) else str(notif)
-                match_key = f"match:live:{match_id}"
+                match_key = MatchKeys.live(match_id)
+                match_store = match_redis(match_id)
                 
                 
                 # Check if the user has posted any score yet
-                has_score = redis_client.hexists(match_key, f"score:{user_id}")
+                has_score = match_store.hexists(match_key, f"score:{user_id}")
                 
                 if not has_score:
                     # Clear the notification and refund
                     redis_client.delete(f"notify:{user_id}")
-                    await self.user_repo.update_wallet(user_id, 100.0)
+                    await self.user_repo.update_wallet(user_id, 100.0, counters={"entry_fees": -100.0}, entry_type=REFUND)
                     logger.info(f"✅ User {user_id} refunded for unstarted match: {match_id}")
                     return {"status": "cancelled", "refunded": True}
                 else:
@@ -179,7 +184,7 @@ class MatchmakingService:
             raise HTTPException(status_code=500, detail="Service unavailable. Could not verify refund.")
         
     async def trigger_bot_spawn(self, match_id: str):
-        print(f"DEBUG: Attempting to wake up bot for {match_id}...") # Standard print always shows
+        logger.debug(f"Attempting to wake up bot for {match_id}...")
         bot_url = f"{BOT_SERVER_URL}/spawn-bot"
     
         try:
@@ -189,8 +194,7 @@ class MatchmakingService:
                 json={"match_id": match_id},
                 timeout=5.0
             )
-            print(f"DEBUG: Bot Server responded with: {response.status_code}")
+            logger.debug(f"Bot Server responded with: {response.status_code}")
             logger.info(f"🚀 Bot Triggered successfully for match: {match_id}")
         except Exception as e:
-            print(f"DEBUG: CRITICAL BOT TRIGGER FAILURE: {e}")
             logger.error(f"⚠️ Failed to trigger bot: {e}")
\ No newline at end of file
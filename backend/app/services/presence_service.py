@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from typing import Dict, Iterable
+from app.db.redis import redis_client
+from app.services.game_utils import to_str
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 🟢 PRESENCE KEYS (written by LobbyManager / game_lifecycle) ---
+ONLINE_SET = "online_players_set"
+STATUS_PREFIX = "user_status"
+
+OFFLINE = "offline"
+ONLINE = "online"
+
+
+class PresenceService:
+    """
+    🚀 Read side of user presence.
+    Resolves any number of users in one pipelined request (SMISMEMBER + MGET)
+    instead of SMEMBERS on the whole online set plus one GET per user.
+    """
+
+    async def get_statuses(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        ids = list(dict.fromkeys(str(u) for u in user_ids))
+        if not ids:
+            return {}
+
+        pipe = redis_client.pipeline()
+        pipe.smismember(ONLINE_SET, *ids)
+        pipe.mget(*[f"{STATUS_PREFIX}:{u}" for u in ids])
+        try:
+            members, statuses = await asyncio.to_thread(pipe.exec)
+        except Exception as e:
+            logger.error(f"Presence Lookup Failed: {e}")
+            return {u: OFFLINE for u in ids}
+
+        result = {}
+        for u_id, is_member, status in zip(ids, members, statuses):
+            if not int(is_member or 0):
+                result[u_id] = OFFLINE
+            else:
+                # In the set but the status key expired: still connected, idle
+                result[u_id] = to_str(status) if status else ONLINE
+        return result
+
+    async def get_status(self, user_id: str) -> str:
+        return (await self.get_statuses([user_id])).get(str(user_id), OFFLINE)
+
+    async def count_online(self) -> int:
+        return int(await asyncio.to_thread(redis_client.scard, ONLINE_SET) or 0)
+
+
+# Global instance
+presence_service = PresenceService()
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from app.db.redis import redis_client
+from app.core.config import settings
+from app.core.redis_budget import redis_budget, redis_feature
+from app.services.activity_rollups import activity_rollups
+from app.services.game_utils import to_str
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 🧾 REDIS USAGE LEDGER ---
+# redis_usage:{YYYY-MM-DD}        Hash         feature -> commands
+# redis_usage:cmd:{YYYY-MM-DD}    Hash         "feature|COMMAND" -> commands
+# redis_usage:users:{YYYY-MM-DD}  HyperLogLog  active user ids
+# Each worker adds its drained counters once per interval (one pipeline),
+# so the report covers every worker without touching the hot path.
+USAGE_PREFIX = "redis_usage"
+RETENTION = 35 * 86400
+
+
+def _day(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d")
+
+
+class RedisUsageService:
+    def __init__(self):
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def flush(self):
+        commands, users = redis_budget.drain()
+        if not commands and not users:
+            return
+        day = _day(datetime.now(timezone.utc))
+        totals: Dict[str, int] = {}
+        for (feature, _), n in commands.items():
+            totals[feature] = totals.get(feature, 0) + n
+
+        # The ledger's own writes are charged to "background"
+        with redis_feature("background"):
+            pipe = redis_client.pipeline()
+            for feature, n in totals.items():
+                pipe.hincrby(f"{USAGE_PREFIX}:{day}", feature, n)
+            for (feature, command), n in commands.items():
+                pipe.hincrby(f"{USAGE_PREFIX}:cmd:{day}", f"{feature}|{command.upper()}", n)
+            if users:
+                pipe.pfadd(f"{USAGE_PREFIX}:users:{day}", *users)
+            for key in ("", ":cmd", ":users"):
+                pipe.expire(f"{USAGE_PREFIX}{key}:{day}", RETENTION)
+            try:
+                await asyncio.to_thread(pipe.exec)
+            except Exception:
+                redis_budget.restore(commands, users)
+                raise
+
+    async def report(self, days: int = 1, top_commands: int = 5) -> dict:
+        """Commands per feature over the last `days` UTC days, with per-match and per-user ratios."""
+        now = datetime.now(timezone.utc)
+        day_list: List[str] = [_day(now - timedelta(days=i)) for i in reversed(range(days))]
+
+        with redis_feature("admin"):
+            pipe = redis_client.pipeline()
+            for d in day_list:
+                pipe.hgetall(f"{USAGE_PREFIX}:{d}")
+            for d in day_list:
+                pipe.hgetall(f"{USAGE_PREFIX}:cmd:{d}")
+            pipe.pfcount(*[f"{USAGE_PREFIX}:users:{d}" for d in day_list])
+            raw = await asyncio.to_thread(pipe.exec)
+            matches_by_day = await activity_rollups.get_daily_totals(day_list)
+
+        per_day, per_cmd, active_users = raw[:days], raw[days:2 * days], int(raw[-1] or 0)
+        by_feature: Dict[str, int] = {}
+        daily = []
+        for d, h in zip(day_list, per_day):
+            day_total = 0
+            for k, v in (h or {}).items():
+                n = int(to_str(v))
+                by_feature[to_str(k)] = by_feature.get(to_str(k), 0) + n
+                day_total += n
+            daily.append({"date": d, "commands": day_total, "matches": matches_by_day.get(d, 0)})
+
+        commands_by_feature: Dict[str, Dict[str, int]] = {}
+        for h in per_cmd:
+            for k, v in (h or {}).items():
+                feature, _, command = to_str(k).partition("|")
+                bucket = commands_by_feature.setdefault(feature, {})
+                bucket[command] = bucket.get(command, 0) + int(to_str(v))
+
+        total = sum(by_feature.values())
+        matches = sum(matches_by_day.values())
+
+        def ratio(n: int, d: int):
+            return round(n / d, 2) if d else None
+
+        features = [
+            {
+                "feature": f,
+                "commands": n,
+                "share_pct": ratio(n * 100, total),
+                "per_match": ratio(n, matches),
+                "per_active_user": ratio(n, active_users),
+                "top_commands": [
+                    {"command": c, "count": k}
+                    for c, k in sorted(commands_by_feature.get(f, {}).items(), key=lambda x: -x[1])[:top_commands]
+                ],
+            }
+            for f, n in sorted(by_feature.items(), key=lambda x: -x[1])
+        ]
+
+        report = {
+            "days": day_list,
+            "total_commands": total,
+            "matches": matches,
+            "active_users": active_users,
+            "commands_per_match": ratio(total, matches),
+            "commands_per_active_user": ratio(total, active_users),
+            "features": features,
+            "daily": daily,
+            "flush_interval_seconds": settings.REDIS_USAGE_FLUSH_SECONDS,
+        }
+        if settings.REDIS_DAILY_COMMAND_BUDGET:
+            today = daily[-1]["commands"]
+            report["daily_budget"] = settings.REDIS_DAILY_COMMAND_BUDGET
+            report["budget_used_today_pct"] = ratio(today * 100, settings.REDIS_DAILY_COMMAND_BUDGET)
+        return report
+
+    async def _flush_loop(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Redis Usage Flush Failed: {e}")
+
+    def start_flusher(self):
+        interval = settings.REDIS_USAGE_FLUSH_SECONDS
+        if interval > 0 and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop(interval))
+
+    async def stop_flusher(self):
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        # Keep the last partial interval
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Redis Usage Flush Failed: {e}")
+
+
+# Global instance
+redis_usage = RedisUsageService()
@@ -4,8 +4,8 @@ from app.db.redis import redis_client # 🚀 Shared Cloud Brain
 import json
 
 class RevenueService:
-    def __init__(self):
-        self.user_repo = UserRepository()
+    def __init__(self, user_repo: UserRepository = None):
+        self.user_repo = user_repo or UserRepository()
         self.history = self.user_repo.collection.database["match_history"]
 
     async def get_daily_stats(self):
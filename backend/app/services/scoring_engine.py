@@ -0,0 +1,154 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- 🧮 AUTHORITATIVE SCORING ---
+# Clients send one ROUND_SUBMIT per round ({"round": n, "taps": [...]}) and
+# the server scores the taps against the answer key from generate_fair_game:
+# bubbles must be popped in ascending order, 10 points each, and the first
+# wrong tap (or an unfinished round) ends the player's run, as on the client.
+# Answer keys and running tallies are memoized per match on this worker; the
+# tally is also written to the match hash (score:/round:/ended:) so a reconnect
+# on another worker resumes it. Over MAX_CACHED_MATCHES only finished matches
+# are evicted: a live match must keep its answer key or its submissions fail.
+# Bots (BOT_ ids, authenticated by the service secret) still report absolute
+# scores with SCORE_UPDATE; theirs is always taken, clamped like any other.
+POINTS_PER_POP = 10
+BOT_PREFIX = "BOT_"
+OUTDATED_CLIENT = "Client out of date: update the app to keep scoring"
+MAX_CACHED_MATCHES = 1024
+
+metrics.describe("scoring_rounds_total", "Round submissions by outcome (cleared, missed or rejected)")
+metrics.describe("scoring_legacy_updates_total", "Absolute SCORE_UPDATE messages by how they were handled")
+
+
+class PlayerTally:
+    __slots__ = ("score", "next_round", "ended", "batched")
+
+    def __init__(self, score: int = 0, next_round: int = 1, ended: bool = False):
+        self.score = score
+        self.next_round = next_round
+        self.ended = ended
+        self.batched = next_round > 1  # Client speaks ROUND_SUBMIT
+
+
+class MatchScoring:
+    def __init__(self, rounds: List[dict]):
+        # Answer key per round: the numbers in the order they must be popped
+        self.answers = {int(r["round"]): tuple(sorted(int(n) for n in r["numbers"])) for r in rounds}
+        self.last_round = max(self.answers, default=0)
+        self.max_score = POINTS_PER_POP * sum(len(a) for a in self.answers.values())
+        self.tallies: Dict[str, PlayerTally] = {}
+
+    @property
+    def finished(self) -> bool:
+        """Every run played on this worker is over."""
+        return bool(self.tallies) and all(t.ended for t in self.tallies.values())
+
+
+class ScoringEngine:
+    def __init__(self, max_matches: int = MAX_CACHED_MATCHES):
+        self.max_matches = max_matches
+        self._matches: "OrderedDict[str, MatchScoring]" = OrderedDict()
+
+    def open(self, match_id: str, rounds: List[dict]) -> MatchScoring:
+        """Memoizes the match's answer key; both players on this worker share it."""
+        match = self._matches.get(match_id)
+        if match is None:
+            match = self._matches[match_id] = MatchScoring(rounds)
+            if len(self._matches) > self.max_matches:
+                self._evict(len(self._matches) - self.max_matches)
+        self._matches.move_to_end(match_id)
+        return match
+
+    def seed(self, match_id: str, user_id: str, score: int = 0, next_round: int = 1, ended: bool = False):
+        """Resumes a tally from the match hash, unless this worker already holds a fresher one."""
+        match = self._matches.get(match_id)
+        if match is not None and user_id not in match.tallies:
+            match.tallies[user_id] = PlayerTally(score, next_round, ended)
+
+    def tally(self, match_id: str, user_id: str) -> Optional[PlayerTally]:
+        match = self._matches.get(match_id)
+        return match.tallies.get(user_id) if match else None
+
+    def forget(self, match_id: str):
+        self._matches.pop(match_id, None)
+
+    def _evict(self, count: int):
+        # Oldest finished matches first; if every match is live the cache stays over the cap
+        for match_id in [m for m, match in self._matches.items() if match.finished][:count]:
+            del self._matches[match_id]
+
+    def submit(self, match_id: str, user_id: str, round_no, taps) -> Optional[PlayerTally]:
+        """
+        Scores one round's taps and returns the updated tally, or None if the
+        batch is rejected (unknown match or round, replayed or skipped round,
+        run already over, malformed taps).
+        """
+        match = self._matches.get(match_id)
+        if match is None:
+            return self._reject("unknown_match")
+        tally = match.tallies.setdefault(user_id, PlayerTally())
+        try:
+            round_no = int(round_no)
+            taps = [int(t) for t in taps]
+        except (TypeError, ValueError):
+            return self._reject("malformed")
+        answer = match.answers.get(round_no)
+        if answer is None:
+            return self._reject("unknown_round")
+        if tally.ended or round_no != tally.next_round:
+            return self._reject("out_of_order")
+
+        popped = 0
+        for tap, expected in zip(taps, answer):
+            if tap != expected:
+                break
+            popped += 1
+
+        tally.score += popped * POINTS_PER_POP
+        tally.next_round = round_no + 1
+        tally.batched = True
+        tally.ended = popped < len(answer) or round_no == match.last_round
+        metrics.inc("scoring_rounds_total", labels={"outcome": "cleared" if popped == len(answer) else "missed"})
+        return tally
+
+    def accepts_legacy(self, user_id: str) -> bool:
+        """Whether this player's SCORE_UPDATE counts at all; if not, the client must upgrade."""
+        return user_id.startswith(BOT_PREFIX) or settings.SCORING_ACCEPT_SCORE_UPDATE
+
+    def legacy_score(self, match_id: str, user_id: str, score) -> Optional[int]:
+        """
+        Absolute score from a bot's or an old client's SCORE_UPDATE, clamped to
+        be monotonic and within the match's maximum. None means ignore it.
+        """
+        match = self._matches.get(match_id)
+        if match is None or not self.accepts_legacy(user_id):
+            metrics.inc("scoring_legacy_updates_total", labels={"result": "ignored"})
+            return None
+        tally = match.tallies.setdefault(user_id, PlayerTally())
+        if tally.batched:
+            # Round submissions are authoritative once a client has sent one
+            metrics.inc("scoring_legacy_updates_total", labels={"result": "ignored"})
+            return None
+        try:
+            claimed = int(score)
+        except (TypeError, ValueError):
+            metrics.inc("scoring_legacy_updates_total", labels={"result": "ignored"})
+            return None
+        tally.score = min(max(claimed, tally.score), match.max_score)
+        metrics.inc("scoring_legacy_updates_total", labels={"result": "clamped" if tally.score != claimed else "accepted"})
+        return tally.score
+
+    def _reject(self, reason: str) -> None:
+        logger.debug(f"Round submission rejected: {reason}")
+        metrics.inc("scoring_rounds_total", labels={"outcome": "rejected"})
+        return None
+
+
+# Global instance
+scoring_engine = ScoringEngine()
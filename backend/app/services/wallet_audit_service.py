@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from typing import Optional
+from app.repositories.ledger_repo import WalletLedgerRepository
+from app.db.redis import redis_client
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+SNAPSHOT_LOCK = "lock:wallet_snapshots"
+
+
+class WalletAuditService:
+    """
+    📸 Periodic per-user balance snapshots on top of the wallet ledger,
+    so audits replay a short tail of entries instead of a user's whole history.
+    """
+
+    def __init__(self):
+        self.ledger = WalletLedgerRepository()
+        self._snapshotter: Optional[asyncio.Task] = None
+
+    async def audit_user(self, user_id: str, current_balance: float):
+        return await self.ledger.audit_user(user_id, current_balance)
+
+    async def _snapshot_loop(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Only one worker snapshots per interval
+                if redis_client.set(SNAPSHOT_LOCK, "1", ex=max(interval - 5, 30), nx=True):
+                    count = await self.ledger.take_snapshots()
+                    logger.info(f"📸 Wallet snapshots written for {count} users")
+            except Exception as e:
+                logger.error(f"Wallet Snapshot Failed: {e}")
+
+    def start_snapshotter(self):
+        interval = settings.WALLET_SNAPSHOT_INTERVAL_SECONDS
+        if interval > 0 and self._snapshotter is None:
+            self._snapshotter = asyncio.create_task(self._snapshot_loop(interval))
+
+    async def stop_snapshotter(self):
+        if self._snapshotter:
+            self._snapshotter.cancel()
+            try:
+                await self._snapshotter
+            except asyncio.CancelledError:
+                pass
+            self._snapshotter = None
+
+
+# Global instance
+wallet_audit = WalletAuditService()
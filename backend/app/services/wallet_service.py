@@ -1,12 +1,35 @@
 from app.repositories.user_repo import UserRepository
 from app.db.redis import redis_client # 🚀 Shared Brain for Locking
+from app.services.ledger_counters import ledger_counters
+from app.repositories.ledger_repo import (
+    DEPOSIT, ENTRY_FEE, PAYOUT, REFUND, WITHDRAWAL, WITHDRAWAL_REFUND, encode_cursor, keyset_filter
+)
+from app.db.mongodb import db as mongo
+from app.core.config import settings
 from fastapi import HTTPException
 from bson import ObjectId
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import uuid
+
+logger = logging.getLogger("uvicorn.error")
+
+BULK_CHUNK_SIZE = 50
+BULK_COLLECTIONS = ("deposits", "withdrawals")
+
+# --- 🧾 HISTORY SOURCES ---
+# Each source keeps its own fields; $unionWith stitches them into one timeline.
+HISTORY_SOURCES = {
+    DEPOSIT: ("deposits", {"trx_id": 1}),
+    WITHDRAWAL: ("withdrawals", {"account_number": 1}),
+}
 
 class WalletService:
-    def __init__(self):
-        self.user_repo = UserRepository()
+    def __init__(self, user_repo: UserRepository = None):
+        self.user_repo = user_repo or UserRepository()
+        self._sweeper: Optional[asyncio.Task] = None
 
     async def handle_manual_deposit(self, user_id: str, amount: float, trx_id: str):
         """
@@ -28,7 +51,10 @@ class WalletService:
 
             # 3. Update Balance
             amount = round(float(amount), 2)
-            update_success = await self.user_repo.update_wallet(user_id, amount)
+            update_success = await self.user_repo.update_wallet(
+                user_id, amount, counters={"deposits_total": amount, "deposits_count": 1},
+                entry_type=DEPOSIT, ref=trx_id
+            )
             
             if not update_success:
                 raise HTTPException(status_code=500, detail="Failed to update wallet")
@@ -43,36 +69,301 @@ class WalletService:
                 "status": "COMPLETED",
                 "timestamp": datetime.now(timezone.utc)
             })
-            
-            redis_client.delete("stats:total_pool")
             return {"status": "success"}
         finally:
             redis_client.delete(lock_key)
 
+    # --- 📦 BULK ADMIN APPROVALS ---
+
+    async def _claim_pending(self, collection: str, id_field: str, ids: list, batch_id: str):
+        """
+        Per-item idempotency gate: atomically flips PENDING -> PROCESSING.
+        Runs concurrently, bounded by BULK_APPROVAL_CONCURRENCY.
+        claimed_at lets release_stale_claims recover items of a batch that died.
+        Returns {id: claimed_doc or None}.
+        """
+        db = self.user_repo.collection.database
+        sem = asyncio.Semaphore(settings.BULK_APPROVAL_CONCURRENCY)
+
+        async def claim_one(item_id):
+            async with sem:
+                doc = await db[collection].find_one_and_update(
+                    {id_field: item_id, "status": "PENDING"},
+                    {"$set": {"status": "PROCESSING", "batch_id": batch_id, "claimed_at": datetime.now(timezone.utc)}},
+                    return_document=True
+                )
+                return item_id, doc
+
+        return dict(await asyncio.gather(*(claim_one(i) for i in ids)))
+
+    async def _commit_in_chunks(
+        self,
+        docs: List[dict],
+        write_chunk: Callable[[List[dict], object], Awaitable[Tuple[set, dict]]]
+    ) -> Dict[str, str]:
+        """
+        Groups claimed docs by user (so concurrent transactions never touch the
+        same wallet), packs them into chunks and commits each chunk in its own
+        transaction, concurrently. write_chunk returns (done_ids, counters);
+        the ledger counters are bumped after the commit, so chunk transactions
+        share no documents. Returns {doc_id: "ok" | error message}.
+        """
+        by_user: Dict[str, List[dict]] = {}
+        for d in docs:
+            by_user.setdefault(str(d["user_id"]), []).append(d)
+
+        chunks, current = [], []
+        for group in by_user.values():
+            if current and len(current) + len(group) > BULK_CHUNK_SIZE:
+                chunks.append(current)
+                current = []
+            current.extend(group)
+        if current:
+            chunks.append(current)
+
+        sem = asyncio.Semaphore(settings.BULK_APPROVAL_CONCURRENCY)
+        outcome: Dict[str, str] = {}
+
+        async def run(chunk):
+            async with sem:
+                try:
+                    async with await mongo.client.start_session() as session:
+                        done, counters = await session.with_transaction(lambda s: write_chunk(chunk, s))
+                    await ledger_counters.bump(**counters)
+                    for d in chunk:
+                        outcome[str(d["_id"])] = "ok" if str(d["_id"]) in done else "User not found"
+                except Exception as e:
+                    logger.error(f"❌ Bulk chunk failed: {e}")
+                    for d in chunk:
+                        outcome[str(d["_id"])] = f"Chunk failed: {e}"
+
+        await asyncio.gather(*(run(c) for c in chunks))
+        return outcome
+
+    async def _release(self, collection: str, doc_ids: list):
+        """Puts items that could not be committed back into the PENDING queue."""
+        if doc_ids:
+            db = self.user_repo.collection.database
+            await db[collection].update_many(
+                {"_id": {"$in": doc_ids}, "status": "PROCESSING"},
+                {"$set": {"status": "PENDING"}, "$unset": {"batch_id": "", "claimed_at": ""}}
+            )
+
+    async def release_stale_claims(self, max_age_seconds: int) -> int:
+        """
+        Recovers items left in PROCESSING by a batch that crashed mid-way.
+        Committed items have already left PROCESSING, so anything claimed
+        longer ago than max_age_seconds never committed and is safe to requeue.
+        """
+        db = self.user_repo.collection.database
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+        released = 0
+        for collection in BULK_COLLECTIONS:
+            stale = {
+                "status": "PROCESSING",
+                "batch_id": {"$exists": True},
+                "$or": [{"claimed_at": {"$lt": cutoff}}, {"claimed_at": {"$exists": False}}]
+            }
+            batches = await db[collection].distinct("batch_id", stale)
+            if not batches:
+                continue
+            res = await db[collection].update_many(
+                stale, {"$set": {"status": "PENDING"}, "$unset": {"batch_id": "", "claimed_at": ""}}
+            )
+            released += res.modified_count
+            logger.warning(f"♻️ Released {res.modified_count} stale {collection} claims from batches {batches}")
+        return released
+
+    async def _sweep_loop(self, max_age: int):
+        while True:
+            await asyncio.sleep(max_age)
+            try:
+                await self.release_stale_claims(max_age)
+            except Exception as e:
+                logger.error(f"Bulk Claim Sweep Failed: {e}")
+
+    def start_claim_sweeper(self):
+        max_age = settings.BULK_CLAIM_TIMEOUT_SECONDS
+        if max_age > 0 and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop(max_age))
+
+    async def stop_claim_sweeper(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def _report(self, results: List[dict]):
+        summary: Dict[str, int] = {}
+        for r in results:
+            summary[r["result"]] = summary.get(r["result"], 0) + 1
+        return {"status": "success", "summary": summary, "results": results}
+
+    async def bulk_process_deposits(self, trx_ids: List[str], action: str):
+        """
+        Approves/rejects many pending deposits: concurrent per-item claims,
+        wallet credits grouped into bulk_write transactions, per-item report.
+        """
+        db = self.user_repo.collection.database
+        batch_id = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        ids = list(dict.fromkeys(t.strip().upper() for t in trx_ids if t and t.strip()))
+
+        # 1. Legacy idempotency: already credited through the transactions log
+        done_refs = {
+            t["provider_reference"]
+            for t in await db["transactions"].find(
+                {"provider_reference": {"$in": ids}, "type": "DEPOSIT"}, {"provider_reference": 1}
+            ).to_list(None)
+        }
+
+        claims = await self._claim_pending("deposits", "trx_id", [i for i in ids if i not in done_refs], batch_id)
+        claimed = [d for d in claims.values() if d]
+
+        outcome: Dict[str, str] = {}
+        if action == "reject" and claimed:
+            await db["deposits"].update_many(
+                {"_id": {"$in": [d["_id"] for d in claimed]}},
+                {"$set": {"status": "REJECTED", "rejected_at": now}, "$unset": {"batch_id": "", "claimed_at": ""}}
+            )
+            outcome = {str(d["_id"]): "ok" for d in claimed}
+
+        elif action == "approve" and claimed:
+            async def write_chunk(chunk, session):
+                credits = [{
+                    "user_id": str(d["user_id"]),
+                    "amount": round(float(d["amount"]), 2),
+                    "type": DEPOSIT,
+                    "ref": d["trx_id"]
+                } for d in chunk]
+                credited = await self.user_repo.bulk_credit(credits, session)
+                ok = [d for d in chunk if d["trx_id"] in credited]
+                total = sum(c["amount"] for c in credits if c["ref"] in credited)
+                if ok:
+                    await db["transactions"].insert_many([{
+                        "user_id": d["user_id"],
+                        "type": "DEPOSIT",
+                        "amount": round(float(d["amount"]), 2),
+                        "provider": "MANUAL_TRANSFER",
+                        "provider_reference": d["trx_id"],
+                        "status": "COMPLETED",
+                        "timestamp": now
+                    } for d in ok], session=session)
+                    await db["deposits"].update_many(
+                        {"_id": {"$in": [d["_id"] for d in ok]}},
+                        {"$set": {"status": "COMPLETED", "approved_at": now}, "$unset": {"batch_id": "", "claimed_at": ""}},
+                        session=session
+                    )
+                return {str(d["_id"]) for d in ok}, {
+                    "liquidity": total, "deposits_total": total, "deposits_count": len(ok)
+                }
+
+            outcome = await self._commit_in_chunks(claimed, write_chunk)
+            await self._release("deposits", [d["_id"] for d in claimed if outcome.get(str(d["_id"])) != "ok"])
+
+        results = []
+        for trx_id in ids:
+            doc = claims.get(trx_id)
+            if trx_id in done_refs:
+                results.append({"id": trx_id, "result": "skipped", "detail": "Already processed"})
+            elif not doc:
+                results.append({"id": trx_id, "result": "skipped", "detail": "Not found or not pending"})
+            elif outcome.get(str(doc["_id"])) == "ok":
+                results.append({"id": trx_id, "result": "approved" if action == "approve" else "rejected"})
+            else:
+                results.append({"id": trx_id, "result": "failed", "detail": outcome.get(str(doc["_id"]), "Unknown error")})
+        return self._report(results)
+
+    async def bulk_process_withdrawals(self, withdraw_ids: List[str], action: str):
+        """
+        Approves (money already held) or rejects (refund via bulk credit) many
+        pending withdrawals with a per-item report.
+        """
+        db = self.user_repo.collection.database
+        batch_id = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+
+        ids, invalid = [], []
+        for raw in dict.fromkeys(withdraw_ids):
+            (ids if ObjectId.is_valid(raw) else invalid).append(raw)
+
+        claims = await self._claim_pending("withdrawals", "_id", [ObjectId(i) for i in ids], batch_id)
+        claimed = [d for d in claims.values() if d]
+
+        outcome: Dict[str, str] = {}
+        if action == "approve" and claimed:
+            async def write_chunk(chunk, session):
+                total = sum(d["amount"] for d in chunk)
+                await db["withdrawals"].update_many(
+                    {"_id": {"$in": [d["_id"] for d in chunk]}},
+                    {"$set": {"status": "COMPLETED", "processed_at": now}, "$unset": {"batch_id": "", "claimed_at": ""}},
+                    session=session
+                )
+                return {str(d["_id"]) for d in chunk}, {
+                    "withdrawals_pending": -total, "withdrawals_total": total, "withdrawals_count": len(chunk)
+                }
+
+            outcome = await self._commit_in_chunks(claimed, write_chunk)
+
+        elif action == "reject" and claimed:
+            async def write_chunk(chunk, session):
+                credits = [{
+                    "user_id": str(d["user_id"]),
+                    "amount": d["amount"],
+                    "type": WITHDRAWAL_REFUND,
+                    "ref": str(d["_id"])
+                } for d in chunk]
+                credited = await self.user_repo.bulk_credit(credits, session)
+                if credited:
+                    await db["withdrawals"].update_many(
+                        {"_id": {"$in": [ObjectId(r) for r in credited]}},
+                        {"$set": {"status": "REJECTED", "rejected_at": now}, "$unset": {"batch_id": "", "claimed_at": ""}},
+                        session=session
+                    )
+                refunded = sum(c["amount"] for c in credits if c["ref"] in credited)
+                return credited, {"liquidity": refunded, "withdrawals_pending": -refunded}
+
+            outcome = await self._commit_in_chunks(claimed, write_chunk)
+
+        await self._release("withdrawals", [d["_id"] for d in claimed if outcome.get(str(d["_id"])) != "ok"])
+
+        results = [{"id": i, "result": "skipped", "detail": "Invalid ID"} for i in invalid]
+        for w_id in ids:
+            doc = claims.get(ObjectId(w_id))
+            if not doc:
+                results.append({"id": w_id, "result": "skipped", "detail": "Not found or not pending"})
+            elif outcome.get(w_id) == "ok":
+                results.append({"id": w_id, "result": "approved" if action == "approve" else "rejected"})
+            else:
+                results.append({"id": w_id, "result": "failed", "detail": outcome.get(w_id, "Unknown error")})
+        return self._report(results)
+
     async def deduct_entry_fee(self, user_id: str, fee: float = 100.0):
         """
         Atomic deduction. Only allows if funds exist.
         """
-        result = await self.user_repo.collection.update_one(
-            {
-                "_id": ObjectId(user_id), 
-                "wallet_balance": {"$gte": fee} 
-            },
-            {"$inc": {"wallet_balance": -fee}}
+        # update_wallet only debits when wallet_balance >= fee
+        deducted = await self.user_repo.update_wallet(
+            user_id, -fee, counters={"entry_fees": fee}, entry_type=ENTRY_FEE
         )
 
-        if result.modified_count == 0:
+        if not deducted:
             raise HTTPException(status_code=400, detail="Insufficient funds")
-            
+
         return True
 
     # ✅ RENAMED to match game_lifecycle.py
-    async def payout_winnings(self, user_id: str, amount: float):
+    async def payout_winnings(self, user_id: str, amount: float, match_id: str = None):
         """
         Awards prize money to the winner.
         """
         # 1. Update Wallet
-        await self.user_repo.update_wallet(user_id, amount)
+        await self.user_repo.update_wallet(
+            user_id, amount, counters={"payouts": amount}, entry_type=PAYOUT, ref=match_id
+        )
         
         # 2. Update Stats (Wins, Leaderboard Score)
         await self.user_repo.record_match_stats(user_id, is_win=True)
@@ -80,13 +371,81 @@ class WalletService:
         return True
 
     # ✅ RENAMED/SIMPLIFIED to match game_lifecycle.py
-    async def refund_user(self, user_id: str, amount: float):
+    async def refund_user(self, user_id: str, amount: float, match_id: str = None):
         """
         Refunds a single user (used for Draws or Aborted matches).
         """
-        await self.user_repo.update_wallet(user_id, amount)
+        await self.user_repo.update_wallet(
+            user_id, amount, counters={"entry_fees": -amount}, entry_type=REFUND, ref=match_id
+        )
         return True
     
+    async def ensure_indexes(self):
+        """Backs the keyset history query: equality on user_id (+status), sort on (created_at, _id)."""
+        db = self.user_repo.collection.database
+        for collection, _ in HISTORY_SOURCES.values():
+            await db[collection].create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+            await db[collection].create_index([("user_id", 1), ("status", 1), ("created_at", -1), ("_id", -1)])
+        for collection in BULK_COLLECTIONS:
+            # Backs the stale PROCESSING sweep
+            await db[collection].create_index([("status", 1), ("claimed_at", 1)])
+
+    async def get_history_page(
+        self,
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        types: Optional[List[str]] = None,
+        status: Optional[str] = None
+    ):
+        """
+        🚀 One aggregation, newest first, keyset-paginated over (created_at, _id).
+        Every branch is an indexed range read capped at limit + 1, so the cost
+        doesn't grow with the length of a user's history.
+        Returns (items, next_cursor).
+        """
+        db = self.user_repo.collection.database
+        try:
+            match = {"user_id": ObjectId(user_id), **keyset_filter(cursor)}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if status:
+            match["status"] = status.upper()
+
+        def branch(entry_type: str):
+            _, extra_fields = HISTORY_SOURCES[entry_type]
+            return [
+                {"$match": match},
+                {"$sort": {"created_at": -1, "_id": -1}},
+                {"$limit": limit + 1},
+                {"$project": {
+                    "type": {"$literal": entry_type},
+                    "amount": 1, "status": 1, "created_at": 1, **extra_fields
+                }}
+            ]
+
+        selected = [t for t in HISTORY_SOURCES if not types or t in types]
+        if not selected:
+            return [], None
+
+        first, *rest = selected
+        pipeline = branch(first)
+        for entry_type in rest:
+            pipeline.append({"$unionWith": {"coll": HISTORY_SOURCES[entry_type][0], "pipeline": branch(entry_type)}})
+        if rest:
+            pipeline += [{"$sort": {"created_at": -1, "_id": -1}}, {"$limit": limit + 1}]
+
+        docs = await db[HISTORY_SOURCES[first][0]].aggregate(pipeline).to_list(limit + 1)
+
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_cursor(docs[-1]["created_at"], docs[-1]["_id"])
+
+        for d in docs:
+            d["id"] = str(d.pop("_id"))
+        return docs, next_cursor
+
     async def claim_referral_bonus(self, current_user: dict, code: str):
         # 1. Self-referral check (Case-insensitive)
         if str(current_user.get("referral_code")).upper() == code.strip().upper():
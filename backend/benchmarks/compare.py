@@ -0,0 +1,33 @@
+"""
+Diffs two loadtest reports (baseline first):
+
+    python -m benchmarks.compare base.json head.json
+"""
+import json
+import sys
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return ""
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    base, head = (json.load(open(p)) for p in sys.argv[1:])
+
+    print(f"{'metric':<32}{base.get('commit') or 'base':>12}{head.get('commit') or 'head':>12}{'change':>10}")
+    for name, b in base["latency_ms"].items():
+        h = head["latency_ms"].get(name, {})
+        for stat in ("p50", "p95", "p99"):
+            if stat in b or stat in h:
+                print(f"{name + '.' + stat + ' (ms)':<32}{b.get(stat, '-'):>12}{h.get(stat, '-'):>12}{_change(b.get(stat), h.get(stat)):>10}")
+    for name in ("redis_per_match", "redis_round_trips", "mongo_per_match"):
+        b, h = base["ops"].get(name), head["ops"].get(name)
+        print(f"{name:<32}{str(b):>12}{str(h):>12}{_change(b, h):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+End-to-end WebSocket load test: matchmaking -> gameplay -> finalize, plus idle lobby sockets.
+
+    python -m benchmarks.loadtest --players 1000 --lobby-clients 500 --out results.json
+
+Starts benchmarks.server in a subprocess (unless --target is given), seeds
+players, drives them concurrently and prints one JSON report.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import websockets
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ms = sorted(s * 1000 for s in samples)
+
+    def pct(p):
+        return round(ms[min(len(ms) - 1, int(p / 100 * len(ms)))], 2)
+
+    return {
+        "count": len(ms),
+        "mean": round(statistics.fmean(ms), 2),
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+        "max": round(ms[-1], 2),
+    }
+
+
+class Stats:
+    def __init__(self):
+        self.match_found = []
+        self.game_start = []
+        self.score_sync = []
+        self.finalize = []
+        self.lobby_connect = []
+        self.outcomes = {}
+        self.match_ids = set()
+
+    def outcome(self, name):
+        self.outcomes[name] = self.outcomes.get(name, 0) + 1
+
+
+async def recv_json(ws, timeout):
+    return json.loads(await asyncio.wait_for(ws.recv(), timeout))
+
+
+async def play(base_ws, player, args, stats):
+    token = player["token"]
+    await asyncio.sleep(random.uniform(0, args.ramp))
+
+    # 1. Matchmaking
+    t0 = time.perf_counter()
+    match_id = None
+    try:
+        async with websockets.connect(f"{base_ws}/api/game/ws/matchmaking?token={token}", open_timeout=30) as ws:
+            while True:
+                msg = await recv_json(ws, 30)
+                if msg.get("type") == "MATCH_FOUND":
+                    match_id = msg["match_id"]
+                    stats.match_found.append(time.perf_counter() - t0)
+                    break
+                if msg.get("type") == "ERROR":
+                    stats.outcome(f"matchmaking_error:{msg.get('message')}")
+                    return
+    except Exception as e:
+        stats.outcome(f"matchmaking_exception:{type(e).__name__}")
+        return
+
+    # 2. Gameplay
+    t1 = time.perf_counter()
+    pending = {}  # score -> send time
+    rounds = []
+    try:
+        async with websockets.connect(f"{base_ws}/api/game/ws/match/{match_id}?token={token}", open_timeout=30) as ws:
+            while True:
+                msg = await recv_json(ws, 45)
+                if msg.get("type") == "GAME_START":
+                    stats.game_start.append(time.perf_counter() - t1)
+                    rounds = msg.get("rounds") or []
+                    break
+                if msg.get("type") == "MATCH_CANCELLED":
+                    # Paired with a bot (no bot server in the benchmark)
+                    stats.outcome("cancelled_no_opponent")
+                    return
+            stats.match_ids.add(match_id)
+
+            result = asyncio.get_running_loop().create_future()
+
+            async def reader():
+                try:
+                    while True:
+                        msg = json.loads(await ws.recv())
+                        if msg.get("type") == "SYNC_STATE":
+                            now = time.perf_counter()
+                            for s in [s for s in pending if s <= msg.get("your_score", 0)]:
+                                stats.score_sync.append(now - pending.pop(s))
+                        elif msg.get("type") == "RESULT" and not result.done():
+                            result.set_result(time.perf_counter())
+                except Exception:
+                    if not result.done():
+                        result.set_result(None)
+
+            reader_task = asyncio.create_task(reader())
+            score = 0
+            for rnd in rounds[:args.score_updates]:
+                # Clear every round: the server scores the taps against the answer key
+                await asyncio.sleep(args.update_interval * random.uniform(0.5, 1.5))
+                taps = sorted(rnd["numbers"])
+                score += 10 * len(taps)
+                pending[score] = time.perf_counter()
+                await ws.send(json.dumps({"type": "ROUND_SUBMIT", "round": rnd["round"], "taps": taps}))
+
+            t_over = time.perf_counter()
+            await ws.send(json.dumps({"type": "GAME_OVER"}))
+            try:
+                done_at = await asyncio.wait_for(result, 60)
+            except asyncio.TimeoutError:
+                done_at = None
+            reader_task.cancel()
+
+            if done_at:
+                stats.finalize.append(done_at - t_over)
+                stats.outcome("finished")
+            else:
+                stats.outcome("no_result")
+    except Exception as e:
+        stats.outcome(f"gameplay_exception:{type(e).__name__}")
+
+
+async def idle_in_lobby(base_ws, player, args, stats):
+    await asyncio.sleep(random.uniform(0, args.ramp))
+    t0 = time.perf_counter()
+    try:
+        async with websockets.connect(f"{base_ws}/ws/lobby?token={player['token']}", open_timeout=30) as ws:
+            stats.lobby_connect.append(time.perf_counter() - t0)
+            deadline = time.perf_counter() + args.lobby_hold
+            while time.perf_counter() < deadline:
+                try:
+                    msg = await recv_json(ws, max(deadline - time.perf_counter(), 0.1))
+                    if msg.get("type") == "ping":
+                        await ws.send(json.dumps({"type": "pong"}))
+                except asyncio.TimeoutError:
+                    break
+        stats.outcome("lobby_ok")
+    except Exception as e:
+        stats.outcome(f"lobby_exception:{type(e).__name__}")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+async def wait_until_up(base_http, timeout=60):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                if (await client.get(f"{base_http}/api/public/ping")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError("benchmark server did not come up")
+
+
+async def run(args):
+    base_http = args.target or f"http://127.0.0.1:{args.port}"
+    base_ws = base_http.replace("http", "ws", 1)
+    await wait_until_up(base_http)
+
+    total = args.players + args.lobby_clients
+    async with httpx.AsyncClient(timeout=120) as client:
+        players = (await client.post(f"{base_http}/__bench__/seed", params={"count": total})).json()["players"]
+        await client.post(f"{base_http}/__bench__/counters/reset")
+
+    stats = Stats()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(play(base_ws, p, args, stats) for p in players[:args.players]),
+        *(idle_in_lobby(base_ws, p, args, stats) for p in players[args.players:]),
+    )
+    elapsed = time.perf_counter() - started
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        counters = (await client.get(f"{base_http}/__bench__/counters")).json()
+
+    matches = len(stats.match_ids) or None
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out",)},
+        "elapsed_s": round(elapsed, 2),
+        "matches_played": len(stats.match_ids),
+        "outcomes": stats.outcomes,
+        "latency_ms": {
+            "match_found": summarize(stats.match_found),
+            "game_start": summarize(stats.game_start),
+            "score_sync": summarize(stats.score_sync),
+            "finalize": summarize(stats.finalize),
+            "lobby_connect": summarize(stats.lobby_connect),
+        },
+        "ops": {
+            "redis_total": counters["redis"]["total"],
+            "redis_round_trips": counters["redis"]["round_trips"],
+            "redis_per_match": round(counters["redis"]["total"] / matches, 1) if matches else None,
+            "mongo_total": counters["mongo"]["total"],
+            "mongo_per_match": round(counters["mongo"]["total"] / matches, 1) if matches else None,
+            "redis_by_command": counters["redis"]["by_command"],
+            "mongo_by_target": counters["mongo"]["by_command"],
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=200, help="clients going through matchmaking + gameplay")
+    parser.add_argument("--lobby-clients", type=int, default=100, help="clients idling on /ws/lobby")
+    parser.add_argument("--lobby-hold", type=float, default=30.0, help="seconds each lobby client stays connected")
+    parser.add_argument("--ramp", type=float, default=5.0, help="arrivals are spread over this many seconds")
+    parser.add_argument("--score-updates", type=int, default=10, help="rounds submitted per player")
+    parser.add_argument("--update-interval", type=float, default=1.0, help="mean seconds between round submissions")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--target", default=None, help="use an already running server instead of spawning one")
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--out", default=None, help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    server = None
+    if not args.target:
+        cmd = [sys.executable, "-m", "benchmarks.server", "--port", str(args.port)]
+        if args.redis_url:
+            cmd += ["--redis-url", args.redis_url]
+        if args.mongo_url:
+            cmd += ["--mongo-url", args.mongo_url]
+        server = subprocess.Popen(cmd, cwd=BACKEND_DIR, env={**os.environ, "PYTHONPATH": str(BACKEND_DIR)})
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Serializer microbenchmarks on representative payloads: GAME_START rounds,
+the /auth/me user document and a 100-row leaderboard page.
+
+    python -m benchmarks.serialization [--number 2000] [--out serialization.json]
+
+Compares stdlib json (with the old MongoEncoder-style default) against
+app.core.serialization, for dumps and loads. Times are microseconds per call.
+"""
+import argparse
+import json
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from bson import ObjectId
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core import serialization  # noqa: E402
+from app.services.game_generator import generate_fair_game  # noqa: E402
+
+
+def stdlib_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(type(obj).__name__)
+
+
+def me_payload():
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": ObjectId(),
+        "id": str(ObjectId()),
+        "username": "player_one",
+        "email": "player_one@example.com",
+        "avatar_url": "https://cdn.example.com/avatars/player_one.png",
+        "wallet_balance": 1234.5,
+        "total_wins": 87,
+        "total_matches": 160,
+        "role": "user",
+        "is_verified": True,
+        "referral_code": "PLAYER1X",
+        "created_at": now - timedelta(days=200),
+        "last_login": now,
+        "recent_matches": [
+            {"match_id": f"match_{i:08x}", "won": i % 2 == 0, "score": random.randint(0, 40),
+             "finished_at": now - timedelta(hours=i)}
+            for i in range(10)
+        ],
+    }
+
+
+def leaderboard_payload(rows=100):
+    return {
+        "board": "all",
+        "key": "leaderboard:wins",
+        "total": 25000,
+        "players": [
+            {"rank": i + 1, "user_id": str(ObjectId()), "username": f"player_{i}",
+             "total_wins": 5000 - i * 7, "wallet_balance": round(random.uniform(0, 5000), 2)}
+            for i in range(rows)
+        ],
+        "me": {"user_id": str(ObjectId()), "rank": 4521, "score": 12, "username": "player_one"},
+    }
+
+
+def per_call_us(fn, number):
+    return round(min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6, 2)
+
+
+def run(number):
+    payloads = {
+        "rounds": {"type": "GAME_START", "rounds": generate_fair_game(20), "opponent_name": "x", "match_id": "match_1"},
+        "me": me_payload(),
+        "leaderboard": leaderboard_payload(),
+    }
+    results = {"backend": "orjson" if serialization.orjson else "stdlib", "number": number, "payloads": {}}
+    for name, obj in payloads.items():
+        text = json.dumps(obj, default=stdlib_default)
+        std_dumps = per_call_us(lambda: json.dumps(obj, default=stdlib_default), number)
+        fast_dumps = per_call_us(lambda: serialization.dumps_bytes(obj), number)
+        std_loads = per_call_us(lambda: json.loads(text), number)
+        fast_loads = per_call_us(lambda: serialization.loads(text), number)
+        results["payloads"][name] = {
+            "bytes_stdlib": len(text.encode()),
+            "bytes_fast": len(serialization.dumps_bytes(obj)),
+            "dumps_us": {"stdlib": std_dumps, "fast": fast_dumps, "speedup": round(std_dumps / fast_dumps, 1)},
+            "loads_us": {"stdlib": std_loads, "fast": fast_loads, "speedup": round(std_loads / fast_loads, 1)},
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing sample")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    text = json.dumps(run(args.number), indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Runs the real FastAPI app on local stand-ins, plus a few /__bench__ routes
+the load generator uses to seed players and read op counters.
+
+    python -m benchmarks.server --port 8765 [--redis-url redis://localhost:6379/15] [--mongo-url ...]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import stand_ins  # noqa: E402
+
+
+def build_app(redis_url=None, mongo_url=None):
+    stand_ins.install(redis_url=redis_url, mongo_url=mongo_url)
+
+    # Imported only after the stand-ins are in place
+    from fastapi import Query
+    from datetime import datetime, timezone
+    from main import app
+    from app.db.mongodb import db
+    from app.core.security import create_access_token
+    from app.repositories.user_search_repo import search_keys
+
+    @app.post("/__bench__/seed")
+    async def seed(count: int = Query(100, ge=1, le=100000), balance: float = 1_000_000.0):
+        run = datetime.now(timezone.utc).strftime("%H%M%S")
+        docs = [{
+            "username": f"bench_{run}_{i}",
+            "email": f"bench_{run}_{i}@bench.local",
+            "wallet_balance": balance,
+            "total_wins": 0,
+            "total_matches": 0,
+            "role": "user",
+            "is_verified": True,
+            "created_at": datetime.now(timezone.utc),
+            **search_keys(f"bench_{run}_{i}", f"bench_{run}_{i}@bench.local"),
+        } for i in range(count)]
+        res = await db.db.users.insert_many(docs)
+        return {"players": [
+            {"user_id": str(oid), "token": create_access_token({"sub": str(oid)})}
+            for oid in res.inserted_ids
+        ]}
+
+    @app.get("/__bench__/counters")
+    async def counters():
+        return {"redis": stand_ins.redis_ops.snapshot(), "mongo": stand_ins.mongo_ops.snapshot()}
+
+    @app.post("/__bench__/counters/reset")
+    async def reset_counters():
+        stand_ins.redis_ops.reset()
+        stand_ins.mongo_ops.reset()
+        return {"status": "reset"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--redis-url", default=None, help="local redis-server; fakeredis if omitted")
+    parser.add_argument("--mongo-url", default=None, help="local mongod replica set; mongomock if omitted")
+    args = parser.parse_args()
+
+    import uvicorn
+    app = build_app(args.redis_url, args.mongo_url)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", ws_max_queue=1024)
+
+
+if __name__ == "__main__":
+    main()
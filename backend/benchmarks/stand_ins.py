@@ -0,0 +1,225 @@
+"""
+Local stand-ins for Upstash and Atlas, installed *before* the app is imported.
+
+Redis: a real local redis-server (--redis-url) or fakeredis, wrapped so it
+speaks the upstash_redis call signatures the app uses (hset(values=...),
+eval(script, keys, args), pipeline().exec()).
+
+Mongo: a real local mongod (--mongo-url, needs a replica set for the payout
+transactions) or mongomock-motor with no-op sessions.
+
+Both count the operations they serve, so the harness can report ops per match.
+"""
+import threading
+from collections import Counter
+
+
+class OpCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands = Counter()
+        self.round_trips = 0
+
+    def add(self, name: str, round_trip: bool = True):
+        with self._lock:
+            self.commands[name] += 1
+            if round_trip:
+                self.round_trips += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "total": sum(self.commands.values()),
+                "round_trips": self.round_trips,
+                "by_command": dict(self.commands.most_common()),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.commands.clear()
+            self.round_trips = 0
+
+
+redis_ops = OpCounter()
+mongo_ops = OpCounter()
+
+
+# --- REDIS --------------------------------------------------------------
+
+def _translate(name, args, kwargs):
+    """upstash_redis signature -> redis-py signature."""
+    if name == "hset":
+        key = args[0]
+        field = args[1] if len(args) > 1 else kwargs.pop("field", None)
+        value = args[2] if len(args) > 2 else kwargs.pop("value", None)
+        mapping = dict(kwargs.pop("values", None) or {})
+        if field is not None:
+            mapping[field] = value
+        return "hset", (key,), {"mapping": mapping}
+    if name == "eval":
+        script = args[0]
+        keys = list(args[1] if len(args) > 1 else kwargs.pop("keys", None) or [])
+        argv = list(args[2] if len(args) > 2 else kwargs.pop("args", None) or [])
+        return "eval", (script, len(keys), *keys, *argv), {}
+    if name == "zadd":
+        # upstash: zadd(key, scores={member: score}) / redis-py: zadd(name, mapping)
+        mapping = args[1] if len(args) > 1 else kwargs.pop("scores")
+        return "zadd", (args[0], mapping), kwargs
+    return name, args, kwargs
+
+
+class _UpstashPipeline:
+    def __init__(self, pipe):
+        self._pipe = pipe
+        self._queued = 0
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            n, a, k = _translate(name, args, kwargs)
+            getattr(self._pipe, n)(*a, **k)
+            redis_ops.add(n, round_trip=False)
+            self._queued += 1
+            return self
+        return queue
+
+    def exec(self):
+        redis_ops.add("PIPELINE")
+        return self._pipe.execute()
+
+
+class UpstashCompatRedis:
+    def __init__(self, client):
+        self._client = client
+
+    def pipeline(self):
+        return _UpstashPipeline(self._client.pipeline(transaction=False))
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            n, a, k = _translate(name, args, kwargs)
+            redis_ops.add(n)
+            return getattr(self._client, n)(*a, **k)
+        return call
+
+
+def make_redis(redis_url: str = None):
+    if redis_url:
+        import redis
+        client = redis.Redis.from_url(redis_url, decode_responses=True)
+    else:
+        import fakeredis  # needs fakeredis[lua] for the app's Lua scripts
+        client = fakeredis.FakeRedis(decode_responses=True)
+    return UpstashCompatRedis(client)
+
+
+# --- MONGO --------------------------------------------------------------
+
+class _NoTxnSession:
+    """mongomock has no transactions; every write simply applies immediately."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def start_transaction(self):
+        return self
+
+    async def end_session(self):
+        pass
+
+
+def _install_mongomock():
+    import motor.motor_asyncio
+    from mongomock_motor import AsyncMongoMockClient
+
+    class BenchMockClient(AsyncMongoMockClient):
+        def __init__(self, *args, **kwargs):
+            super().__init__()
+
+        async def start_session(self, *args, **kwargs):
+            return _NoTxnSession()
+
+        def __getitem__(self, name):
+            db = super().__getitem__(name)
+            return _CountingDatabase(db)
+
+    motor.motor_asyncio.AsyncIOMotorClient = BenchMockClient
+
+
+class _CountingDatabase:
+    """Counts mongomock collection calls by 'collection.method'."""
+
+    DB_ATTRS = {"command", "list_collection_names", "create_collection", "drop_collection", "client", "name"}
+
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name in self.DB_ATTRS:
+            return getattr(self._db, name)
+        return self[name]
+
+    def get_collection(self, name):
+        return self[name]
+
+    def __getitem__(self, name):
+        return _CountingCollection(self._db[name], name)
+
+
+class _CountingCollection:
+    def __init__(self, coll, name):
+        self._coll = coll
+        self._name = name
+
+    @property
+    def database(self):
+        return _CountingDatabase(self._coll.database)
+
+    def __getattr__(self, name):
+        attr = getattr(self._coll, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            mongo_ops.add(f"{self._name}.{name}")
+            return attr(*args, **kwargs)
+        return call
+
+
+def _install_mongo_listener():
+    from pymongo import monitoring
+
+    class CommandCounter(monitoring.CommandListener):
+        def started(self, event):
+            coll = event.command.get(event.command_name)
+            target = coll if isinstance(coll, str) else "-"
+            mongo_ops.add(f"{target}.{event.command_name}")
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    monitoring.register(CommandCounter())
+
+
+def install(redis_url: str = None, mongo_url: str = None):
+    """Must run before `import main` (the app binds its clients at import)."""
+    import os
+    import upstash_redis
+
+    client = make_redis(redis_url)
+    upstash_redis.Redis = lambda *args, **kwargs: client
+
+    if mongo_url:
+        os.environ["MONGO_URL"] = mongo_url
+        _install_mongo_listener()
+    else:
+        _install_mongomock()
+
+    # The bot server is not part of the benchmark; make the wake-up call fail fast
+    os.environ.setdefault("BOT_SERVER_URL", "http://127.0.0.1:9")
+    return client
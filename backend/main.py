@@ -1,7 +1,19 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.db.mongodb import connect_to_mongo, close_mongo_connection
+from app.services.ledger_counters import ledger_counters
+from app.services.wallet_audit_service import wallet_audit
+from app.services.activity_rollups import activity_rollups
+from app.repositories.ledger_repo import WalletLedgerRepository
+from app.repositories.user_search_repo import UserSearchRepository
+from app.repositories.friend_graph_repo import FriendGraphRepository
+from app.core.container import container
+from app.core.metrics import record
+from app.core.serialization import FastJSONResponse
+from app.core.loop_watchdog import loop_watchdog
+from app.core.redis_budget import set_feature, feature_for_path
+from app.services.redis_usage import redis_usage
 # ✅ UPDATED IMPORTS: Added 'friends' and 'lobby'
 from app.api import auth, wallet, game_ws, leaderboard, admin, friends, lobby 
 from app.core.config import settings
@@ -9,6 +21,8 @@ import logging
 import os
 from app.api import support
 from app.api import system
+from app.api import metrics as metrics_api
+import time
 # --- 📝 LOGGING SETUP ---
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("uvicorn.error")
@@ -32,12 +46,32 @@ async def lifespan(app: FastAPI):
     try:
         await connect_to_mongo()
         logger.info("✅ MongoDB Connection: Online")
+        container.init()
+        await WalletLedgerRepository().ensure_indexes()
+        await container.wallet_service.ensure_indexes()
+        await UserSearchRepository().ensure_indexes()
+        await FriendGraphRepository().ensure_indexes()
     except Exception as e:
         logger.error(f"❌ Database Startup Error: {e}")
 
+    # 4. Background Jobs (tasks inherit this Redis budget label)
+    set_feature("background")
+    loop_watchdog.start()
+    redis_usage.start_flusher()
+    ledger_counters.start_reconciler()
+    wallet_audit.start_snapshotter()
+    activity_rollups.start_flusher()
+    container.wallet_service.start_claim_sweeper()
+
     yield
 
     # --- 🛑 SHUTDOWN LOGIC ---
+    await ledger_counters.stop_reconciler()
+    await wallet_audit.stop_snapshotter()
+    await activity_rollups.stop_flusher()
+    await container.wallet_service.stop_claim_sweeper()
+    await loop_watchdog.stop()
+    await redis_usage.stop_flusher()
     await close_mongo_connection()
     logger.info(f"🛑 {settings.PROJECT_NAME} Connection: Offline.")
 
@@ -45,7 +79,8 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title=settings.PROJECT_NAME, 
     version=settings.VERSION, 
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # --- 🔒 CORS SETUP (Production Ready) ---
@@ -75,6 +110,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- 📊 REQUEST TIMING ---
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    set_feature(feature_for_path(request.url.path))
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/api/x/{id}), never the raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        record("http", "http_request_seconds", time.perf_counter() - start, {
+            "route": getattr(route, "path", "unmatched"),
+            "method": request.method,
+            "status": str(status),
+        })
+
 # --- 🛣️ ROUTER REGISTRATION ---
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
 app.include_router(wallet.router, prefix="/api/wallet", tags=["Wallet"])
@@ -86,6 +140,7 @@ app.include_router(system.router, prefix="/api/system", tags=["System"])
 app.include_router(friends.router, prefix="/api/friends", tags=["Friends"])
 app.include_router(lobby.router, tags=["Lobby"]) # Handles /ws/lobby
 app.include_router(support.router, prefix="/api/support", tags=["Support"])
+app.include_router(metrics_api.router, tags=["Metrics"]) # Handles /metrics
 @app.get("/")
 def read_root():
     return {
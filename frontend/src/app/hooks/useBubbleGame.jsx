@@ -51,6 +51,8 @@ export const useBubbleGame = ({ mode, socket, onQuit, onRestart, onRequeue }) =>
   const processingClickRef = useRef(new Set());
   const scoreRef = useRef(0);
   const matchEndedRef = useRef(false); // 🔒 THE KILL SWITCH
+  const tapsRef = useRef([]); // This round's taps, sent as one ROUND_SUBMIT
+  const submittedRoundRef = useRef(0);
 
   const maxRound = 20;
 
@@ -66,6 +68,14 @@ export const useBubbleGame = ({ mode, socket, onQuit, onRestart, onRequeue }) =>
   }, [audioRefs.tick]);
 
   // --- GAME LOOP LOGIC ---
+  // The server scores each round from its taps; one message per round
+  const submitRound = (roundNum) => {
+    if (mode !== 'online' || !socket || socket.readyState !== WebSocket.OPEN) return;
+    if (submittedRoundRef.current >= roundNum) return;
+    submittedRoundRef.current = roundNum;
+    socket.send(JSON.stringify({ type: 'ROUND_SUBMIT', round: roundNum, taps: tapsRef.current }));
+  };
+
  const handleGameOver = (forfeit = false) => {
     if (matchEndedRef.current) return;
 
@@ -79,6 +89,7 @@ export const useBubbleGame = ({ mode, socket, onQuit, onRestart, onRequeue }) =>
         setWaitingForResult(true);
         
         if (socket && socket.readyState === WebSocket.OPEN && !forfeit) {
+            submitRound(round);
             socket.send(JSON.stringify({ type: 'GAME_OVER', score: scoreRef.current }));
         }
     } else {
@@ -128,6 +139,7 @@ export const useBubbleGame = ({ mode, socket, onQuit, onRestart, onRequeue }) =>
       clearAllTimers(); 
       setRoundTimer(8); 
       processingClickRef.current.clear();
+      tapsRef.current = [];
       currentStepRef.current = 0; 
       setCurrentStep(0); 
       setShowRoundScreen(true);
@@ -170,6 +182,7 @@ export const useBubbleGame = ({ mode, socket, onQuit, onRestart, onRequeue }) =>
       matchEndedRef.current = false; 
       clearAllTimers();
       processingClickRef.current.clear(); 
+      submittedRoundRef.current = 0;
 
       setScore(0);
       scoreRef.current = 0;
@@ -197,6 +210,7 @@ export const useBubbleGame = ({ mode, socket, onQuit, onRestart, onRequeue }) =>
     
     if (processingClickRef.current.has(num)) return;
     processingClickRef.current.add(num);
+    tapsRef.current.push(num);
     
     const sorted = [...numbers].sort((a, b) => a - b);
     setClickedNumbers(prev => [...prev, num]);
@@ -223,9 +237,7 @@ export const useBubbleGame = ({ mode, socket, onQuit, onRestart, onRequeue }) =>
         if (round >= maxRound) {
           handleGameOver();
         } else {
-          if (mode === 'online' && socket) {
-            socket.send(JSON.stringify({ type: 'SCORE_UPDATE', score: newScore }));
-          }
+          submitRound(round);
           setShowPerfectRound(true);
           setTimeout(() => setShowPerfectRound(false), 1200);
           setRound(r => r + 1);